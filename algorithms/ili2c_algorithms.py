@@ -34,9 +34,11 @@ from qgis.PyQt.QtCore import QCoreApplication
 from qgis.core import (QgsProcessingAlgorithm,
                        QgsProcessingParameterFile,
                        QgsProcessingParameterFileDestination,
+                       QgsProcessingParameterFolderDestination,
                        )
 
 from .interlis_utils import IliUtils
+from ..ogrtools.interlis.model_compiler import compile_models
 
 
 class Ili2ImdAlgorithm(QgsProcessingAlgorithm):
@@ -78,3 +80,55 @@ class Ili2ImdAlgorithm(QgsProcessingAlgorithm):
         imd = parameters[self.IMD]
         IliUtils.runIli2c(["-oIMD", "--out", imd, ili])
         return {}
+
+
+class Ili2ImdBatchAlgorithm(QgsProcessingAlgorithm):
+
+    ILIDIR = "ILIDIR"
+    IMDDIR = "IMDDIR"
+    GROUP = "ili2c"
+
+    def name(self):
+        return 'Ili Model directory -> IliMeta'
+
+    def displayName(self):
+        return self.tr(self.name())
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def group(self):
+        return self.tr(self.groupId())
+
+    def groupId(self):
+        return self.GROUP
+
+    def createInstance(self):
+        return Ili2ImdBatchAlgorithm()
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterFile(
+            self.ILIDIR,
+            self.tr('Interlis model directory'),
+            behavior=QgsProcessingParameterFile.Folder, optional=False))
+        self.addParameter(QgsProcessingParameterFolderDestination(
+            self.IMDDIR, description="IlisMeta XML model output directory"))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        """Compile all models of a directory in dependency order.
+        Unchanged models are skipped."""
+
+        ilidir = parameters[self.ILIDIR]
+        imddir = self.parameterAsString(parameters, self.IMDDIR, context)
+
+        def ili2c(ili, imd):
+            if IliUtils.runIli2c(["-oIMD", "--out", imd, ili]) != 0:
+                raise IOError("ili2c failed for %s" % ili)
+
+        # IliUtils keeps the console output of the last call and logs from
+        # the calling thread, so models are compiled one after the other
+        results = compile_models(ilidir, imddir, max_workers=1,
+                                 compiler=ili2c)
+        for ili, result in sorted(results.items()):
+            feedback.pushInfo("%s: %s" % (ili, result))
+        return {self.IMDDIR: imddir}
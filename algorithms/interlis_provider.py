@@ -31,7 +31,7 @@ from .ili2pg_algorithms import (Ili2PgSchemaAlgorithm, Ili2PgImportAlgorithm,
 from .ili2gpkg_algorithms import (Ili2GpkgSchemaAlgorithm,
                                   Ili2GpkgImportAlgorithm,
                                   Ili2GpkgExportAlgorithm)
-from .ili2c_algorithms import Ili2ImdAlgorithm
+from .ili2c_algorithms import Ili2ImdAlgorithm, Ili2ImdBatchAlgorithm
 
 
 class InterlisProvider(QgsProcessingProvider):
@@ -48,7 +48,7 @@ class InterlisProvider(QgsProcessingProvider):
             Ili2PgSchemaAlgorithm(), Ili2PgImportAlgorithm(),
             Ili2PgExportAlgorithm(), Ili2GpkgSchemaAlgorithm(),
             Ili2GpkgImportAlgorithm(), Ili2GpkgExportAlgorithm(),
-            Ili2ImdAlgorithm()
+            Ili2ImdAlgorithm(), Ili2ImdBatchAlgorithm()
             ]
         self.initializeSettings()
 
@@ -66,12 +66,16 @@ class InterlisProvider(QgsProcessingProvider):
             Setting(self.getDescription(), IliUtils.ILI2GPKG_JAR,
                     "ili2gpkg.jar path",
                     os.path.join(jarpath, "ili2gpkg.jar")))
+        ProcessingConfig.addSetting(
+            Setting(self.getDescription(), IliUtils.JAVA_WORKER,
+                    "Reuse running Java VM for ili2c/ili2db calls", False))
 
     def unload(self):
         QgsProcessingProvider.unload(self)
         ProcessingConfig.removeSetting(IliUtils.JAVA_EXEC)
         ProcessingConfig.removeSetting(IliUtils.ILI2PG_JAR)
         ProcessingConfig.removeSetting(IliUtils.ILI2GPKG_JAR)
+        ProcessingConfig.removeSetting(IliUtils.JAVA_WORKER)
 
     def id(self):
         return 'Interlis'
@@ -111,7 +115,7 @@ class InterlisProvider(QgsProcessingProvider):
             Ili2PgSchemaAlgorithm(), Ili2PgImportAlgorithm(),
             Ili2PgExportAlgorithm(), Ili2GpkgSchemaAlgorithm(),
             Ili2GpkgImportAlgorithm(), Ili2GpkgExportAlgorithm(),
-            Ili2ImdAlgorithm()
+            Ili2ImdAlgorithm(), Ili2ImdBatchAlgorithm()
             ]
             
         for alg in self.alglist:
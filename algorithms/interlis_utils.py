@@ -3,6 +3,8 @@ import os
 from qgis.core import QgsMessageLog, Qgis
 from processing.core.ProcessingConfig import ProcessingConfig
 from processing.tools.system import isWindows
+from ..ogrtools.interlis.java_exec import (java_worker, JavaWorkerError,
+                                           JavaWorkerTimeout)
 
 
 class IliUtils:
@@ -10,9 +12,11 @@ class IliUtils:
     JAVA_EXEC = "JAVA_EXEC"
     ILI2PG_JAR = "ILI2PG_JAR"
     ILI2GPKG_JAR = "ILI2GPKG_JAR"
+    JAVA_WORKER = "ILI_JAVA_WORKER"
 
     @staticmethod
     def runShellCmd(args):
+        """Run command, logging its console output. Returns exit status."""
         loglines = []
         loglines.append("Ili execution console output")
         if isWindows():
@@ -28,11 +32,43 @@ class IliUtils:
                                 stdout=subprocess.PIPE,
                                 stdin=subprocess.PIPE,
                                 stderr=subprocess.STDOUT,
-                                universal_newlines=True).stdout
-        for line in iter(proc.readline, ""):
+                                universal_newlines=True)
+        for line in iter(proc.stdout.readline, ""):
             loglines.append(line)
             QgsMessageLog.logMessage(line, level=Qgis.MessageLevel(0))
         IliUtils.consoleOutput = loglines
+        return proc.wait()
+
+    @staticmethod
+    def runJavaJob(args):
+        """Run java with args in warm JVM worker, if enabled in settings.
+        Falls back to a new JVM process per call. Returns exit status."""
+        java = ProcessingConfig.getSetting(IliUtils.JAVA_EXEC)
+        args = [arg for arg in args if arg is not None]
+        if ProcessingConfig.getSetting(IliUtils.JAVA_WORKER):
+            try:
+                QgsMessageLog.logMessage(
+                    'Java worker: ' + ' '.join(args),
+                    level=Qgis.MessageLevel(0))
+                status, output = java_worker(java).run(args)
+                loglines = ["Ili execution console output"]
+                for line in output.splitlines(True):
+                    loglines.append(line)
+                    QgsMessageLog.logMessage(
+                        line, level=Qgis.MessageLevel(0))
+                IliUtils.consoleOutput = loglines
+                if status != 0:
+                    QgsMessageLog.logMessage(
+                        'Java job failed with exit status %d' % status,
+                        level=Qgis.MessageLevel(2))
+                return status
+            except JavaWorkerTimeout as e:
+                QgsMessageLog.logMessage(str(e), level=Qgis.MessageLevel(2))
+                return -1
+            except JavaWorkerError as e:
+                QgsMessageLog.logMessage(str(e), level=Qgis.MessageLevel(1))
+        return IliUtils.runShellCmd(
+            [java, "-Djava.net.useSystemProxies=true"] + args)
 
     @staticmethod
     def java_exec_default():
@@ -44,10 +80,10 @@ class IliUtils:
 
     @staticmethod
     def runJava(jar, args):
-        args = [ProcessingConfig.getSetting(IliUtils.JAVA_EXEC),
-                "-Djava.net.useSystemProxies=true", "-jar", jar] + args
-        IliUtils.runShellCmd(args)
-        return args
+        args = ["-jar", jar] + args
+        IliUtils.runJavaJob(args)
+        return [ProcessingConfig.getSetting(IliUtils.JAVA_EXEC),
+                "-Djava.net.useSystemProxies=true"] + args
 
     @staticmethod
     def runIli2c(args):
@@ -86,11 +122,9 @@ class IliUtils:
 
         jarpath = os.path.abspath(
             os.path.join(os.path.dirname(__file__), '..', 'jars'))
-        args = [ProcessingConfig.getSetting(IliUtils.JAVA_EXEC),
-                "-Djava.net.useSystemProxies=true",
-                "-cp", '"%s/libs/*"' % jarpath,
+        args = ["-cp", '"%s/libs/*"' % jarpath,
                 "ch.interlis.ili2c.Main"] + args
-        IliUtils.runShellCmd(args)
+        return IliUtils.runJavaJob(args)
 
     @staticmethod
     def getConsoleOutput():
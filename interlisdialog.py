@@ -36,6 +36,7 @@ from .pyqtconfig import QSettingsManager
 from .ogrtools.ogrtransform.ogrconfig import OgrConfig
 from .ogrtools.interlis.model_loader import ModelLoader
 from .ogrtools.interlis.ilismeta import ImdParser
+from .ogrtools.interlis.model_cache import use_model_cache
 from .ogrtools.pyogr.singlegeomvrt import ogr2vrt
 
 try:
@@ -49,6 +50,8 @@ class InterlisDialog(QDialog):
     def __init__(self, plugin):
         QDialog.__init__(self)
         self._plugin = plugin
+        # Facts of repeatedly used models are cached in the user cache
+        use_model_cache(True)
         # Set up the user interface from Designer.
         self.ui = Ui_Interlis()
         self.ui.setupUi(self)
@@ -91,7 +94,7 @@ class InterlisDialog(QDialog):
             return fn
 
     def _empty_transfer_ds(self):
-        imd = ImdParser(self.ui.mModelLineEdit.text())
+        imd = ImdParser(self.ui.mModelLineEdit.text(), kinds=['models'])
         transferfn = imd.gen_empty_transfer_file()
         ds = transferfn + "," + self.ui.mModelLineEdit.text()
         return ds
@@ -173,7 +176,7 @@ class InterlisDialog(QDialog):
     def on_mDataFileButton_clicked(self):
         dataFilePath = QFileDialog.getOpenFileName(
             None, "Open Interlis data file", self.ui.mDataLineEdit.text(),
-            "Interlis transfer file (*.itf *.ITF *.xtf *.XTF *.xml);;All files (*.*)")
+            "Interlis transfer file (*.itf *.ITF *.xtf *.XTF *.xml *.gz *.zip);;All files (*.*)")
         if not dataFilePath[0]:
             return  # dialog canceled
         self.ui.mDataLineEdit.setText(dataFilePath[0])
@@ -312,7 +315,7 @@ class InterlisDialog(QDialog):
     def _gen_ogr_config(self, cfg, fn):
         format = 'PostgreSQL'
         cfgjson = cfg.generate_config(
-            format, outfile=fn, layer_list=[], srs="EPSG:21781")
+            format, outfile=fn, layer_list=[], srs="EPSG:21781", cache=True)
         qDebug(cfgjson)
 
     def _set_stroke_curve_option(self):
@@ -374,18 +377,32 @@ class InterlisDialog(QDialog):
         cfg = self._ogr_config_tmp(self._empty_transfer_ds())
         self._log_output(
             "Create schema from %s" % self.ui.mModelLineEdit.text())
-        ogroutput = cfg.transform(
-            dest=self.pgDs(), skipfailures=self.ui.cbSkipFailures.isChecked(),
-            debug=True)
+        try:
+            cfg.transform(
+                dest=self.pgDs(),
+                skipfailures=self.ui.cbSkipFailures.isChecked(), debug=True)
+        except ValueError as e:
+            self._remove_ogrconfig_tmp()
+            self._log_error(e)
+            return
         self._remove_ogrconfig_tmp()
         self._log_output("Import finished")
 
     def importtodb(self):
         self._log_output("Import data from %s" % self.iliDs())
         cfg = self._ogr_config_tmp(self.iliDs())
-        ogroutput = cfg.transform(
-            dest=self.pgDs(), skipfailures=self.ui.cbSkipFailures.isChecked(),
-            debug=True)
+        try:
+            ogroutput = cfg.transform(
+                dest=self.pgDs(),
+                skipfailures=self.ui.cbSkipFailures.isChecked(),
+                debug=True, checkpoint=True,
+                resume=self.ui.cbResume.isChecked())
+        except ValueError as e:
+            # Failed features without skipfailures
+            self._remove_ogrconfig_tmp()
+            self._log_output(cfg.ogr_log().text())
+            self._log_error(e)
+            return
         self._remove_ogrconfig_tmp()
         self._plugin.messageLogWidget().show()
         self._log_output(ogroutput)
@@ -435,6 +452,11 @@ class InterlisDialog(QDialog):
             QDockWidget, 'MessageLog')
         logDock.show()
 
+    def _log_error(self, error):
+        self._show_log_window()
+        QgsApplication.messageLog().logMessage(
+            "Import failed: %s" % error, "Interlis", Qgis.MessageLevel(2))
+
     def _log_output(self, output, lines_per_msg=None):
         if lines_per_msg is None:
             QgsApplication.messageLog().logMessage(output, "Interlis",
@@ -6,6 +6,7 @@ import sys
 from ogrtools.pyogr.ogrinfo import ogrinfo, ogr_formats, ogr_version_info
 from ogrtools.pyogr.ogrvrt import ogr2vrt
 from ogrtools.ogrtransform.ogrconfig import OgrConfig
+from ogrtools.interlis.xtf_diff import TransferDiff
 
 
 def info(args):
@@ -41,7 +42,8 @@ def vrt(args):
 def genconfig(args):
     trans = OgrConfig(ds=args.source, model=args.model)
     print(trans.generate_config(args.format, layer_list=args.layers,
-                                srs=args.srs))
+                                srs=args.srs, dst_srs=args.dst_srs,
+                                cache=args.cache))
     return 0
 
 
@@ -49,7 +51,7 @@ def write_enums(args):
     if args.debug:
         os.environ["CPL_DEBUG"] = "on"
     trans = OgrConfig(config=args.config)
-    print(trans.write_enum_tables(args.dest, args.format, args.debug))
+    print(trans.write_enum_tables(args.dest, args.format, debug=args.debug))
     return 0
 
 
@@ -59,10 +61,51 @@ def transform(args):
     trans = OgrConfig(config=args.config, ds=args.source)
     if args.reverse:
         trans.transform_reverse(args.dest, args.format,
-                                layers=args.layers, debug=args.debug)
+                                layers=args.layers, debug=args.debug,
+                                skipfailures=args.skipfailures,
+                                group_transactions=args.gt)
+    elif args.delta:
+        counts = trans.transform_delta(args.dest, args.format,
+                                       layers=args.layers, debug=args.debug,
+                                       group_transactions=args.gt)
+        for layer, layer_counts in sorted(counts.items()):
+            sys.stderr.write(
+                "%s: %d inserted, %d updated, %d deleted, %d unchanged\n" % (
+                    layer, layer_counts['inserted'], layer_counts['updated'],
+                    layer_counts['deleted'], layer_counts['unchanged']))
     else:
         trans.transform(args.dest, args.format,
-                        layers=args.layers, debug=args.debug)
+                        layers=args.layers, debug=args.debug,
+                        skipfailures=args.skipfailures,
+                        group_transactions=args.gt,
+                        parallel=args.jobs is not None,
+                        max_workers=args.jobs, bulk=args.bulk,
+                        baskets=args.baskets,
+                        checkpoint=args.checkpoint, resume=args.resume)
+        if args.jobs is not None:
+            for layer, elapsed in sorted(trans.layer_timings().items(),
+                                         key=lambda item: -item[1]):
+                sys.stderr.write("%s: %.2fs\n" % (layer, elapsed))
+    return 0
+
+
+def diff(args):
+    changes = TransferDiff(args.old, args.new)
+    try:
+        if args.format == 'xtf':
+            changes.write_changeset(args.output)
+        elif args.output:
+            with open(args.output, "w") as f:
+                changes.write_json(f)
+        else:
+            changes.write_json(sys.stdout)
+        for cls, counts in sorted(changes.counts().items()):
+            sys.stderr.write(
+                "%s: %d inserted, %d updated, %d deleted\n" % (
+                    cls, counts['insert'], counts['update'],
+                    counts['delete']))
+    finally:
+        changes.close()
     return 0
 
 
@@ -118,6 +161,11 @@ def main():
     subparser.add_argument('--model', default=None,
                            help='Data model specification')
     subparser.add_argument('--srs', default=None, help='Assign SRS to layers')
+    subparser.add_argument('--dst-srs', default=None,
+                           help='Reproject layers into SRS')
+    subparser.add_argument('--cache', default=False, action='store_true',
+                           help='Reuse configurations cached for the same '
+                           'schema')
     subparser.set_defaults(func=genconfig)
 
     subparser = subparsers.add_parser(
@@ -141,9 +189,47 @@ def main():
                            help='Reverse transformation')
     subparser.add_argument('--format', default=None, help='Destination format')
     subparser.add_argument('--config', help='OGR configuration')
+    subparser.add_argument('--skipfailures', default=False,
+                           action='store_true',
+                           help='Continue after a failure, skipping the '
+                           'failed feature')
+    subparser.add_argument('--gt', type=int, default=None,
+                           help='Group n features per transaction '
+                           '(default depends on destination format)')
+    subparser.add_argument('--jobs', type=int, default=None,
+                           help='Transform layers in parallel processes')
+    subparser.add_argument('--bulk', default=False, action='store_true',
+                           help='Load PostgreSQL tables with COPY into '
+                           'staging tables replacing the existing tables')
+    subparser.add_argument('--baskets', default=False, action='store_true',
+                           help='Transform XTF file basket by basket')
+    subparser.add_argument('--delta', default=False, action='store_true',
+                           help='Update existing layers with changed '
+                           'features, matched by TID')
+    subparser.add_argument('--checkpoint', default=False,
+                           action='store_true',
+                           help='Record committed features in a journal '
+                           'for resuming an interrupted transformation')
+    subparser.add_argument('--resume', default=False, action='store_true',
+                           help='Continue an interrupted transformation '
+                           'after the last committed transaction')
     subparser.set_defaults(func=transform)
 
+    subparser = subparsers.add_parser(
+        'diff', help='Changes between two versions of an XTF transfer file')
+    subparser.add_argument('old', help='old transfer file')
+    subparser.add_argument('new', help='new transfer file')
+    subparser.add_argument('--format', default='json',
+                           choices=['json', 'xtf'],
+                           help='JSON with TIDs per class or incremental '
+                           'transfer file')
+    subparser.add_argument('--output', default=None,
+                           help='Output file (default: stdout for JSON)')
+    subparser.set_defaults(func=diff)
+
     args = parser.parse_args()
+    if args.func == diff and args.format == 'xtf' and not args.output:
+        parser.error("--output is required for XTF changesets")
     return args.func(args)
 
 
@@ -0,0 +1,121 @@
+import re
+from .transfer_file import open_transfer
+
+CHUNK_SIZE = 1024 * 1024
+
+# Start tag with BID attribute (INTERLIS 2.3 BID, 2.4 ili:bid)
+BASKET_RE = re.compile(
+    br'<([\w.:-]+)\s[^<>]*?\b(?:\w+:)?bid\s*=\s*"([^"]*)"', re.IGNORECASE)
+DATASECTION_END_RE = re.compile(
+    br'</(?:\w+:)?datasection\s*>', re.IGNORECASE)
+
+
+class BasketIndex:
+
+    """Byte offsets of the baskets in an XTF transfer file
+
+    The file is scanned in chunks, without parsing XML. Each basket can
+    be written as a transfer file of its own, consisting of the header,
+    the basket and the end of the original file.
+    """
+
+    def __init__(self, fn, chunk_size=CHUNK_SIZE):
+        self.fn = fn
+        self.baskets = []  # (BID, start offset, end offset)
+        self.footer_start = None  # Offset of DATASECTION end tag
+        self._scan(chunk_size)
+
+    def _scan(self, chunk_size):
+        starts = []
+        offset = 0  # file offset of buf
+        buf = b''
+        with open_transfer(self.fn) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                buf += chunk
+                # Tags before the last '<' are complete
+                cut = buf.rfind(b'<') if chunk else len(buf)
+                if cut == -1:
+                    cut = len(buf)
+                elif cut == 0 and chunk:
+                    continue
+                part = buf[:cut]
+                for m in BASKET_RE.finditer(part):
+                    starts.append((m.group(2).decode('utf-8'),
+                                   offset + m.start()))
+                m = DATASECTION_END_RE.search(part)
+                if m is not None:
+                    self.footer_start = offset + m.start()
+                    break
+                offset += cut
+                buf = buf[cut:]
+                if not chunk:
+                    break
+        if self.footer_start is None:
+            return
+        for idx, (bid, start) in enumerate(starts):
+            if idx + 1 < len(starts):
+                end = starts[idx + 1][1]
+            else:
+                end = self.footer_start
+            self.baskets.append((bid, start, end))
+
+    def header_end(self):
+        """Offset of first basket"""
+        if not self.baskets:
+            return self.footer_start
+        return self.baskets[0][1]
+
+    def write_baskets(self, outfns, chunk_size=CHUNK_SIZE):
+        """Write a transfer file per basket, outfns[idx] containing basket
+        idx only.
+
+        The file is read once from start to end, so compressed streams
+        are decompressed only once.
+        """
+        with open_transfer(self.fn) as f:
+            header = f.read(self.header_end())
+            pos = len(header)
+            for (bid, start, end), outfn in zip(self.baskets, outfns):
+                with open(outfn, "wb") as out:
+                    out.write(header)
+                    # Skip data between baskets
+                    while pos < start:
+                        data = f.read(min(chunk_size, start - pos))
+                        if not data:
+                            break
+                        pos += len(data)
+                    while pos < end:
+                        data = f.read(min(chunk_size, end - pos))
+                        if not data:
+                            break
+                        out.write(data)
+                        pos += len(data)
+            f.seek(self.footer_start)
+            footer = f.read()
+        for outfn in outfns[:len(self.baskets)]:
+            with open(outfn, "ab") as out:
+                out.write(footer)
+
+    def write_basket(self, idx, outfn, chunk_size=CHUNK_SIZE):
+        """Write transfer file containing basket idx only.
+
+        For compressed files, write_baskets avoids decompressing the file
+        for each basket.
+        """
+        bid, start, end = self.baskets[idx]
+        with open_transfer(self.fn) as f:
+            with open(outfn, "wb") as out:
+                for begin, stop in [(0, self.header_end()), (start, end),
+                                    (self.footer_start, None)]:
+                    f.seek(begin)
+                    pos = begin
+                    while stop is None or pos < stop:
+                        size = chunk_size
+                        if stop is not None:
+                            size = min(size, stop - pos)
+                        data = f.read(size)
+                        if not data:
+                            break
+                        out.write(data)
+                        pos += len(data)
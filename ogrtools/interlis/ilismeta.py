@@ -32,15 +32,72 @@ DISPLAY_ATTRS = {
 
 IGNORED_EDGE_TAGS = ["ElementInPackage", "AllowedInBasket", "AxisSpec", "Unit"]
 
+# ModelData elements collected for each kind in streaming mode
+ELEMENT_KINDS = {
+    "models": ["Model", "SubModel"],
+    "enums": ["EnumType", "EnumNode"],
+    "classes": ["Class", "AttrOrParam", "Role", "BaseClass"]
+    }
+
 
 class ImdParser():
 
-    def __init__(self, fn):
-        self._tree = ElementTree.parse(fn)
+    def __init__(self, fn, kinds=None):
+        """Parse IlisMeta file fn.
+
+        If kinds is given (e.g. ['models', 'enums']), the file is streamed
+        and only ModelData elements of these kinds are kept in memory.
+        """
+        if kinds is None:
+            self._tree = ElementTree.parse(fn)
+        else:
+            self._tree = self._parse_stream(fn, kinds)
         # Extract default namespace from root e.g.
         # {http://www.interlis.ch/INTERLIS2.3}TRANSFER
         self._ns = {
             'xmlns': re.match(r'^{(.+)}', self._tree.getroot().tag).group(1)}
+        self._enum_nodes = None
+
+    def _parse_stream(self, fn, kinds):
+        """Build tree with selected ModelData elements using iterparse"""
+        tags = set()
+        for kind in kinds:
+            if kind not in ELEMENT_KINDS:
+                raise ValueError("Unknown IlisMeta element kind '%s'" % kind)
+            tags.update(ELEMENT_KINDS[kind])
+
+        root = None
+        datasection = None
+        basket = None
+        stack = []  # Open elements of the source document
+        for event, elem in ElementTree.iterparse(fn, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem)
+                depth = len(stack)
+                if depth == 1:
+                    ns = re.match(r'^{(.+)}', elem.tag).group(1)
+                    prefix = '{%s}IlisMeta07.ModelData.' % ns
+                    root = ElementTree.Element(elem.tag)
+                elif depth == 2 and elem.tag == '{%s}DATASECTION' % ns:
+                    datasection = ElementTree.SubElement(root, elem.tag)
+                elif depth == 3 and datasection is not None:
+                    basket = ElementTree.SubElement(
+                        datasection, elem.tag, elem.attrib)
+                continue
+
+            depth = len(stack)
+            if depth == 4 and basket is not None:
+                if elem.tag.startswith(prefix) and \
+                        elem.tag[len(prefix):] in tags:
+                    basket.append(elem)
+            if depth in (2, 3, 4):
+                # Completed elements are always the last child of their
+                # parent, so removing them keeps the source tree flat
+                stack[-2].remove(elem)
+            if depth == 3:
+                basket = None
+            stack.pop()
+        return ElementTree.ElementTree(root)
 
     def models(self):
         modelnodes = self._tree.findall(
@@ -75,88 +132,155 @@ class ImdParser():
     def extract_enums(self):
         """Extract Interlis Enumerations"""
         enum_tables = {}
-        self._enum_types = self._tree.findall(
-            "xmlns:DATASECTION/xmlns:IlisMeta07.ModelData/xmlns:IlisMeta07.ModelData.EnumType", self._ns)
-        self._enum_nodes = self._tree.findall(
-            "xmlns:DATASECTION/xmlns:IlisMeta07.ModelData/xmlns:IlisMeta07.ModelData.EnumNode", self._ns)
-        if self._enum_nodes is not None:
-            # Collect parent enums (only leaf nodes have to be added as enums)
-            parent_nodes = set()
-            for enumNode in self._enum_nodes:
-                parent = enumNode.find("xmlns:ParentNode", self._ns)
-                if parent is not None:
-                    parent_nodes.add(parent.get("REF"))
-
-            # Collect top self._enum_nodes
-            self._top_nodes = {}  # top node => [leaf nodes]
-            for enumNode in self._enum_nodes:
-                parent = enumNode.find("xmlns:ParentNode", self._ns)
-                if parent is None:
-                    self._top_nodes[enumNode] = []
-
-            # Collect leafs
-            for enumNode in self._enum_nodes:
-                top_node = self._find_top_node(enumNode)
-                if enumNode.get("TID") not in parent_nodes:
-                    leafs = self._top_nodes[top_node]
-                    leafs.append(enumNode)
-
-            for top_node in self._top_nodes.keys():
-                enum_table = []
-                self._collect_enums(top_node, enum_table, 0)
-                enumTypeName = top_node.find(
-                    "xmlns:EnumType", self._ns).get('REF')
-                enumTypeName = str.replace(enumTypeName, '.TYPE', '')
-                enum_tables[enumTypeName] = enum_table
+        self._index_enums()
+        for top_tid in self._top_nodes.keys():
+            enum_table = []
+            self._collect_enums(top_tid, enum_table, 0)
+            enumTypeName = self._enum_type_refs[top_tid]
+            enumTypeName = str.replace(enumTypeName, '.TYPE', '')
+            enum_tables[enumTypeName] = enum_table
 
         return enum_tables
 
-    def _find_top_node(self, enumNode):
+    def enum_values(self, enum_type_tid):
+        """Enum table of a single EnumType (None if type has no values)"""
+        self._index_enums()
+        top_tid = self._type_top_nodes.get(enum_type_tid)
+        if top_tid is None:
+            return None
+        enum_table = []
+        self._collect_enums(top_tid, enum_table, 0)
+        return enum_table
+
+    def _index_enums(self):
+        """Build TID-keyed lookup tables of EnumType/EnumNode relations"""
+        if self._enum_nodes is not None:
+            return
+        self._enum_types = {}  # EnumType TID => EnumType
+        for node in self._tree.findall(
+                "xmlns:DATASECTION/xmlns:IlisMeta07.ModelData/xmlns:IlisMeta07.ModelData.EnumType", self._ns):
+            self._enum_types[node.get("TID")] = node
+
+        self._enum_nodes = []  # EnumNode TIDs in document order
+        self._parent_refs = {}  # EnumNode TID => parent EnumNode TID
+        self._enum_type_refs = {}  # top node TID => EnumType TID
+        for node in self._tree.findall(
+                "xmlns:DATASECTION/xmlns:IlisMeta07.ModelData/xmlns:IlisMeta07.ModelData.EnumNode", self._ns):
+            tid = node.get("TID")
+            self._enum_nodes.append(tid)
+            parent = node.find("xmlns:ParentNode", self._ns)
+            if parent is not None:
+                self._parent_refs[tid] = parent.get("REF")
+            else:
+                self._enum_type_refs[tid] = node.find(
+                    "xmlns:EnumType", self._ns).get('REF')
+
+        # Collect top nodes (only leaf nodes have to be added as enums)
+        self._top_nodes = {}  # top node TID => [leaf node TIDs]
+        self._type_top_nodes = {}  # EnumType TID => top node TID
+        for tid, enum_type in self._enum_type_refs.items():
+            self._top_nodes[tid] = []
+            self._type_top_nodes.setdefault(enum_type, tid)
+
+        # Collect leafs
+        parent_nodes = set(self._parent_refs.values())
+        self._top_node_refs = {}  # EnumNode TID => top node TID
+        for tid in self._enum_nodes:
+            top_tid = self._find_top_node(tid)
+            if tid not in parent_nodes:
+                self._top_nodes[top_tid].append(tid)
+
+    def _find_top_node(self, tid):
         # <IlisMeta07.ModelData.EnumNode TID="RoadsExdm2ien.RoadsExtended.RoadSign.Type.TYPE.TOP.prohibition.noparking">
         #   <Name>noparking</Name>
         #   <Abstract>false</Abstract>
         #   <Final>false</Final>
         #   <ParentNode REF="RoadsExdm2ien.RoadsExtended.RoadSign.Type.TYPE.TOP.prohibition" ORDER_POS="2" />
         # </IlisMeta07.ModelData.EnumNode>
-        if enumNode in self._top_nodes:
-            return enumNode
-        else:
-            parent_tid = enumNode.find("xmlns:ParentNode", self._ns).get('REF')
-            for node in self._enum_nodes:
-                if parent_tid == node.get('TID'):
-                    return self._find_top_node(node)
-
-    def _collect_enums(self, top_node, enum_table, idx):
-        """Add leafes of top_node to enum_table"""
-        # Find enum type
-        enumTypeName = top_node.find("xmlns:EnumType", self._ns).get('REF')
-        for node in self._enum_types:
-            if enumTypeName == node.get('TID'):
-                enumType = node
+        path = []
+        while tid is not None and tid not in self._top_nodes:
+            if tid in self._top_node_refs:
+                tid = self._top_node_refs[tid]
                 break
+            path.append(tid)
+            tid = self._parent_refs.get(tid)
+        # Remember result for all nodes on the way up
+        for node_tid in path:
+            self._top_node_refs[node_tid] = tid
+        return tid
+
+    def _collect_enums(self, top_tid, enum_table, idx):
+        """Add leafes of top node to enum_table"""
+        enumType = self._enum_types[self._enum_type_refs[top_tid]]
 
         # Handle type inheritance
         superRef = enumType.find("xmlns:Super", self._ns)
         if superRef is not None:
-            superTypeName = superRef.get('REF')
-            for node in self._top_nodes.keys():
-                if superTypeName == node.find("xmlns:EnumType", self._ns).get('REF'):
-                    idx = self._collect_enums(node, enum_table, idx)
-                    break
+            super_top_tid = self._type_top_nodes.get(superRef.get('REF'))
+            if super_top_tid is not None:
+                idx = self._collect_enums(super_top_tid, enum_table, idx)
 
         # Add leafes
-        for enumNode in self._top_nodes[top_node]:
+        for tid in self._top_nodes[top_tid]:
             enum_record = {}
             enum_record["id"] = idx  # str(idx)
             idx = idx + 1
-            enum = str.replace(
-                enumNode.get("TID"), top_node.get("TID") + '.', '')
+            enum = str.replace(tid, top_tid + '.', '')
             enum_record["enum"] = enum
             enum_record["enumtxt"] = enum
             enum_table.append(enum_record)
 
         return idx
 
+    def extract_classes(self):
+        """Extract classes with their attributes and association roles"""
+        classes = {}
+        modeldata = "xmlns:DATASECTION/xmlns:IlisMeta07.ModelData/xmlns:IlisMeta07.ModelData."
+        for node in self._tree.findall(modeldata + "Class", self._ns):
+            superRef = node.find("xmlns:Super", self._ns)
+            packageRef = node.find("xmlns:ElementInPackage", self._ns)
+            classes[node.get("TID")] = {
+                'name': node.find("xmlns:Name", self._ns).text,
+                'kind': node.find("xmlns:Kind", self._ns).text,
+                'package': packageRef.get("REF") if packageRef is not None else None,
+                'super': superRef.get("REF") if superRef is not None else None,
+                'attributes': [],
+                'roles': []
+                }
+
+        for node in self._tree.findall(modeldata + "AttrOrParam", self._ns):
+            parent = node.find("xmlns:AttrParent", self._ns)
+            if parent is None or parent.get("REF") not in classes:
+                continue  # e.g. function parameters
+            typeRef = node.find("xmlns:Type", self._ns)
+            classes[parent.get("REF")]['attributes'].append({
+                'name': node.find("xmlns:Name", self._ns).text,
+                'type': typeRef.get("REF") if typeRef is not None else None,
+                'pos': int(parent.get("ORDER_POS", 0))
+                })
+
+        # Role target classes are defined by BaseClass relations
+        targets = {}
+        for node in self._tree.findall(modeldata + "BaseClass", self._ns):
+            crt = node.find("xmlns:CRT", self._ns)
+            base = node.find("xmlns:BaseClass", self._ns)
+            if crt is not None and base is not None:
+                targets[crt.get("REF")] = base.get("REF")
+        for node in self._tree.findall(modeldata + "Role", self._ns):
+            assoc = node.find("xmlns:Association", self._ns)
+            if assoc is None or assoc.get("REF") not in classes:
+                continue
+            classes[assoc.get("REF")]['roles'].append({
+                'name': node.find("xmlns:Name", self._ns).text,
+                'target': targets.get(node.get("TID")),
+                'pos': int(assoc.get("ORDER_POS", 0))
+                })
+
+        for cls in classes.values():
+            cls['attributes'].sort(key=lambda attr: attr['pos'])
+            cls['roles'].sort(key=lambda role: role['pos'])
+        return classes
+
     def extract_enums_asgml(self):
         """Extract Interlis Enumerations as GML"""
         enum_tables = self.extract_enums()
@@ -273,6 +397,8 @@ def main(argv):
     elif output == 'enumjson':
         enum_tables = parser.extract_enums()
         print(json.dumps(enum_tables, indent=2))
+    elif output == 'classjson':
+        print(json.dumps(parser.extract_classes(), indent=2))
     elif output == 'dot':
         # ./ogrtools/interlis/ilismeta.py dot tests/data/ili/RoadsExdm2ien.imd
         # | dot -Tsvg >tests/data/ili/RoadsExdm2ien.imd.svg
@@ -0,0 +1,184 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.File;
+import java.io.FileDescriptor;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.security.Permission;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.jar.Attributes;
+import java.util.jar.JarFile;
+import java.util.jar.Manifest;
+
+/**
+ * Long-lived JVM executing Java main classes for ogrtools.
+ *
+ * Jobs are read from stdin, one per line, with tab separated fields:
+ *   -jar JARFILE ARGS...
+ *   -cp CLASSPATH MAINCLASS ARGS...
+ * For each job the worker writes "EXIT status nbytes" followed by
+ * nbytes of captured stdout/stderr output (UTF-8).
+ * Class loaders are kept per jar/classpath, so loaded and compiled
+ * classes are reused by later jobs.
+ * The worker prints READY on startup, or UNSUPPORTED if System.exit
+ * calls of jobs can't be trapped.
+ */
+public class JavaWorker {
+
+    private static final Map<String, ClassLoader> loaders =
+        new HashMap<String, ClassLoader>();
+
+    static class ExitTrappedException extends SecurityException {
+        final int status;
+
+        ExitTrappedException(int status) {
+            super("System.exit(" + status + ")");
+            this.status = status;
+        }
+    }
+
+    @SuppressWarnings("removal")
+    private static boolean installExitTrap() {
+        try {
+            System.setSecurityManager(new SecurityManager() {
+                @Override
+                public void checkPermission(Permission perm) {
+                }
+
+                @Override
+                public void checkPermission(Permission perm, Object context) {
+                }
+
+                @Override
+                public void checkExit(int status) {
+                    throw new ExitTrappedException(status);
+                }
+            });
+            return true;
+        } catch (UnsupportedOperationException | SecurityException e) {
+            return false;
+        }
+    }
+
+    private static URL[] classpathUrls(String classpath) throws Exception {
+        List<URL> urls = new ArrayList<URL>();
+        for (String entry : classpath.split(File.pathSeparator)) {
+            if (entry.endsWith("*")) {
+                File[] jars = new File(entry.substring(0, entry.length() - 1))
+                    .listFiles();
+                if (jars != null) {
+                    Arrays.sort(jars);
+                    for (File jar : jars) {
+                        if (jar.getName().endsWith(".jar")) {
+                            urls.add(jar.toURI().toURL());
+                        }
+                    }
+                }
+            } else if (!entry.isEmpty()) {
+                urls.add(new File(entry).toURI().toURL());
+            }
+        }
+        return urls.toArray(new URL[0]);
+    }
+
+    private static ClassLoader loader(String key, URL[] urls) {
+        ClassLoader cl = loaders.get(key);
+        if (cl == null) {
+            cl = new URLClassLoader(urls, ClassLoader.getPlatformClassLoader());
+            loaders.put(key, cl);
+        }
+        return cl;
+    }
+
+    private static int run(String[] fields) throws Throwable {
+        ClassLoader cl;
+        String mainClass;
+        int argsStart;
+        if (fields.length >= 2 && fields[0].equals("-jar")) {
+            File jar = new File(fields[1]).getAbsoluteFile();
+            Attributes attrs;
+            try (JarFile jf = new JarFile(jar)) {
+                Manifest manifest = jf.getManifest();
+                attrs = manifest.getMainAttributes();
+            }
+            mainClass = attrs.getValue(Attributes.Name.MAIN_CLASS);
+            List<URL> urls = new ArrayList<URL>();
+            urls.add(jar.toURI().toURL());
+            String manifestCp = attrs.getValue(Attributes.Name.CLASS_PATH);
+            if (manifestCp != null) {
+                for (String entry : manifestCp.trim().split("\\s+")) {
+                    urls.add(new URL(jar.toURI().toURL(), entry));
+                }
+            }
+            cl = loader("-jar " + jar, urls.toArray(new URL[0]));
+            argsStart = 2;
+        } else if (fields.length >= 3 && fields[0].equals("-cp")) {
+            cl = loader("-cp " + fields[1], classpathUrls(fields[1]));
+            mainClass = fields[2];
+            argsStart = 3;
+        } else {
+            System.err.println("Invalid job: " + String.join(" ", fields));
+            return 2;
+        }
+        String[] args = Arrays.copyOfRange(fields, argsStart, fields.length);
+        Thread.currentThread().setContextClassLoader(cl);
+        Method main = Class.forName(mainClass, true, cl)
+            .getMethod("main", String[].class);
+        try {
+            main.invoke(null, (Object) args);
+        } catch (InvocationTargetException e) {
+            throw e.getCause();
+        }
+        return 0;
+    }
+
+    public static void main(String[] argv) throws Exception {
+        PrintStream out = new PrintStream(
+            new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        if (!installExitTrap()) {
+            out.print("UNSUPPORTED\n");
+            out.flush();
+            return;
+        }
+        out.print("READY\n");
+        out.flush();
+        BufferedReader in = new BufferedReader(
+            new InputStreamReader(System.in, StandardCharsets.UTF_8));
+        String line;
+        while ((line = in.readLine()) != null) {
+            ByteArrayOutputStream buf = new ByteArrayOutputStream();
+            PrintStream capture = new PrintStream(buf, true, "UTF-8");
+            PrintStream stdout = System.out;
+            PrintStream stderr = System.err;
+            System.setOut(capture);
+            System.setErr(capture);
+            int status;
+            try {
+                status = run(line.split("\t", -1));
+            } catch (ExitTrappedException e) {
+                status = e.status;
+            } catch (Throwable t) {
+                t.printStackTrace(capture);
+                status = 1;
+            } finally {
+                System.setOut(stdout);
+                System.setErr(stderr);
+            }
+            capture.flush();
+            byte[] output = buf.toByteArray();
+            out.print("EXIT " + status + " " + output.length + "\n");
+            out.write(output);
+            out.flush();
+        }
+    }
+}
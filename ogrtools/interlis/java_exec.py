@@ -1,6 +1,16 @@
+import os
 import sys
+import shlex
+import atexit
+import threading
 import subprocess
 
+WORKER_SOURCE = os.path.join(
+    os.path.dirname(__file__), 'java', 'JavaWorker.java')
+
+# Seconds to wait for the result of a Java worker job
+WORKER_TIMEOUT = 3600
+
 
 def run_shell_cmd(args):
     if is_windows():
@@ -28,6 +38,171 @@ def java_exec():
     return java
 
 
+class JavaWorkerError(Exception):
+    pass
+
+
+class JavaWorkerTimeout(JavaWorkerError):
+    pass
+
+
+class JavaJobError(Exception):
+
+    """Java job run in the worker exited with a non-zero status"""
+
+    def __init__(self, status, output):
+        Exception.__init__(
+            self, "Java job failed with exit status %d:\n%s" % (
+                status, output))
+        self.status = status
+        self.output = output
+
+
+class JavaWorker:
+
+    """Long-lived JVM running Java main classes sent over a pipe
+
+    Loaded classes are kept between jobs, which saves the JVM startup
+    and class loading time of a new process per call.
+    Requires Java 11 or later for launching the worker source file. A
+    failed start is remembered, later jobs fail without starting a JVM.
+    Jobs are run one after the other, so concurrent callers (e.g.
+    compile_models) are serialized by the worker. A worker not answering
+    within timeout seconds is killed.
+    """
+
+    def __init__(self, java=None, timeout=WORKER_TIMEOUT):
+        self._java = java or java_exec()
+        self._timeout = timeout
+        self._cwd = os.getcwd()
+        self._proc = None
+        self._start_error = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._start_error is not None:
+            raise self._start_error
+        try:
+            self._start()
+        except JavaWorkerError as e:
+            self._start_error = e
+            raise
+
+    def _start(self):
+        # Java 18+ needs explicit permission for trapping System.exit
+        for flags in [["-Djava.security.manager=allow"], []]:
+            try:
+                proc = subprocess.Popen(
+                    [self._java, "-Djava.net.useSystemProxies=true"] +
+                    flags + [WORKER_SOURCE],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL, cwd=self._cwd)
+            except OSError as e:
+                raise JavaWorkerError("Couldn't start Java worker: %s" % e)
+            if proc.stdout.readline() == b"READY\n":
+                self._proc = proc
+                return
+            proc.kill()
+            proc.wait()
+        raise JavaWorkerError("Java worker not supported by %s" % self._java)
+
+    def is_running(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def run(self, args):
+        """Run job with shell quoted java arguments
+        (e.g. ['-jar', 'ili2c.jar', ...]).
+        Returns exit status and console output."""
+        fields = shlex.split(' '.join(args), posix=not is_windows())
+        if is_windows():
+            fields = [field.strip('"') for field in fields]
+        if any(("\t" in field or "\n" in field) for field in fields):
+            raise JavaWorkerError("Arguments not supported by Java worker")
+        with self._lock:
+            if not self.is_running():
+                self.start()
+            # Killing a hung worker ends the blocking reads below
+            timer = threading.Timer(self._timeout, self._proc.kill)
+            timer.start()
+            try:
+                self._proc.stdin.write(
+                    ("\t".join(fields) + "\n").encode('utf-8'))
+                self._proc.stdin.flush()
+                header = self._proc.stdout.readline().split()
+                if len(header) != 3 or header[0] != b"EXIT":
+                    raise JavaWorkerError("Java worker terminated")
+                output = self._proc.stdout.read(int(header[2]))
+                if len(output) != int(header[2]):
+                    raise JavaWorkerError("Java worker terminated")
+            except (IOError, ValueError, JavaWorkerError) as e:
+                timed_out = not timer.is_alive()
+                self.close()
+                if timed_out:
+                    raise JavaWorkerTimeout(
+                        "Java worker timed out after %ss" % self._timeout)
+                if isinstance(e, JavaWorkerError):
+                    raise
+                raise JavaWorkerError("Java worker failed: %s" % e)
+            finally:
+                timer.cancel()
+        return int(header[1]), output.decode('utf-8', 'replace')
+
+    def close(self):
+        if self._proc is not None:
+            try:
+                self._proc.stdin.close()
+                self._proc.wait(5)
+            except (IOError, subprocess.TimeoutExpired):
+                self._proc.kill()
+            self._proc = None
+
+
+_workers = {}  # (java, cwd) => JavaWorker
+_use_worker = os.getenv("OGRTOOLS_JAVA_WORKER", "").upper() in (
+    "1", "ON", "YES", "TRUE")
+
+
+def use_java_worker(enabled=True):
+    """Run Java calls in a warm JVM worker instead of a new process"""
+    global _use_worker
+    _use_worker = enabled
+
+
+def java_worker(java=None):
+    """Shared JavaWorker for java executable and current directory"""
+    key = (java or java_exec(), os.getcwd())
+    if key not in _workers:
+        _workers[key] = JavaWorker(key[0])
+    return _workers[key]
+
+
+@atexit.register
+def close_java_workers():
+    for worker in _workers.values():
+        worker.close()
+    _workers.clear()
+
+
+def run_java_job(java, args):
+    """Run java with args, in the JVM worker if enabled
+
+    Raises JavaJobError, when a worker job exits with a non-zero status
+    and JavaWorkerTimeout for a hung worker.
+    """
+    if _use_worker:
+        try:
+            status, output = java_worker(java).run(args)
+        except JavaWorkerTimeout:
+            raise
+        except JavaWorkerError:
+            # Fall back to a new JVM process per call
+            pass
+        else:
+            if status != 0:
+                raise JavaJobError(status, output)
+            return output
+    return run_shell_cmd([java, "-Djava.net.useSystemProxies=true"] + args)
+
+
 def run_java(jar, args):
-    args = [java_exec(), "-Djava.net.useSystemProxies=true", "-jar", jar] + args
-    return run_shell_cmd(args)
+    return run_java_job(java_exec(), ["-jar", jar] + args)
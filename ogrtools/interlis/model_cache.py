@@ -0,0 +1,118 @@
+import os
+import hashlib
+import json
+import sqlite3
+import zlib
+from .ilismeta import ImdParser
+
+# Cached facts of other versions are not used after changes of the
+# extracted facts
+FACTS_VERSION = 1
+
+_use_cache = os.getenv("OGRTOOLS_MODEL_CACHE", "").upper() in (
+    "1", "ON", "YES", "TRUE")
+
+
+def default_cache_dir():
+    """Directory for ogrtools caches (OGRTOOLS_CACHE_DIR or user cache)"""
+    cache_dir = os.getenv("OGRTOOLS_CACHE_DIR")
+    if not cache_dir:
+        base = os.getenv("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(base, "ogrtools")
+    return cache_dir
+
+
+def use_model_cache(enabled=True):
+    """Cache facts of IlisMeta models used by transformations"""
+    global _use_cache
+    _use_cache = enabled
+
+
+def model_cache_enabled():
+    return _use_cache
+
+
+def file_hash(fn):
+    """SHA1 hex digest of file content"""
+    sha = hashlib.sha1()
+    with open(fn, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class ModelCache:
+
+    """Persistent cache of facts extracted from IlisMeta models
+
+    Model names, enum tables and the class/attribute graph are stored
+    zlib compressed in a SQLite database, keyed by the content hash of
+    the IMD file and FACTS_VERSION.
+    """
+
+    def __init__(self, cache_dir=None):
+        self._cache_dir = cache_dir or default_cache_dir()
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            if not os.path.isdir(self._cache_dir):
+                os.makedirs(self._cache_dir)
+            self._db = sqlite3.connect(
+                os.path.join(self._cache_dir, "ilismeta.sqlite"))
+            self._db.execute("CREATE TABLE IF NOT EXISTS imd "
+                             "(hash TEXT PRIMARY KEY, facts BLOB)")
+        return self._db
+
+    def _lookup(self, key):
+        row = self._connect().execute(
+            "SELECT facts FROM imd WHERE hash=?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def _store(self, key, facts):
+        data = zlib.compress(json.dumps(facts).encode('utf-8'))
+        db = self._connect()
+        db.execute("INSERT OR REPLACE INTO imd (hash, facts) VALUES (?, ?)",
+                   (key, sqlite3.Binary(data)))
+        db.commit()
+
+    def _parse(self, imd):
+        parser = ImdParser(imd, kinds=['models', 'enums', 'classes'])
+        return {
+            'models': list(parser.models()),
+            'enums': parser.extract_enums(),
+            'classes': parser.extract_classes()
+            }
+
+    def facts(self, imd):
+        """Return dict with 'models', 'enums' and 'classes' of IMD file"""
+        key = '%d:%s' % (FACTS_VERSION, file_hash(imd))
+        try:
+            facts = self._lookup(key)
+        except (sqlite3.Error, OSError):
+            # Cache not usable (e.g. read-only home directory)
+            return self._parse(imd)
+        if facts is None:
+            facts = self._parse(imd)
+            try:
+                self._store(key, facts)
+            except sqlite3.Error:
+                pass
+        return facts
+
+    def models(self, imd):
+        return self.facts(imd)['models']
+
+    def enums(self, imd):
+        return self.facts(imd)['enums']
+
+    def classes(self, imd):
+        return self.facts(imd)['classes']
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
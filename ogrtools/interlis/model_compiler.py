@@ -0,0 +1,149 @@
+import os
+import re
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .model_loader import ModelLoader
+
+STATE_FILE = ".ili2imd-state.json"
+
+COMMENT_RE = re.compile(r'!!.*?$|/\*.*?\*/', re.MULTILINE | re.DOTALL)
+MODEL_RE = re.compile(r'\bMODEL\s+(\w+)|\bIMPORTS\s+([^;]+);')
+
+
+def parse_ili_models(fn):
+    """Return list of (model name, [imported models]) of ili file"""
+    with open(fn, "rb") as f:
+        ili = f.read().decode('utf-8', 'replace')
+    ili = COMMENT_RE.sub('', ili)
+    models = []
+    for m in MODEL_RE.finditer(ili):
+        if m.group(1):
+            models.append((m.group(1), []))
+        elif models:
+            for name in m.group(2).split(','):
+                name = name.split()[-1] if name.split() else ''
+                if name:
+                    models[-1][1].append(name)
+    return models
+
+
+def model_dependencies(ilifiles):
+    """Dependencies between ili files, based on their IMPORTS clauses.
+
+    Returns dict ili file => set of ili files it depends on. Imports of
+    models not defined in ilifiles (e.g. INTERLIS) are ignored.
+    """
+    model_files = {}
+    imports = {}
+    for fn in ilifiles:
+        imports[fn] = set()
+        for name, imported in parse_ili_models(fn):
+            model_files[name] = fn
+            imports[fn].update(imported)
+    deps = {}
+    for fn, names in imports.items():
+        deps[fn] = set(model_files[name] for name in names
+                       if name in model_files and model_files[name] != fn)
+    return deps
+
+
+def _file_hash(fn):
+    with open(fn, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _convert_model(ilifile, imdfile):
+    return ModelLoader("").convert_model([ilifile], imdfile)
+
+
+def compile_models(modeldir, outdir, max_workers=None, compiler=None):
+    """Compile all ili files in modeldir to IlisMeta models in outdir.
+
+    Models are compiled after the models they import, independent
+    models concurrently. A model is skipped, if neither its source nor
+    one of its dependencies changed since the last run.
+    compiler(ilifile, imdfile) defaults to ili2c via ModelLoader and
+    raises an exception, if the compilation fails.
+
+    Returns dict ili file => 'compiled', 'skipped' or 'failed'
+    """
+    compiler = compiler or _convert_model
+    ilifiles = [os.path.join(modeldir, fn)
+                for fn in sorted(os.listdir(modeldir))
+                if fn.lower().endswith('.ili')]
+    deps = model_dependencies(ilifiles)
+
+    if not os.path.isdir(outdir):
+        os.makedirs(outdir)
+    statefn = os.path.join(outdir, STATE_FILE)
+    state = {}
+    if os.path.exists(statefn):
+        with open(statefn) as f:
+            state = json.load(f)
+
+    def imdfile(ilifile):
+        return os.path.join(
+            outdir, os.path.splitext(os.path.basename(ilifile))[0] + '.imd')
+
+    stamps = {}  # ili file => hash of source and dependency stamps
+
+    def build(ilifile):
+        key = os.path.basename(ilifile)
+        if state.get(key) == stamps[ilifile] and \
+                os.path.exists(imdfile(ilifile)):
+            return 'skipped'
+        tmpfile = imdfile(ilifile) + '.tmp'
+        if os.path.exists(tmpfile):
+            os.remove(tmpfile)
+        try:
+            compiler(ilifile, tmpfile)
+        except Exception:
+            # Partial output of a failed compilation is never stamped
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
+            raise
+        if not os.path.exists(tmpfile):
+            return 'failed'
+        os.replace(tmpfile, imdfile(ilifile))
+        return 'compiled'
+
+    results = {}
+    pending = dict((fn, set(fn_deps)) for fn, fn_deps in deps.items())
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = True
+            while ready:
+                ready = [fn for fn, fn_deps in pending.items()
+                         if not fn_deps - set(results)]
+                for fn in ready:
+                    del pending[fn]
+                    if any(results[dep] == 'failed' for dep in deps[fn]):
+                        results[fn] = 'failed'
+                        continue
+                    sha = hashlib.sha1(_file_hash(fn).encode('ascii'))
+                    for dep in sorted(deps[fn]):
+                        sha.update(stamps[dep].encode('ascii'))
+                    stamps[fn] = sha.hexdigest()
+                    running[executor.submit(build, fn)] = fn
+            if not running:
+                if pending:
+                    raise ValueError("Cyclic model imports: %s" %
+                                     ', '.join(sorted(pending)))
+                continue
+            done, __ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                fn = running.pop(future)
+                try:
+                    results[fn] = future.result()
+                except Exception:
+                    results[fn] = 'failed'
+                if results[fn] != 'failed':
+                    state[os.path.basename(fn)] = stamps[fn]
+                else:
+                    state.pop(os.path.basename(fn), None)
+
+    with open(statefn, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    return results
@@ -0,0 +1,288 @@
+import sys
+from .ilismeta import ImdParser
+
+intern = sys.intern
+
+
+class ModelElement(object):
+
+    """Named element of an Interlis model, identified by its TID"""
+
+    __slots__ = ('_graph', 'tid', 'name')
+
+    def __init__(self, graph, tid, elem):
+        self._graph = graph
+        self.tid = tid
+        self.name = intern(graph._text(elem, "Name") or "")
+
+    def __repr__(self):
+        return "<%s %s>" % (type(self).__name__, self.tid)
+
+
+class Package(ModelElement):
+
+    """Model or topic containing classes and domains"""
+
+    __slots__ = ()
+
+    def _contents(self, *types):
+        return [self._graph[tid] for tid in self._graph._package_refs.get(
+            self.tid, []) if self._graph._kind(tid) in types]
+
+    @property
+    def classes(self):
+        return [cls for cls in self._contents('Class')
+                if not isinstance(cls, Association)]
+
+    @property
+    def associations(self):
+        return [cls for cls in self._contents('Class')
+                if isinstance(cls, Association)]
+
+    @property
+    def enum_types(self):
+        return self._contents('EnumType')
+
+
+class Model(Package):
+
+    __slots__ = ()
+
+    @property
+    def topics(self):
+        return self._contents('SubModel')
+
+
+class Topic(Package):
+
+    __slots__ = ('_model_tid',)
+
+    def __init__(self, graph, tid, elem):
+        Package.__init__(self, graph, tid, elem)
+        self._model_tid = graph._ref(elem, "ElementInPackage")
+
+    @property
+    def model(self):
+        return self._graph.get(self._model_tid)
+
+
+class Class(ModelElement):
+
+    """Class, structure or association"""
+
+    __slots__ = ('kind', 'abstract', '_package_tid', '_super_tid')
+
+    def __init__(self, graph, tid, elem):
+        ModelElement.__init__(self, graph, tid, elem)
+        self.kind = intern(graph._text(elem, "Kind") or "Class")
+        self.abstract = graph._text(elem, "Abstract") == "true"
+        self._package_tid = graph._ref(elem, "ElementInPackage")
+        self._super_tid = graph._ref(elem, "Super")
+
+    @property
+    def package(self):
+        return self._graph.get(self._package_tid)
+
+    @property
+    def super(self):
+        return self._graph.get(self._super_tid)
+
+    @property
+    def attributes(self):
+        """Attributes defined in this class (without inherited ones)"""
+        return [self._graph[tid]
+                for tid in self._graph._attr_refs.get(self.tid, [])]
+
+    def all_attributes(self):
+        """Inherited and own attributes, base class attributes first"""
+        cls = self.super
+        attributes = cls.all_attributes() if cls is not None else []
+        return attributes + self.attributes
+
+
+class Association(Class):
+
+    __slots__ = ()
+
+    @property
+    def roles(self):
+        return [self._graph[tid]
+                for tid in self._graph._role_refs.get(self.tid, [])]
+
+
+class Attribute(ModelElement):
+
+    __slots__ = ('_owner_tid', '_type_tid')
+
+    def __init__(self, graph, tid, elem):
+        ModelElement.__init__(self, graph, tid, elem)
+        self._owner_tid = graph._ref(elem, "AttrParent")
+        self._type_tid = graph._ref(elem, "Type")
+
+    @property
+    def owner(self):
+        return self._graph.get(self._owner_tid)
+
+    @property
+    def type_tid(self):
+        return self._type_tid
+
+    @property
+    def type(self):
+        """Type of attribute, if supported by the graph (e.g. EnumType)"""
+        return self._graph.get(self._type_tid)
+
+
+class Role(ModelElement):
+
+    __slots__ = ('_association_tid',)
+
+    def __init__(self, graph, tid, elem):
+        ModelElement.__init__(self, graph, tid, elem)
+        self._association_tid = graph._ref(elem, "Association")
+
+    @property
+    def association(self):
+        return self._graph.get(self._association_tid)
+
+    @property
+    def target(self):
+        return self._graph.get(self._graph._role_targets.get(self.tid))
+
+
+class EnumType(ModelElement):
+
+    __slots__ = ('_values',)
+
+    def __init__(self, graph, tid, elem):
+        ModelElement.__init__(self, graph, tid, elem)
+        self._values = None
+
+    @property
+    def values(self):
+        """Enum table as returned by ImdParser.extract_enums"""
+        if self._values is None:
+            self._values = self._graph._parser.enum_values(self.tid) or []
+        return self._values
+
+
+ELEMENT_TYPES = {
+    "Model": Model,
+    "SubModel": Topic,
+    "Class": Class,
+    "AttrOrParam": Attribute,
+    "Role": Role,
+    "EnumType": EnumType
+    }
+
+
+class ModelGraph:
+
+    """Typed object graph of an IlisMeta model
+
+    Elements are indexed by TID in a single pass over the model data and
+    materialized on first access.
+    """
+
+    def __init__(self, parser):
+        if not isinstance(parser, ImdParser):
+            parser = ImdParser(parser)
+        self._parser = parser
+        self._ns = parser._ns
+        self._prefix = "{%s}IlisMeta07.ModelData." % self._ns['xmlns']
+        self._elements = {}  # TID => (kind, element)
+        self._nodes = {}  # TID => materialized ModelElement
+        self._package_refs = {}  # package TID => [element TIDs]
+        self._attr_refs = {}  # class TID => [attribute TIDs]
+        self._role_refs = {}  # association TID => [role TIDs]
+        self._role_targets = {}  # role TID => class TID
+        self._index()
+
+    def _index(self):
+        attrs = []
+        roles = []
+        baskets = self._parser._tree.findall(
+            "xmlns:DATASECTION/xmlns:IlisMeta07.ModelData", self._ns)
+        for basket in baskets:
+            for elem in basket:
+                kind = elem.tag[len(self._prefix):]
+                tid = elem.get("TID")
+                if tid is None:
+                    if kind == "BaseClass":
+                        crt = self._ref(elem, "CRT")
+                        if crt is not None:
+                            self._role_targets[crt] = self._ref(
+                                elem, "BaseClass")
+                    continue
+                if kind not in ELEMENT_TYPES:
+                    continue
+                tid = intern(tid)
+                self._elements[tid] = (kind, elem)
+                package = self._ref(elem, "ElementInPackage")
+                if package is not None:
+                    self._package_refs.setdefault(package, []).append(tid)
+                if kind == "AttrOrParam":
+                    attrs.append((elem.find("xmlns:AttrParent", self._ns),
+                                  tid))
+                elif kind == "Role":
+                    roles.append((elem.find("xmlns:Association", self._ns),
+                                  tid))
+        self._attr_refs = self._ordered_refs(attrs)
+        self._role_refs = self._ordered_refs(roles)
+
+    def _ordered_refs(self, refs):
+        children = {}
+        for refnode, tid in refs:
+            if refnode is None:
+                continue
+            children.setdefault(refnode.get("REF"), []).append(
+                (int(refnode.get("ORDER_POS", 0)), tid))
+        for parent, items in children.items():
+            items.sort(key=lambda item: item[0])
+            children[parent] = [tid for pos, tid in items]
+        return children
+
+    def _text(self, elem, tag):
+        node = elem.find("xmlns:" + tag, self._ns)
+        return node.text if node is not None else None
+
+    def _ref(self, elem, tag):
+        node = elem.find("xmlns:" + tag, self._ns)
+        return intern(node.get("REF")) if node is not None else None
+
+    def _kind(self, tid):
+        return self._elements[tid][0]
+
+    def __contains__(self, tid):
+        return tid in self._elements
+
+    def __getitem__(self, tid):
+        node = self._nodes.get(tid)
+        if node is None:
+            kind, elem = self._elements[tid]
+            node_type = ELEMENT_TYPES[kind]
+            if node_type is Class and \
+                    self._text(elem, "Kind") == "Association":
+                node_type = Association
+            node = node_type(self, tid, elem)
+            self._nodes[tid] = node
+        return node
+
+    def get(self, tid, default=None):
+        if tid is None or tid not in self._elements:
+            return default
+        return self[tid]
+
+    def _all(self, kind):
+        # Sorted by TID, independent of dict ordering
+        return [self[tid] for tid, (elem_kind, elem)
+                in sorted(self._elements.items()) if elem_kind == kind]
+
+    def models(self):
+        return self._all("Model")
+
+    def classes(self):
+        return self._all("Class")
+
+    def enum_types(self):
+        return self._all("EnumType")
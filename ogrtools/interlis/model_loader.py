@@ -1,13 +1,18 @@
 import os
 import tempfile
-import mmap
 import re
+from concurrent.futures import ThreadPoolExecutor
 from xml.etree import ElementTree
 from .java_exec import run_java
+from .transfer_file import (open_transfer, TRANSFER_EXTENSIONS,
+                            COMPRESSED_EXTENSIONS)
 
 
 NS = {'xmlns': "http://www.interlis.ch/INTERLIS2.3"}
 
+# Maximal number of bytes read from a transfer file for model detection
+HEADER_BYTES = 1024 * 1024
+
 
 class IliModel:
 
@@ -23,17 +28,17 @@ class ModelLoader:
 
     """Load models of Interlis transfer files"""
 
-    def __init__(self, fn):
+    def __init__(self, fn, max_header_bytes=HEADER_BYTES):
         self._fn = fn
         self._fmt = None
+        self._max_header_bytes = max_header_bytes
         self.models = None
 
     def detect_format(self):
         """Detect Interlis transfer file type"""
         # Detection as in OGR lib
-        f = open(self._fn, "rb")
-        header = f.read(1000)
-        f.close()
+        with open_transfer(self._fn) as f:
+            header = f.read(1000)
 
         if b"interlis.ch/INTERLIS2" in header:
             return 'Interlis 2'
@@ -43,31 +48,30 @@ class ModelLoader:
             return None
 
     def detect_models(self):
-        """Find models in itf/xtf file"""
+        """Find models in header of itf/xtf file"""
         self.models = None
         self._fmt = self.detect_format()
-        f = open(self._fn, "r")
+        if self._fmt is None:
+            return self.models
+        # Models are declared in the header section, so we never read
+        # more than max_header_bytes, even for huge or malformed files
+        with open_transfer(self._fn) as f:
+            header = f.read(self._max_header_bytes)
         if self._fmt == 'Interlis 1':
             # Search for MODL xxx
-            regex = re.compile(r'^MODL\s+(\w+)')
-            for line in f:
-                m = regex.search(line)
-                if m:
-                    self.models = [IliModel(m.group(1))]
-                    break
+            m = re.search(br'^MODL\s+(\w+)', header, re.MULTILINE)
+            if m:
+                self.models = [IliModel(m.group(1).decode('latin-1'))]
         elif self._fmt == 'Interlis 2':
             # Search for <MODEL NAME="xxx"
-            size = os.stat(self._fn).st_size
-            data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
             self.models = []
-            m = re.search(b'<MODELS>.+?</MODELS>', data, re.DOTALL)
+            m = re.search(b'<MODELS>.+?</MODELS>', header, re.DOTALL)
             if m:
                 tree = ElementTree.fromstring(m.group())
                 for elem in tree.iterfind('MODEL'):
                     model = IliModel(
                         elem.get("NAME"), elem.get("VERSION"), elem.get("URI"))
                     self.models.append(model)
-        f.close()
         return self.models
 
     def ilidirs(self):
@@ -128,3 +132,22 @@ class ModelLoader:
                         ["-oIMD", "--ilidirs", "'" +
                          self.ilidirs() + "'", "--out", outfile]
                         + ilifiles)
+
+
+def detect_models_in_dir(dirname, extensions=None, max_workers=None,
+                         max_header_bytes=HEADER_BYTES):
+    """Detect models of all transfer files in a directory in parallel.
+
+    Returns a dict with file name => list of IliModel (None for files
+    which are not Interlis transfer files)
+    """
+    if extensions is None:
+        extensions = TRANSFER_EXTENSIONS + COMPRESSED_EXTENSIONS
+    fns = [os.path.join(dirname, fn) for fn in sorted(os.listdir(dirname))
+           if fn.lower().endswith(extensions)]
+
+    def detect(fn):
+        return ModelLoader(fn, max_header_bytes).detect_models()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(fns, executor.map(detect, fns)))
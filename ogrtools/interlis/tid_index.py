@@ -0,0 +1,239 @@
+import os
+import json
+import sqlite3
+from xml.etree import ElementTree
+from xml.parsers import expat
+from .transfer_file import open_transfer, is_gzip, is_zip, _split_zip_path
+
+CHUNK_SIZE = 1024 * 1024
+
+# Objects inserted per executemany call while indexing
+BATCH_SIZE = 10000
+
+INDEX_VERSION = 1
+
+
+def tidx_path(fn):
+    """Sidecar index file of transfer file fn"""
+    if is_zip(fn):
+        archive, member = _split_zip_path(fn)
+        if member is not None:
+            return '%s.%s.tidx' % (archive, member.replace('/', '_'))
+        return archive + '.tidx'
+    return fn + '.tidx'
+
+
+def _stamp(fn):
+    # Modification time and size of the file (of the archive for members)
+    st = os.stat(_split_zip_path(fn)[0])
+    return st.st_mtime, st.st_size
+
+
+def _local(name):
+    # Local part of 'prefix:name'
+    return name.rsplit(':', 1)[-1]
+
+
+def _attr(attrib, name):
+    """Value of attribute name (case insensitive, with or without prefix)"""
+    for key, value in attrib.items():
+        if _local(key).lower() == name:
+            return value
+    return None
+
+
+class TidIndex:
+
+    """On-disk index of the objects of an XTF transfer file
+
+    Records TID => (BID, byte offset, class) and the references of each
+    object in a SQLite sidecar file. The index is rebuilt, when the
+    modification time or the size of the transfer file changed. Offsets
+    are positions in the decompressed stream of compressed files.
+    Objects can only be extracted from uncompressed files, seeking in a
+    compressed stream decompresses it from the start.
+    Class and role names are qualified names as written in the file.
+    """
+
+    def __init__(self, fn, index_fn=None):
+        self.fn = fn
+        self.index_fn = index_fn or tidx_path(fn)
+        self._db = None
+        self.encoding = 'UTF-8'
+        self.namespaces = {}  # prefix => URI ('' for default namespace)
+        self._open()
+
+    def _open(self):
+        stamp = _stamp(self.fn)
+        if os.path.exists(self.index_fn):
+            db = sqlite3.connect(self.index_fn)
+            try:
+                row = db.execute("SELECT version, mtime, size, encoding, "
+                                 "namespaces FROM meta").fetchone()
+            except sqlite3.DatabaseError:
+                row = None
+            if row is not None and tuple(row[:3]) == \
+                    (INDEX_VERSION,) + stamp:
+                self._db = db
+                self.encoding = row[3]
+                self.namespaces = json.loads(row[4])
+                return
+            db.close()
+        self._build(stamp)
+        self._db = sqlite3.connect(self.index_fn)
+
+    def _build(self, stamp):
+        # Written to a temporary file, so that an interrupted build
+        # never leaves an incomplete index
+        tmpfn = self.index_fn + '.tmp'
+        if os.path.exists(tmpfn):
+            os.remove(tmpfn)
+        db = sqlite3.connect(tmpfn)
+        db.execute("CREATE TABLE meta (version INTEGER, mtime REAL, "
+                   "size INTEGER, encoding TEXT, namespaces TEXT)")
+        db.execute("CREATE TABLE objects (tid TEXT PRIMARY KEY, bid TEXT, "
+                   "offset INTEGER, class TEXT)")
+        db.execute("CREATE TABLE refs (tid TEXT, role TEXT, ref TEXT)")
+
+        objects = []
+        refs = []
+        state = {'depth': 0, 'datasection': False, 'bid': None,
+                 'tid': None}
+        parser = expat.ParserCreate()
+
+        def xml_decl(version, encoding, standalone):
+            if encoding:
+                self.encoding = encoding
+
+        def start(name, attrib):
+            state['depth'] += 1
+            depth = state['depth']
+            if depth == 1:
+                for key, value in attrib.items():
+                    if key == 'xmlns':
+                        self.namespaces[''] = value
+                    elif key.startswith('xmlns:'):
+                        self.namespaces[key[6:]] = value
+            elif depth == 2:
+                state['datasection'] = _local(name).upper() == 'DATASECTION'
+            elif not state['datasection']:
+                return
+            elif depth == 3:
+                state['bid'] = _attr(attrib, 'bid')
+            elif depth == 4:
+                tid = _attr(attrib, 'tid')
+                state['tid'] = tid
+                if tid is not None:
+                    objects.append((tid, state['bid'],
+                                    parser.CurrentByteIndex, name))
+            elif state['tid'] is not None:
+                ref = _attr(attrib, 'ref')
+                if ref is not None:
+                    refs.append((state['tid'], name, ref))
+
+        def end(name):
+            state['depth'] -= 1
+
+        parser.XmlDeclHandler = xml_decl
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+        with open_transfer(self.fn) as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                parser.Parse(chunk, not chunk)
+                if len(objects) >= BATCH_SIZE or len(refs) >= BATCH_SIZE \
+                        or not chunk:
+                    db.executemany("INSERT OR REPLACE INTO objects "
+                                   "VALUES (?, ?, ?, ?)", objects)
+                    db.executemany("INSERT INTO refs VALUES (?, ?, ?)",
+                                   refs)
+                    objects = []
+                    refs = []
+                if not chunk:
+                    break
+        db.execute("CREATE INDEX refs_tid ON refs (tid)")
+        db.execute("CREATE INDEX refs_ref ON refs (ref)")
+        db.execute("INSERT INTO meta VALUES (?, ?, ?, ?, ?)",
+                   (INDEX_VERSION,) + stamp +
+                   (self.encoding, json.dumps(self.namespaces)))
+        db.commit()
+        db.close()
+        os.replace(tmpfn, self.index_fn)
+
+    def __len__(self):
+        return self._db.execute("SELECT count(*) FROM objects").fetchone()[0]
+
+    def __contains__(self, tid):
+        return self.lookup(tid) is not None
+
+    def lookup(self, tid):
+        """(BID, byte offset, class) of object tid or None"""
+        row = self._db.execute(
+            "SELECT bid, offset, class FROM objects WHERE tid = ?",
+            (tid,)).fetchone()
+        return tuple(row) if row else None
+
+    def extract(self, tid):
+        """Element of object tid, parsed from its offset in the file.
+
+        Returns None for unknown TIDs. Raises ValueError for compressed
+        transfer files.
+        """
+        if is_gzip(self.fn) or is_zip(self.fn):
+            raise ValueError("Can't extract objects from compressed file %s"
+                             % self.fn)
+        found = self.lookup(tid)
+        if found is None:
+            return None
+        __, offset, __ = found
+        # Object parsed within a root element declaring the namespaces
+        # of the transfer file
+        decls = ''.join(
+            ' xmlns%s="%s"' % (':' + prefix if prefix else '', uri)
+            for prefix, uri in sorted(self.namespaces.items()))
+        parser = ElementTree.XMLPullParser(events=('start', 'end'))
+        parser.feed(('<?xml version="1.0" encoding="%s"?><root%s>' % (
+            self.encoding, decls)).encode(self.encoding))
+        depth = 0
+        with open_transfer(self.fn) as f:
+            f.seek(offset)
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                parser.feed(chunk)
+                for event, elem in parser.read_events():
+                    if event == 'start':
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if depth == 1:
+                            return elem
+        raise ValueError("Incomplete object %s in %s" % (tid, self.fn))
+
+    def references(self, tid):
+        """List of (role, referenced TID) of object tid"""
+        return [tuple(row) for row in self._db.execute(
+            "SELECT role, ref FROM refs WHERE tid = ? ORDER BY rowid",
+            (tid,))]
+
+    def referencing(self, tid):
+        """List of (TID, role) of the objects referencing object tid"""
+        return [tuple(row) for row in self._db.execute(
+            "SELECT tid, role FROM refs WHERE ref = ? ORDER BY rowid",
+            (tid,))]
+
+    def resolve(self, tid):
+        """List of (role, referenced TID, class) of object tid.
+
+        The class is None for references to objects outside of the file.
+        """
+        return [tuple(row) for row in self._db.execute(
+            "SELECT r.role, r.ref, o.class FROM refs r "
+            "LEFT JOIN objects o ON o.tid = r.ref "
+            "WHERE r.tid = ? ORDER BY r.rowid", (tid,))]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,104 @@
+import os
+import gzip
+import zipfile
+
+TRANSFER_EXTENSIONS = ('.itf', '.xtf', '.xml')
+GZIP_EXTENSIONS = tuple(ext + '.gz' for ext in TRANSFER_EXTENSIONS)
+COMPRESSED_EXTENSIONS = GZIP_EXTENSIONS + ('.zip',)
+
+
+def _split_zip_path(fn):
+    """Split 'archive.zip/member.xtf' into archive and member name"""
+    for sep in set(['/', os.sep]):
+        idx = fn.lower().find('.zip' + sep)
+        if idx != -1:
+            return fn[:idx + 4], fn[idx + 5:].replace(os.sep, '/')
+    return fn, None
+
+
+def is_gzip(fn):
+    return fn.lower().endswith('.gz')
+
+
+def is_zip(fn):
+    return _split_zip_path(fn)[0].lower().endswith('.zip')
+
+
+def transfer_members(fn):
+    """Names of Interlis transfer files in zip archive"""
+    archive, __ = _split_zip_path(fn)
+    with zipfile.ZipFile(archive) as zf:
+        return [name for name in zf.namelist()
+                if name.lower().endswith(TRANSFER_EXTENSIONS)]
+
+
+def _zip_member(fn):
+    archive, member = _split_zip_path(fn)
+    if member is None:
+        members = transfer_members(archive)
+        if not members:
+            raise IOError("No Interlis transfer file in archive: %s" % fn)
+        member = members[0]
+    return archive, member
+
+
+def open_transfer(fn):
+    """Open transfer file for binary reading.
+
+    gzip files (file.xtf.gz) and zip archives are decompressed while
+    streaming. A member of a multi-file archive is selected with
+    'archive.zip/member.xtf', otherwise the first transfer file in the
+    archive is opened.
+    """
+    if is_gzip(fn):
+        return gzip.open(fn, "rb")
+    elif is_zip(fn):
+        archive, member = _zip_member(fn)
+        # The opened member keeps the archive file open until it is closed
+        with zipfile.ZipFile(archive) as zf:
+            return zf.open(member)
+    else:
+        return open(fn, "rb")
+
+
+def is_compressed_transfer(fn):
+    """True for gzip compressed transfer files and zip archives containing
+    transfer files"""
+    if fn.lower().endswith(GZIP_EXTENSIONS):
+        return True
+    archive, member = _split_zip_path(fn)
+    if not archive.lower().endswith('.zip'):
+        return False
+    if member is not None:
+        return member.lower().endswith(TRANSFER_EXTENSIONS)
+    try:
+        return len(transfer_members(archive)) > 0
+    except (IOError, zipfile.BadZipfile):
+        return False
+
+
+def vsi_path(fn):
+    """GDAL virtual file path for reading compressed transfer files.
+
+    Other files, like zipped shapefiles, are returned unchanged.
+    """
+    if fn.startswith('/vsi') or not is_compressed_transfer(fn):
+        return fn
+    if is_gzip(fn):
+        return '/vsigzip/' + fn
+    elif is_zip(fn):
+        archive, member = _zip_member(fn)
+        return '/vsizip/%s/%s' % (archive, member)
+    return fn
+
+
+def vsi_datasource(ds):
+    """OGR datasource string with virtual file path for transfer file.
+
+    Handles Interlis connection strings like 'data.xtf.gz,model.imd'.
+    """
+    if ds is None:
+        return ds
+    parts = ds.split(',', 1)
+    parts[0] = vsi_path(parts[0])
+    return ','.join(parts)
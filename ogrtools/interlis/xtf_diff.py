@@ -0,0 +1,340 @@
+import os
+import json
+import hashlib
+import shutil
+import sqlite3
+import tempfile
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, quoteattr
+from .transfer_file import open_transfer
+from .baskets import BasketIndex
+
+# Objects inserted per executemany call while indexing
+BATCH_SIZE = 10000
+
+OPERATIONS = ('insert', 'update', 'delete')
+
+
+def _local(name):
+    # Local part of '{uri}name'
+    return name.rsplit('}', 1)[-1]
+
+
+def _attr(elem, name):
+    """Key and value of attribute name (case insensitive, with or without
+    namespace, e.g. TID in INTERLIS 2.3 and ili:tid in INTERLIS 2.4)"""
+    for key, value in elem.attrib.items():
+        if _local(key).lower() == name:
+            return key, value
+    return None, None
+
+
+def object_hash(elem):
+    """Content hash of an object element, ignoring formatting whitespace"""
+    sha = hashlib.sha1()
+    _update_hash(sha, elem)
+    return sha.digest()
+
+
+def _update_hash(sha, elem):
+    sha.update(elem.tag.encode('utf-8'))
+    for key, value in sorted(elem.attrib.items()):
+        sha.update(('\0%s=%s' % (key, value)).encode('utf-8'))
+    sha.update(('\0%s\0' % (elem.text or '').strip()).encode('utf-8'))
+    for child in elem:
+        _update_hash(sha, child)
+    sha.update(b'\1')
+
+
+class TransferObjects:
+
+    """Streaming reader of the objects in the baskets of an XTF file
+
+    Iterating yields (basket element, object element) for each object
+    and (basket element, None) at the end of each basket. Processed
+    objects are removed from the tree, so memory usage is bounded by the
+    largest object.
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.namespaces = {}  # URI => prefix used in the file
+
+    def __iter__(self):
+        depth = 0
+        datasection = None
+        basket = None
+        with open_transfer(self.fn) as f:
+            for event, item in ElementTree.iterparse(
+                    f, events=('start-ns', 'start', 'end')):
+                if event == 'start-ns':
+                    prefix, uri = item
+                    self.namespaces.setdefault(uri, prefix)
+                elif event == 'start':
+                    depth += 1
+                    if depth == 2 and \
+                            _local(item.tag).upper() == 'DATASECTION':
+                        datasection = item
+                    elif depth == 3 and datasection is not None:
+                        basket = item
+                else:
+                    if depth == 4 and basket is not None:
+                        yield basket, item
+                        basket.remove(item)
+                    elif depth == 3 and basket is not None:
+                        yield basket, None
+                        datasection.remove(basket)
+                        basket = None
+                    elif depth == 2:
+                        datasection = None
+                    depth -= 1
+
+
+class TransferDiff:
+
+    """Differences between two versions of an XTF transfer file
+
+    Objects are matched by TID and compared by content hash. The objects
+    of both files are indexed in an on-disk SQLite database, so memory
+    usage doesn't depend on the file sizes. An object with a changed
+    class is reported as deleted and inserted.
+    """
+
+    def __init__(self, old_fn, new_fn, index_fn=None):
+        self.old_fn = old_fn
+        self.new_fn = new_fn
+        self._tmpdir = None
+        if index_fn is None:
+            self._tmpdir = tempfile.mkdtemp(prefix='xtfdiff_')
+            index_fn = os.path.join(self._tmpdir, 'index.sqlite')
+        self._db = sqlite3.connect(index_fn)
+        self._db.execute("CREATE TABLE objects (file INTEGER, tid TEXT, "
+                         "class TEXT, bid TEXT, hash BLOB, "
+                         "PRIMARY KEY (file, tid))")
+        self._db.execute("CREATE TABLE baskets (file INTEGER, bid TEXT, "
+                         "tag TEXT, bid_key TEXT, PRIMARY KEY (file, bid))")
+        self._index(0, old_fn)
+        self._index(1, new_fn)
+        self._create_changes()
+
+    def _index(self, file, fn):
+        rows = []
+        for basket, elem in TransferObjects(fn):
+            bid_key, bid = _attr(basket, 'bid')
+            if elem is None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO baskets VALUES (?, ?, ?, ?)",
+                    (file, bid, basket.tag, bid_key))
+                continue
+            __, tid = _attr(elem, 'tid')
+            rows.append((file, tid, elem.tag, bid,
+                         sqlite3.Binary(object_hash(elem))))
+            if len(rows) >= BATCH_SIZE:
+                self._insert_objects(rows)
+                rows = []
+        self._insert_objects(rows)
+        self._db.commit()
+
+    def _insert_objects(self, rows):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)", rows)
+
+    def _create_changes(self):
+        # Changes are computed by SQLite, sorting on disk if required
+        self._db.execute("""
+            CREATE TABLE changes AS
+            SELECT n.class AS class, 'insert' AS op, n.tid AS tid,
+                   n.bid AS bid
+            FROM objects n WHERE n.file = 1 AND NOT EXISTS (
+                SELECT 1 FROM objects o
+                WHERE o.file = 0 AND o.tid = n.tid AND o.class = n.class)
+            UNION ALL
+            SELECT n.class, 'update', n.tid, n.bid
+            FROM objects n JOIN objects o
+                ON o.file = 0 AND o.tid = n.tid AND o.class = n.class
+            WHERE n.file = 1 AND o.hash != n.hash
+            UNION ALL
+            SELECT o.class, 'delete', o.tid, o.bid
+            FROM objects o WHERE o.file = 0 AND NOT EXISTS (
+                SELECT 1 FROM objects n
+                WHERE n.file = 1 AND n.tid = o.tid AND n.class = o.class)
+            """)
+        self._db.execute("CREATE INDEX changes_tid ON changes (tid)")
+        self._db.execute("CREATE INDEX changes_bid ON changes (bid, op)")
+        self._db.commit()
+
+    def changes(self):
+        """Iterator of (class, operation, TID), ordered by class"""
+        return self._db.execute(
+            "SELECT class, op, tid FROM changes ORDER BY class, op, tid")
+
+    def counts(self):
+        """Dict class => {operation: number of objects}"""
+        counts = {}
+        for cls, op, count in self._db.execute(
+                "SELECT class, op, count(*) FROM changes GROUP BY class, op"):
+            counts.setdefault(_local(cls), dict.fromkeys(OPERATIONS, 0))
+            counts[_local(cls)][op] = count
+        return counts
+
+    def write_json(self, out):
+        """Write changes to text stream out as JSON object
+        {class: {"insert": [TIDs], "update": [TIDs], "delete": [TIDs]}}
+        """
+        current = None
+        out.write('{')
+        for cls, op, tid in self.changes():
+            cls = _local(cls)
+            if (cls, op) != current:
+                if current is None:
+                    out.write('\n  %s: {\n    %s: [' % (json.dumps(cls),
+                                                       json.dumps(op)))
+                elif cls != current[0]:
+                    out.write(']\n  },\n  %s: {\n    %s: [' % (
+                        json.dumps(cls), json.dumps(op)))
+                else:
+                    out.write('],\n    %s: [' % json.dumps(op))
+            else:
+                out.write(', ')
+            out.write(json.dumps(tid))
+            current = (cls, op)
+        if current is not None:
+            out.write(']\n  }\n')
+        out.write('}\n')
+
+    def write_changeset(self, outfn):
+        """Write changes as incremental transfer file.
+
+        Inserted and updated objects are copied from the new file, with
+        their operation, into baskets of kind UPDATE with the BIDs of the
+        new file. Deleted objects are written into the basket with the
+        BID of the old file, before its inserts and updates, so that an
+        object changing its class is deleted before being inserted again.
+        """
+        index = BasketIndex(self.new_fn)
+        if index.footer_start is None:
+            raise ValueError("Not an XTF transfer file: %s" % self.new_fn)
+        reader = TransferObjects(self.new_fn)
+        written_bids = set()
+        with open(outfn, "wb") as out:
+            with open_transfer(self.new_fn) as f:
+                out.write(f.read(index.header_end()))
+            started = False
+            for basket, elem in reader:
+                __, bid = _attr(basket, 'bid')
+                if bid not in written_bids:
+                    # First object or end of basket
+                    written_bids.add(bid)
+                    deletes = self._deletes(bid)
+                    if deletes:
+                        self._write_basket_start(out, basket, reader)
+                        started = True
+                    for cls, tid in deletes:
+                        self._write_delete(out, basket, cls, tid, reader)
+                if elem is None:
+                    if started:
+                        out.write(('  </%s>\n' % _qname(
+                            basket.tag, reader.namespaces)).encode('utf-8'))
+                    started = False
+                    continue
+                __, tid = _attr(elem, 'tid')
+                row = self._db.execute(
+                    "SELECT op FROM changes WHERE tid = ? AND class = ? AND "
+                    "op != 'delete'", (tid, elem.tag)).fetchone()
+                if row is None:
+                    continue
+                if not started:
+                    self._write_basket_start(out, basket, reader)
+                    started = True
+                key = self._operation_attr(elem, 'operation')
+                out.write(b'    ')
+                _write_element(out, elem, reader.namespaces,
+                               [(key, row[0].upper())])
+                out.write(b'\n')
+            # Deletions in baskets missing in the new file
+            for bid, tag, bid_key in self._db.execute(
+                    "SELECT bid, tag, bid_key FROM baskets WHERE file = 0"
+                    ).fetchall():
+                if bid in written_bids:
+                    continue
+                deletes = self._deletes(bid)
+                if not deletes:
+                    continue
+                basket = ElementTree.Element(tag, {bid_key: bid})
+                self._write_basket_start(out, basket, reader)
+                for cls, tid in deletes:
+                    self._write_delete(out, basket, cls, tid, reader)
+                out.write(('  </%s>\n' % _qname(
+                    tag, reader.namespaces)).encode('utf-8'))
+            with open_transfer(self.new_fn) as f:
+                f.seek(index.footer_start)
+                shutil.copyfileobj(f, out)
+
+    def _deletes(self, bid):
+        return self._db.execute(
+            "SELECT class, tid FROM changes WHERE bid = ? AND op = 'delete' "
+            "ORDER BY class, tid", (bid,)).fetchall()
+
+    def _operation_attr(self, elem, name):
+        # OPERATION/KIND in INTERLIS 2.3, ili:operation/ili:kind in 2.4
+        key, __ = _attr(elem, 'tid') if name == 'operation' else \
+            _attr(elem, 'bid')
+        if key is not None and key.startswith('{'):
+            return key[:key.index('}') + 1] + name
+        return name.upper()
+
+    def _write_basket_start(self, out, basket, reader):
+        key = self._operation_attr(basket, 'kind')
+        attrib = [(k, v) for k, v in basket.attrib.items()
+                  if _local(k).lower() != 'kind'] + [(key, 'UPDATE')]
+        out.write(('  <%s%s>\n' % (
+            _qname(basket.tag, reader.namespaces),
+            _attributes(attrib, reader.namespaces))).encode('utf-8'))
+
+    def _write_delete(self, out, basket, cls, tid, reader):
+        key, __ = _attr(basket, 'bid')
+        if key is not None and key.startswith('{'):
+            ns = key[:key.index('}') + 1]
+            attrib = [(ns + 'tid', tid), (ns + 'operation', 'DELETE')]
+        else:
+            attrib = [('TID', tid), ('OPERATION', 'DELETE')]
+        out.write(('    <%s%s/>\n' % (
+            _qname(cls, reader.namespaces),
+            _attributes(attrib, reader.namespaces))).encode('utf-8'))
+
+    def close(self):
+        self._db.close()
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+
+
+def _qname(name, namespaces):
+    # Prefixed name with the namespace prefixes of the transfer file
+    if name.startswith('{'):
+        uri, local = name[1:].split('}', 1)
+        prefix = namespaces.get(uri)
+        if prefix:
+            return '%s:%s' % (prefix, local)
+        return local
+    return name
+
+
+def _attributes(attrib, namespaces):
+    return ''.join(' %s=%s' % (_qname(key, namespaces), quoteattr(value))
+                   for key, value in attrib)
+
+
+def _write_element(out, elem, namespaces, extra_attrib=[]):
+    tag = _qname(elem.tag, namespaces)
+    attrib = list(elem.attrib.items()) + list(extra_attrib)
+    out.write(('<%s%s' % (tag, _attributes(attrib, namespaces)))
+              .encode('utf-8'))
+    if len(elem) == 0 and not elem.text:
+        out.write(b'/>')
+        return
+    out.write(('>%s' % escape(elem.text or '')).encode('utf-8'))
+    for child in elem:
+        _write_element(out, child, namespaces)
+        out.write(escape(child.tail or '').encode('utf-8'))
+    out.write(('</%s>' % tag).encode('utf-8'))
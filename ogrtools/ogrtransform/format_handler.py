@@ -1,14 +1,20 @@
 import string
 import re
+import hashlib
 
 from ..interlis.ilismeta import ImdParser
+from ..interlis.model_cache import ModelCache, model_cache_enabled
+
+# Hex digits of the name hash in shortened names
+NAME_HASH_LEN = 8
 
 
 # Base class for format specific methods
 class FormatHandler:
 
     def __init__(self):
-        self._name_seq = 0
+        self._short_names = {}  # (src_name, prefix, ...) => short name
+        self._name_sources = {}  # short name => src_name
 
     def launder_name(self, src_name):
         # Do nothing in default implementation
@@ -22,24 +28,75 @@ class FormatHandler:
         # No options in default implementation
         return {}
 
+    def default_transaction_size(self):
+        # Features per transaction (ogr2ogr -gt), for drivers supporting
+        # transactions
+        return 20000
+
+    def supports_concurrent_writes(self):
+        # Multiple processes can write layers into the same datasource
+        return False
+
     def detect_model(self, src_file):
         return None
 
     def extract_enums(self, model):
         return None
 
-    def shorten_name(self, src_name, prefix, splitchar='.'):
+    def shorten_name(self, src_name, prefix, splitchar='.', max_len=None):
         # Nutzungsplanung.Nutzungsplanung.Grundnutzung_Zonenflaeche.Herkunft
-        # -> enumXX_herkunft
-        short_name = str.rsplit(str(src_name), splitchar, 1)[-1]
-        short_name = "%s%d_%s" % (prefix, self._name_seq, short_name)
-        self._name_seq = self._name_seq + 1
+        # -> enumXXXXXXXX_herkunft, with a hash of the full name, so that
+        # the same name is generated in every run
+        src_name = str(src_name)
+        key = (src_name, prefix, splitchar, max_len)
+        if key in self._short_names:
+            return self._short_names[key]
+        digest = hashlib.sha1(src_name.encode('utf-8')).hexdigest()
+        hash_len = NAME_HASH_LEN
+        while True:
+            short_name = "%s%s_%s" % (prefix, digest[:hash_len],
+                                      src_name.rsplit(splitchar, 1)[-1])
+            if max_len is not None:
+                short_name = short_name[:max_len]
+            # Extend the hash in the unlikely case of a collision
+            if self._name_sources.get(short_name, src_name) == src_name or \
+                    hash_len == len(digest):
+                break
+            hash_len += 4
+        self._short_names[key] = short_name
+        self._name_sources[short_name] = src_name
         return short_name
 
     def layer_name(self, name):
         return name
 
 
+RENAME_RELATIONS_SQL = """DO $$
+DECLARE
+    rel record;
+BEGIN
+    FOR rel IN
+        SELECT relname, relkind FROM pg_class
+        WHERE relkind IN ('i', 'S')
+          AND left(relname, length('%(stage)s')) = '%(stage)s'
+          AND oid IN (
+            SELECT indexrelid FROM pg_index
+            WHERE indrelid = '"%(schema)s"."%(name)s"'::regclass
+            UNION
+            SELECT objid FROM pg_depend
+            WHERE refobjid = '"%(schema)s"."%(name)s"'::regclass
+              AND classid = 'pg_class'::regclass)
+    LOOP
+        EXECUTE format('ALTER %%s %%I.%%I RENAME TO %%I',
+                       CASE rel.relkind WHEN 'i' THEN 'INDEX'
+                       ELSE 'SEQUENCE' END,
+                       '%(schema)s', rel.relname,
+                       '%(name)s' ||
+                       substr(rel.relname, length('%(stage)s') + 1));
+    END LOOP;
+END $$"""
+
+
 class PgFormatHandler(FormatHandler):
     # PG default name limit is 63 chars
 
@@ -50,16 +107,39 @@ class PgFormatHandler(FormatHandler):
     def launder_name(self, src_name):
         # OGRPGDataSource::LaunderName
         # return re.sub(r"[#'-]", '_', src_name.lower())
-        name = str(src_name).lower().encode('ascii', 'replace')
+        name = str(src_name).lower()
         if len(name) > self.max_len - 7:
-            return self.shorten_name(name, 'n')
-        else:
-            return re.compile("\W+", re.IGNORECASE).sub("_", name.decode('utf-8'))
+            name = self.shorten_name(name, 'n', max_len=self.max_len - 7)
+        name = name.encode('ascii', 'replace').decode('ascii')
+        return re.compile(r"\W+", re.IGNORECASE).sub("_", name)
 
     def default_layer_creation_options(self):
         # see http://www.gdal.org/ogr/drv_pg.html Layer Creation Options
         return {'SCHEMA': 'public'}
 
+    def supports_concurrent_writes(self):
+        return True
+
+    def stage_name(self, name):
+        # Staging table for bulk loads, within the name length limit
+        return name[:self.max_len - 7] + '_stage'
+
+    def swap_table_sql(self, schema, stage_name, name):
+        """SQL statements replacing table name by table stage_name"""
+        return [
+            'DROP TABLE IF EXISTS "%s"."%s"' % (schema, name),
+            'ALTER TABLE "%s"."%s" RENAME TO "%s"' % (
+                schema, stage_name, name),
+            # Indexes and sequences are named after the staging table
+            RENAME_RELATIONS_SQL % {
+                'schema': schema, 'stage': stage_name, 'name': name}
+            ]
+
+    def set_logged_sql(self, schema, stage_name):
+        """SQL statement converting unlogged table stage_name, executed
+        before the swap, which holds exclusive locks"""
+        return 'ALTER TABLE "%s"."%s" SET LOGGED' % (schema, stage_name)
+
 
 class SpatiaLiteFormatHandler(FormatHandler):
 
@@ -67,24 +147,40 @@ class SpatiaLiteFormatHandler(FormatHandler):
         FormatHandler.__init__(self)
 
     def launder_name(self, src_name):
-        name = unicode(src_name).lower().encode('ascii', 'replace')
-        return re.compile("\W+", re.IGNORECASE).sub("_", name.decode('utf-8'))
+        name = str(src_name).lower().encode('ascii', 'replace')
+        return re.compile(r"\W+", re.IGNORECASE).sub("_", name.decode('ascii'))
 
     def default_ds_creation_options(self):
         return {'SPATIALITE': 'YES'}
 
+    def default_transaction_size(self):
+        # Each commit syncs the whole database file
+        return 100000
+
+
+class GeoPackageFormatHandler(FormatHandler):
+
+    def __init__(self):
+        FormatHandler.__init__(self)
+
+    def default_transaction_size(self):
+        # Each commit syncs the whole database file
+        return 100000
+
 
 class IliFormatHandler(FormatHandler):
 
     def __init__(self):
         FormatHandler.__init__(self)
+        self._model_cache = ModelCache()
 
     def detect_model(self, src_file):
         return None
 
     def extract_enums(self, model):
-        parser = ImdParser(model)
-        return parser.extract_enums()
+        if model_cache_enabled():
+            return self._model_cache.enums(model)
+        return ImdParser(model).extract_enums()
 
 
 class GeoJSONFormatHandler(FormatHandler):
@@ -103,6 +199,7 @@ class FormatHandlerRegistry:
         self.register('', FormatHandler())  # default
         self.register('PostgreSQL', PgFormatHandler())
         self.register('SQLite', SpatiaLiteFormatHandler())
+        self.register('GPKG', GeoPackageFormatHandler())
         self.register('Interlis 1', IliFormatHandler())
         self.register('Interlis 2', IliFormatHandler())
         self.register('GeoJSON', GeoJSONFormatHandler())
@@ -0,0 +1,165 @@
+import os
+import re
+import hashlib
+import sqlite3
+from ..interlis.model_cache import default_cache_dir
+
+# Journals written with another layout are discarded
+JOURNAL_VERSION = 2
+
+
+def journal_path(dest, ext='.journal'):
+    """Journal file next to a file destination, in the ogrtools cache
+    directory for database connections"""
+    dirname = os.path.dirname(os.path.abspath(dest))
+    # Connection strings like 'PG:dbname=...'
+    if not re.match(r'[A-Za-z]{2,}:', dest) and os.path.isdir(dirname):
+        return dest + ext
+    sha = hashlib.sha1(dest.encode('utf-8')).hexdigest()
+    return os.path.join(default_cache_dir(), 'journals', sha + ext)
+
+
+class TransformJournal:
+
+    """Checkpoint journal of a transformation
+
+    Records completed layers and the number of source features committed
+    per layer, with the number of features written to the destination
+    layer and the number of features it contained before. A journal
+    written for a different transformation key (configuration, source and
+    destination) is discarded.
+    SQLite is used, since jobs of parallel transformations update the
+    journal concurrently.
+    """
+
+    def __init__(self, fn, key):
+        self.fn = fn
+        self.key = key
+        self._db = None
+
+    def __getstate__(self):
+        # Process pool jobs open their own connection
+        return {'fn': self.fn, 'key': self.key, '_db': None}
+
+    def _connect(self):
+        if self._db is None:
+            dirname = os.path.dirname(self.fn)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            self._db = sqlite3.connect(self.fn, timeout=60)
+            self._db.execute("CREATE TABLE IF NOT EXISTS journal "
+                             "(key TEXT)")
+            row = self._db.execute("SELECT key FROM journal").fetchone()
+            if row is None or row[0] != self._versioned_key():
+                self._reset()
+        return self._db
+
+    def _versioned_key(self):
+        return '%d:%s' % (JOURNAL_VERSION, self.key)
+
+    def _reset(self):
+        self._db.execute("DELETE FROM journal")
+        self._db.execute("DROP TABLE IF EXISTS layers")
+        self._db.execute("CREATE TABLE layers "
+                         "(name TEXT PRIMARY KEY, features INTEGER, "
+                         "written INTEGER, base INTEGER, done INTEGER)")
+        self._db.execute("INSERT INTO journal (key) VALUES (?)",
+                         (self._versioned_key(),))
+        self._db.commit()
+
+    def clear(self):
+        """Start new transformation"""
+        self._connect()
+        self._reset()
+
+    def started(self):
+        """True if layers of an interrupted transformation are recorded"""
+        return self._connect().execute(
+            "SELECT count(*) FROM layers").fetchone()[0] > 0
+
+    def features(self, layer):
+        """Number of committed source features of layer"""
+        row = self._connect().execute(
+            "SELECT features FROM layers WHERE name=?", (layer,)).fetchone()
+        return row[0] if row else 0
+
+    def progress(self, layer):
+        """(source features, written features, features in destination
+        layer before the transformation) of layer or None"""
+        row = self._connect().execute(
+            "SELECT features, written, base FROM layers WHERE name=?",
+            (layer,)).fetchone()
+        return tuple(row) if row else None
+
+    def is_done(self, layer):
+        row = self._connect().execute(
+            "SELECT done FROM layers WHERE name=?", (layer,)).fetchone()
+        return bool(row and row[0])
+
+    def commit(self, layer, features, done=False, written=0, base=0):
+        db = self._connect()
+        db.execute("INSERT OR REPLACE INTO layers "
+                   "(name, features, written, base, done) "
+                   "VALUES (?, ?, ?, ?, ?)",
+                   (layer, features, written, base, int(done)))
+        db.commit()
+
+    def remove(self):
+        """Remove journal after successful transformation"""
+        self.close()
+        if os.path.exists(self.fn):
+            os.remove(self.fn)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class DeltaHashes:
+
+    """Content hashes of the features written by delta transformations
+
+    The hashes of the delivered features are kept per layer and TID, so
+    the next delivery is compared with the previous one instead of the
+    features read back from the destination, which may be normalized by
+    the destination driver (numeric precision, date formats, geometry
+    types).
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            dirname = os.path.dirname(self.fn)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            self._db = sqlite3.connect(self.fn, timeout=60)
+            self._db.execute("CREATE TABLE IF NOT EXISTS hashes "
+                             "(layer TEXT, tid TEXT, hash BLOB, "
+                             "PRIMARY KEY (layer, tid))")
+        return self._db
+
+    def hashes(self, layer):
+        """Dict TID => content hash of layer"""
+        return dict((tid, bytes(digest)) for tid, digest in
+                    self._connect().execute(
+                        "SELECT tid, hash FROM hashes WHERE layer=?",
+                        (layer,)))
+
+    def replace(self, layer, hashes):
+        """Replace hashes of layer with dict TID => content hash"""
+        db = self._connect()
+        db.execute("DELETE FROM hashes WHERE layer=?", (layer,))
+        db.executemany("INSERT INTO hashes (layer, tid, hash) "
+                       "VALUES (?, ?, ?)",
+                       ((layer, tid, sqlite3.Binary(digest))
+                        for tid, digest in hashes.items()))
+        db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,112 @@
+from collections import Counter, deque, namedtuple
+try:
+    from osgeo import gdal
+except ImportError:
+    import gdal
+
+MAX_RECORDS = 1000
+
+LEVELS = {
+    gdal.CE_None: 'None',
+    gdal.CE_Debug: 'Debug',
+    gdal.CE_Warning: 'Warning',
+    gdal.CE_Failure: 'Failure',
+    gdal.CE_Fatal: 'Fatal'
+}
+
+LogRecord = namedtuple('LogRecord', ['level', 'errno', 'category', 'message'])
+
+
+class OgrLog:
+
+    """Capture of GDAL/OGR messages with a Python error handler
+
+    The last max_records messages are kept, messages are counted per
+    (level, category). The category of debug messages is their prefix
+    (e.g. 'OGR_PG'), otherwise the error number (CPLE_*).
+    Used as context manager, the handler is installed for the current
+    thread only, with CPL_DEBUG as thread local configuration option.
+    """
+
+    def __init__(self, debug=False, max_records=MAX_RECORDS):
+        self.debug = debug
+        self.records = deque(maxlen=max_records)
+        self.counts = Counter()
+        self._debug_option = None
+
+    def __getstate__(self):
+        # Logs of process pool jobs are merged into the parent log
+        state = self.__dict__.copy()
+        state['_debug_option'] = None
+        return state
+
+    def handler(self, err_class, err_no, msg):
+        level = LEVELS.get(err_class, str(err_class))
+        if err_class == gdal.CE_Debug:
+            category, sep, message = msg.partition(': ')
+            if not sep:
+                category, message = '', msg
+        else:
+            category, message = str(err_no), msg
+        self.add(LogRecord(level, err_no, category, message))
+
+    def add(self, record):
+        self.records.append(record)
+        self.counts[(record.level, record.category)] += 1
+
+    def extend(self, log):
+        """Merge records and counts of another log"""
+        self.records.extend(log.records)
+        self.counts.update(log.counts)
+
+    def __enter__(self):
+        self._debug_option = gdal.GetThreadLocalConfigOption('CPL_DEBUG', None)
+        gdal.SetThreadLocalConfigOption('CPL_DEBUG',
+                                        'ON' if self.debug else 'OFF')
+        gdal.PushErrorHandler(self.handler)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        gdal.PopErrorHandler()
+        gdal.SetThreadLocalConfigOption('CPL_DEBUG', self._debug_option)
+        return False
+
+    def warnings(self):
+        return [record for record in self.records
+                if record.level == 'Warning']
+
+    def errors(self):
+        return [record for record in self.records
+                if record.level in ('Failure', 'Fatal')]
+
+    def summary(self):
+        """Number of messages per level, including dropped messages"""
+        counts = Counter()
+        for (level, category), count in self.counts.items():
+            counts[level] += count
+        return dict(counts)
+
+    def dropped(self):
+        return sum(self.counts.values()) - len(self.records)
+
+    def text(self):
+        """Messages in CPL_LOG format"""
+        lines = []
+        if self.dropped() > 0:
+            lines.append("(%d earlier messages dropped)" % self.dropped())
+        for record in self.records:
+            if record.level == 'Debug':
+                if record.category:
+                    lines.append("%s: %s" % (record.category,
+                                             record.message))
+                else:
+                    lines.append(record.message)
+            elif record.level == 'Warning':
+                lines.append("Warning %d: %s" % (record.errno,
+                                                 record.message))
+            else:
+                lines.append("ERROR %d: %s" % (record.errno, record.message))
+        return ''.join(line + '\n' for line in lines)
+
+    def __str__(self):
+        return self.text()
@@ -1,8 +1,22 @@
 import json
+import hashlib
 from xml.etree import ElementTree
 import tempfile
 import os
+import shutil
+import time
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from .format_handler import FormatHandlerRegistry
+from ..interlis.transfer_file import vsi_datasource, TRANSFER_EXTENSIONS
+from ..interlis.model_cache import default_cache_dir, file_hash
+from ..pyogr.singlegeomvrt import tid_field_index
+from ..interlis.baskets import BasketIndex
+from ..interlis.model_loader import ModelLoader
+from .journal import TransformJournal, DeltaHashes, journal_path
+from .ogr_log import OgrLog, LogRecord
 try:
     from osgeo import ogr
     from osgeo import gdal
@@ -62,8 +76,37 @@ FIELD_TYPES = [
 ]
 
 
+# Version of generated configurations, part of the schema fingerprint
+
+CONFIG_CACHE_VERSION = 2
+
+
+# Fan-out transformations: features queued per destination and seconds
+# until a stalled destination is detached
+
+SINK_QUEUE_SIZE = 1000
+SINK_TIMEOUT = 300
+
+
+# Fields of enum tables
+
+ENUM_FIELDS = [
+    ('id', ogr.OFTInteger),
+    ('enum', ogr.OFTString),
+    ('enumtxt', ogr.OFTString)
+]
+
+
 def ogr2ogr(dst_format, ds, dest, bOverwrite, dsco=[], lco=[], layers=[],
-            skipfailures=False):
+            skipfailures=False, group_transactions=0, dst_names={},
+            bAppend=False, journal=None):
+    """Copy layers of ds to dest.
+
+    dst_names maps source layer names to different output layer names.
+    With bAppend, features are added to existing layers of dest.
+    Committed features are recorded in journal (TransformJournal).
+    Returns dict with elapsed seconds per layer
+    """
     # Get the input Layers
     inDataSource = ds
     layerList = []
@@ -85,73 +128,772 @@ def ogr2ogr(dst_format, ds, dest, bOverwrite, dsco=[], lco=[], layers=[],
     #     outDriver.DeleteDataSource(dest)
 
     # Create the output shapefile
-    outDataSource = outDriver.CreateDataSource(dest, options=dsco)
-    if outDataSource is None:
-        raise ValueError("Couldn't create output DataSource")
-    for layer in layerList:
-        inLayer = inDataSource.GetLayer(layer)
-        inLayerDefn = inLayer.GetLayerDefn()
-        srs = inLayer.GetSpatialRef()  # TODO: support reprojection
-        nGeomFieldCount = inLayerDefn.GetGeomFieldCount()
-
-        if bOverwrite:
-            lyridx = find_ogr_layer(outDataSource, layer)
-            if lyridx:
-                if outDataSource.DeleteLayer(lyridx) != 0:
-                    raise ValueError(
-                        "DeleteLayer() failed when overwrite requested.")
+    # Resumed transformations continue in existing layers
+    resume = journal is not None and journal.started()
+    outDataSource = open_output_datasource(outDriver, dest, dsco,
+                                           bAppend or resume)
+    timings = copy_layers(dst_format, inDataSource, outDataSource, bOverwrite,
+                          lco, layerList, skipfailures, group_transactions,
+                          dst_names, bAppend, journal)
 
-        multiGeomSupported = outDataSource.TestCapability(
-            ogr.ODsCCreateGeomFieldAfterCreateLayer)
-        if multiGeomSupported:
-            outLayer = outDataSource.CreateLayer(
-                layer, srs=srs, geom_type=ogr.wkbNone, options=lco)
-        else:
-            outLayer = outDataSource.CreateLayer(
-                layer, srs=srs, geom_type=inLayerDefn.GetGeomType(),
-                options=lco)
-        if outLayer is None:
-            raise ValueError("Couldn't create output layer")
+    # Close DataSources
+    inDataSource.Destroy()
+    outDataSource.Destroy()
+    return timings
 
-        # Add input Layer Fields to the output Layer
-        # Interlis fields are created from model
-        if "Interlis" not in dst_format:
-            for i in range(0, inLayerDefn.GetFieldCount()):
-                fieldDefn = inLayerDefn.GetFieldDefn(i)
-                outLayer.CreateField(fieldDefn)
 
-            if multiGeomSupported:
-                for iGeom in range(nGeomFieldCount):
-                    poGFldDefn = inLayerDefn.GetGeomFieldDefn(iGeom)
-                    outLayer.CreateGeomField(poGFldDefn)
+def open_output_datasource(outDriver, dest, dsco=[], bAppend=False):
+    if bAppend:
+        outDataSource = ogr.Open(dest, update=True)
+        if outDataSource is None:
+            raise ValueError("Couldn't open output DataSource for update")
+    else:
+        outDataSource = outDriver.CreateDataSource(dest, options=dsco)
+        if outDataSource is None:
+            raise ValueError("Couldn't create output DataSource")
+    return outDataSource
+
+
+def copy_layers(dst_format, inDataSource, outDataSource, bOverwrite, lco,
+                layerList, skipfailures=False, group_transactions=0,
+                dst_names={}, bAppend=False, journal=None):
+    """Copy layers between open datasources.
+
+    With a journal, the number of source features is recorded after each
+    committed transaction. Layers with committed features are continued
+    after the last committed feature instead of being recreated. The
+    journal is updated after the transaction in the destination, so
+    features found in the destination layer beyond the recorded count
+    are skipped as well.
+    Returns dict with elapsed seconds per layer
+    """
+    timings = {}
+    for src_layer in layerList:
+        start = time.time()
+        inLayer = inDataSource.GetLayer(src_layer)
+        layer = dst_names.get(src_layer, src_layer)
+        inLayerDefn = inLayer.GetLayerDefn()
+        nGeomFieldCount = inLayerDefn.GetGeomFieldCount()
+        progress = None
+        if journal is not None:
+            progress = journal.progress(src_layer)
+
+        outLayer = None
+        if bAppend or progress is not None:
+            outLayer = outDataSource.GetLayerByName(layer)
+        rows = written = base = 0
+        if outLayer is None:
+            outLayer = create_layer(dst_format, inLayer, outDataSource, layer,
+                                    bOverwrite, lco)
+        elif progress is not None:
+            rows, written, base = progress
+            # Transaction committed after the last journal update
+            count = outLayer.GetFeatureCount() - base
+            if count > written:
+                rows += count - written
+                written = count
+        elif journal is not None:
+            base = outLayer.GetFeatureCount()
+        if journal is not None and progress is None:
+            journal.commit(src_layer, 0, base=base)
 
         # Get the output Layer's Feature Definition
         outLayerDefn = outLayer.GetLayerDefn()
+        field_map = field_index_map(inLayerDefn, outLayerDefn)
+
+        inLayer.ResetReading()
+        if rows > 0:
+            inLayer.SetNextByIndex(rows)
+
+        committed = [rows, written]
+
+        def on_commit(consumed, layer_written):
+            committed[0] = rows + consumed
+            committed[1] = written + layer_written
+            if journal is not None:
+                journal.commit(src_layer, committed[0],
+                               written=committed[1], base=base)
 
         # Add features to the ouput Layer
-        for inFeature in inLayer:
-            # Create output Feature
-            outFeature = ogr.Feature(outLayerDefn)
+        # Arrow batches can't skip single failed features and always
+        # start with the first feature
+        if not skipfailures and rows == 0 and \
+                "Interlis" not in dst_format and \
+                arrow_supported(inLayer, outLayer, field_map):
+            write_arrow_batches(inLayer, outLayer, group_transactions,
+                                on_commit)
+        else:
+            write_features(
+                outLayer,
+                translate_features(inLayer, outLayerDefn, field_map,
+                                   nGeomFieldCount),
+                group_transactions, skipfailures, on_commit)
+        if journal is not None:
+            journal.commit(src_layer, committed[0], done=True,
+                           written=committed[1], base=base)
+        timings[src_layer] = time.time() - start
+    return timings
+
+
+def create_layer(dst_format, inLayer, outDataSource, layer, bOverwrite, lco):
+    """Create output layer with fields of inLayer"""
+    inLayerDefn = inLayer.GetLayerDefn()
+    # Reprojected layers of the VRT have the target SRS
+    srs = inLayer.GetSpatialRef()
+    nGeomFieldCount = inLayerDefn.GetGeomFieldCount()
+
+    if bOverwrite:
+        lyridx = find_ogr_layer(outDataSource, layer)
+        if lyridx is not None:
+            if outDataSource.DeleteLayer(lyridx) != 0:
+                raise ValueError(
+                    "DeleteLayer() failed when overwrite requested.")
 
-            # Add field values from input Layer
-            for i in range(0, outLayerDefn.GetFieldCount()):
-                fieldName = outLayerDefn.GetFieldDefn(i).GetNameRef()
-                src_idx = inLayerDefn.GetFieldIndex(fieldName)
-                if inFeature.IsFieldSet(src_idx):
-                    outFeature.SetField(i, inFeature.GetField(src_idx))
+    multiGeomSupported = outDataSource.TestCapability(
+        ogr.ODsCCreateGeomFieldAfterCreateLayer)
+    if multiGeomSupported:
+        outLayer = outDataSource.CreateLayer(
+            layer, srs=srs, geom_type=ogr.wkbNone, options=lco)
+    else:
+        outLayer = outDataSource.CreateLayer(
+            layer, srs=srs, geom_type=inLayerDefn.GetGeomType(),
+            options=lco)
+    if outLayer is None:
+        raise ValueError("Couldn't create output layer")
+
+    # Add input Layer Fields to the output Layer
+    # Interlis fields are created from model
+    if "Interlis" not in dst_format:
+        for i in range(0, inLayerDefn.GetFieldCount()):
+            fieldDefn = inLayerDefn.GetFieldDefn(i)
+            outLayer.CreateField(fieldDefn)
 
-            # Add geometry values
+        if multiGeomSupported:
             for iGeom in range(nGeomFieldCount):
-                geom = inFeature.GetGeomFieldRef(iGeom)
-                if geom is not None:
-                    outFeature.SetGeomField(iGeom, geom.Clone())
+                poGFldDefn = inLayerDefn.GetGeomFieldDefn(iGeom)
+                outLayer.CreateGeomField(poGFldDefn)
+    return outLayer
+
+
+def _ogr2ogr_job(vrt, dst_format, dest, dsco, lco, layers, skipfailures,
+                 group_transactions, dst_names, bAppend, journal=None,
+                 debug=False):
+    # Process pool job with its own source and destination datasources
+    # Returns timings and OgrLog of the job
+    vrtfn = '/vsimem/ogr_job_%d.vrt' % os.getpid()
+    gdal.FileFromMemBuffer(vrtfn, vrt)
+    try:
+        with OgrLog(debug) as log:
+            ds = ogr.Open(vrtfn)
+            if ds is None:
+                raise IOError("Couldn't open VRT for layers %s" % layers)
+            timings = ogr2ogr(
+                dst_format=dst_format, ds=ds, dest=dest, bOverwrite=True,
+                dsco=dsco, lco=lco, layers=layers, skipfailures=skipfailures,
+                group_transactions=group_transactions, dst_names=dst_names,
+                bAppend=bAppend, journal=journal)
+        return timings, log
+    finally:
+        if journal is not None:
+            journal.close()
+        gdal.Unlink(vrtfn)
+
+
+def layer_groups(layers, count):
+    """Distribute layers round-robin into at most count groups"""
+    groups = [layers[idx::count] for idx in range(count)]
+    return [group for group in groups if group]
+
+
+def parallel_ogr2ogr(dst_format, vrt, dest, dsco=[], lco=[], layers=[],
+                     skipfailures=False, group_transactions=0,
+                     concurrent_writes=False, max_workers=None, dst_names={},
+                     bAppend=False, journal=None, log=None):
+    """Copy layers of VRT to dest in a process pool with max_workers
+    processes.
+
+    Each job copies a group of layers. Since each job opens the source
+    datasource of the VRT itself, and drivers like Interlis read the whole
+    source on opening, there is one job per worker process instead of one
+    job per layer.
+    With concurrent_writes, jobs write to dest directly (e.g. PostgreSQL).
+    Otherwise each job writes to a temporary SQLite file, which are
+    merged into dest afterwards. Only writes to dest are recorded in
+    journal. Messages of the jobs are added to log (OgrLog).
+    Returns dict with elapsed seconds per layer
+    """
+    outDriver = ogr.GetDriverByName(dst_format)
+    if outDriver is None:
+        raise ValueError("Couldn't find driver '%s'" % dst_format)
+    timings = {}
+    tmpdir = None
+    resume = journal is not None and journal.started()
+    debug = log is not None and log.debug
+    if concurrent_writes:
+        # Create destination before the jobs open it
+        open_output_datasource(
+            outDriver, dest, dsco, bAppend or resume).Destroy()
+    else:
+        tmpdir = tempfile.mkdtemp(prefix='ogr_')
+    try:
+        groups = layer_groups(layers, max_workers or os.cpu_count() or 1)
+        jobs = {}
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for idx, group in enumerate(groups):
+                if concurrent_writes:
+                    job = executor.submit(
+                        _ogr2ogr_job, vrt, dst_format, dest, dsco, lco,
+                        group, skipfailures, group_transactions, dst_names,
+                        bAppend, journal, debug)
+                else:
+                    tmpfn = os.path.join(tmpdir, '%d.sqlite' % idx)
+                    job = executor.submit(
+                        _ogr2ogr_job, vrt, 'SQLite', tmpfn, [],
+                        ['LAUNDER=NO'], group, skipfailures, 0, {}, False,
+                        None, debug)
+                jobs[job] = group
+            for job in as_completed(jobs):
+                job_timings, job_log = job.result()
+                timings.update(job_timings)
+                if log is not None:
+                    log.extend(job_log)
+        if not concurrent_writes:
+            # Merge step for single writer formats
+            outDataSource = open_output_datasource(
+                outDriver, dest, dsco, bAppend or resume)
+            for idx, group in enumerate(groups):
+                ds = ogr.Open(os.path.join(tmpdir, '%d.sqlite' % idx))
+                merge_timings = copy_layers(
+                    dst_format, ds, outDataSource, True, lco, group,
+                    skipfailures, group_transactions, dst_names, bAppend,
+                    journal)
+                for layer in group:
+                    timings[layer] += merge_timings[layer]
+                ds.Destroy()
+            outDataSource.Destroy()
+    finally:
+        if tmpdir is not None:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    return timings
+
+
+class _LayerStart(namedtuple('_LayerStart', ['name', 'schema_ds', 'schema'])):
+    # Queue item starting a layer, with an in-memory copy of its schema
+    pass
+
+
+def _schema_layer(inLayer):
+    """Empty in-memory layer with fields, geometry fields and SRS of inLayer.
+
+    Returns datasource and layer, the layer is valid as long as the
+    datasource is referenced.
+    """
+    driver = ogr.GetDriverByName('MEM') or ogr.GetDriverByName('Memory')
+    ds = driver.CreateDataSource('')
+    inLayerDefn = inLayer.GetLayerDefn()
+    layer = ds.CreateLayer(inLayer.GetName(), srs=inLayer.GetSpatialRef(),
+                           geom_type=ogr.wkbNone)
+    for i in range(inLayerDefn.GetFieldCount()):
+        layer.CreateField(inLayerDefn.GetFieldDefn(i))
+    for iGeom in range(inLayerDefn.GetGeomFieldCount()):
+        layer.CreateGeomField(inLayerDefn.GetGeomFieldDefn(iGeom))
+    return ds, layer
+
+
+def _feature_values(inFeature, nFieldCount, nGeomFieldCount):
+    # Field values and WKB geometries, shared by all sinks
+    values = [inFeature.GetField(i) if inFeature.IsFieldSet(i) else None
+              for i in range(nFieldCount)]
+    geoms = []
+    for iGeom in range(nGeomFieldCount):
+        geom = inFeature.GetGeomFieldRef(iGeom)
+        geoms.append(geom.ExportToIsoWkb() if geom is not None else None)
+    return values, geoms
+
+
+class FeatureSink(threading.Thread):
+
+    """Writer thread of a fan-out transformation
+
+    Layers and features are read from a bounded queue and written to dest
+    with a datasource of its own. Features are passed as field values and
+    WKB geometries, no OGR objects are shared between threads.
+    """
+
+    def __init__(self, dst_format, dest, dsco=[], lco=[], skipfailures=False,
+                 group_transactions=0, queue_size=SINK_QUEUE_SIZE,
+                 debug=False):
+        threading.Thread.__init__(self)
+        # A detached sink must not keep the process alive
+        self.daemon = True
+        self.dst_format = dst_format
+        self.dest = dest
+        self.dsco = dsco
+        self.lco = lco
+        self.skipfailures = skipfailures
+        self.group_transactions = group_transactions
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.log = OgrLog(debug)
+        self.status = 'ok'  # 'ok', 'detached' or 'failed'
+        self.error = None
+        self._next_layer = None
+
+    def put(self, item, timeout=None):
+        """Queue item for writing. A sink not accepting the item within
+        timeout seconds is detached.
+        Returns False for detached or failed sinks.
+        """
+        deadline = None
+        if timeout is not None:
+            deadline = time.time() + timeout
+        while self.status == 'ok':
+            try:
+                # Short waits to notice failures of the writer thread
+                self.queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                if deadline is not None and time.time() >= deadline:
+                    self.status = 'detached'
+                    self.error = \
+                        "Destination stalled for more than %ss" % timeout
+        return False
+
+    def _get(self):
+        while True:
+            try:
+                return self.queue.get(timeout=1)
+            except queue.Empty:
+                if self.status != 'ok':
+                    raise ValueError(self.error)
+
+    def run(self):
+        with self.log:
+            try:
+                self._write()
+            except Exception as e:
+                if self.status == 'ok':
+                    self.status = 'failed'
+                    self.error = str(e)
+
+    def _write(self):
+        outDriver = ogr.GetDriverByName(self.dst_format)
+        if outDriver is None:
+            raise ValueError("Couldn't find driver '%s'" % self.dst_format)
+        outDataSource = open_output_datasource(outDriver, self.dest, self.dsco)
+        try:
+            item = self._get()
+            while item is not None:
+                outLayer = create_layer(self.dst_format, item.schema,
+                                        outDataSource, item.name, True,
+                                        self.lco)
+                outLayerDefn = outLayer.GetLayerDefn()
+                field_map = field_index_map(item.schema.GetLayerDefn(),
+                                            outLayerDefn)
+                self._next_layer = None
+                write_features(outLayer,
+                               self._features(outLayerDefn, field_map),
+                               self.group_transactions, self.skipfailures)
+                item = self._next_layer
+        finally:
+            outDataSource.Destroy()
+
+    def _features(self, outLayerDefn, field_map):
+        # Output features until the next layer or the end of the queue
+        while True:
+            item = self._get()
+            if item is None or isinstance(item, _LayerStart):
+                self._next_layer = item
+                return
+            values, geoms = item
+            outFeature = ogr.Feature(outLayerDefn)
+            for dst_idx, src_idx in field_map:
+                if values[src_idx] is not None:
+                    outFeature.SetField(dst_idx, values[src_idx])
+            for iGeom, wkb in enumerate(geoms):
+                if wkb is not None:
+                    outFeature.SetGeomFieldDirectly(
+                        iGeom, ogr.CreateGeometryFromWkb(wkb))
+            yield outFeature
+
+
+def fanout_ogr2ogr(ds, sinks, layers, timeout=SINK_TIMEOUT):
+    """Read layers of ds once and write their features to all sinks
+    (FeatureSink).
+
+    A sink not accepting a feature within timeout seconds is detached,
+    the other sinks continue. Reading stops when no sink is left.
+    Returns dict with elapsed seconds per layer
+    """
+    for sink in sinks:
+        sink.start()
+    timings = {}
+    try:
+        for src_layer in layers:
+            start = time.time()
+            inLayer = ds.GetLayer(src_layer)
+            inLayerDefn = inLayer.GetLayerDefn()
+            nFieldCount = inLayerDefn.GetFieldCount()
+            nGeomFieldCount = inLayerDefn.GetGeomFieldCount()
+            for sink in sinks:
+                schema_ds, schema = _schema_layer(inLayer)
+                sink.put(_LayerStart(src_layer, schema_ds, schema), timeout)
+            inLayer.ResetReading()
+            while True:
+                inFeature = inLayer.GetNextFeature()
+                if inFeature is None:
+                    break
+                item = _feature_values(inFeature, nFieldCount,
+                                       nGeomFieldCount)
+                accepted = [sink.put(item, timeout) for sink in sinks]
+                if not any(accepted):
+                    break
+            timings[src_layer] = time.time() - start
+            if not any(sink.status == 'ok' for sink in sinks):
+                break
+    finally:
+        for sink in sinks:
+            sink.put(None, timeout)
+        for sink in sinks:
+            # Detached sinks may be blocked in the destination
+            sink.join(timeout if sink.status == 'detached' else None)
+    return timings
+
+
+def translate_features(inLayer, outLayerDefn, field_map, nGeomFieldCount):
+    """Generator of output features for features of inLayer, starting at
+    its current read position"""
+    while True:
+        # Iterating over the layer would reset the read position
+        inFeature = inLayer.GetNextFeature()
+        if inFeature is None:
+            break
+        # Create output Feature
+        outFeature = ogr.Feature(outLayerDefn)
+
+        # Add field values from input Layer
+        for dst_idx, src_idx in field_map:
+            if inFeature.IsFieldSet(src_idx):
+                outFeature.SetField(dst_idx, inFeature.GetField(src_idx))
+
+        # Add geometry values
+        # SetGeomField copies the geometry owned by inFeature, an additional
+        # Clone() would allocate it twice
+        for iGeom in range(nGeomFieldCount):
+            geom = inFeature.GetGeomFieldRef(iGeom)
+            if geom is not None:
+                outFeature.SetGeomField(iGeom, geom)
+
+        yield outFeature
+
+
+def write_features(outLayer, features, group_transactions=0,
+                   skipfailures=False, on_commit=None):
+    """Write features to outLayer, grouping group_transactions features
+    per transaction.
+
+    A failed feature rolls back its transaction. With skipfailures the
+    other features of the rolled back group are written again one by one,
+    otherwise a ValueError is raised.
+    on_commit(consumed, written) is called with the number of processed
+    features (including skipped ones) and the number of written features
+    after each commit and after the last feature.
+    Returns number of written features.
+    """
+    if group_transactions > 0 and \
+            not outLayer.TestCapability(ogr.OLCTransactions):
+        group_transactions = 0
+    written = 0
+    consumed = 0
+    in_transaction = 0
+    batch = []  # Features of current transaction, kept for replay
+    if group_transactions > 0:
+        outLayer.StartTransaction()
+    for outFeature in features:
+        consumed += 1
+        if outLayer.CreateFeature(outFeature) != 0:
+            if group_transactions > 0:
+                outLayer.RollbackTransaction()
+                written -= in_transaction
+            if not skipfailures:
+                raise ValueError(
+                    "Unable to write feature to layer %s" % outLayer.GetName())
+            if group_transactions > 0:
+                for feature in batch:
+                    feature.SetFID(ogr.NullFID)
+                    if outLayer.CreateFeature(feature) == 0:
+                        written += 1
+                batch = []
+                in_transaction = 0
+                if on_commit is not None:
+                    on_commit(consumed, written)
+                outLayer.StartTransaction()
+            continue
+        written += 1
+        if group_transactions > 0:
+            in_transaction += 1
+            if skipfailures:
+                batch.append(outFeature)
+            if in_transaction == group_transactions:
+                outLayer.CommitTransaction()
+                if on_commit is not None:
+                    on_commit(consumed, written)
+                outLayer.StartTransaction()
+                batch = []
+                in_transaction = 0
+    if group_transactions > 0:
+        outLayer.CommitTransaction()
+    if on_commit is not None:
+        on_commit(consumed, written)
+    return written
+
+
+def arrow_supported(inLayer, outLayer, field_map):
+    """Check whether features can be copied as Arrow batches (GDAL >= 3.8)
+
+    Requires all fields with equal names in the output layer and at most
+    one geometry field.
+    """
+    if int(gdal.VersionInfo('VERSION_NUM')) < 3080000 or \
+            not hasattr(inLayer, 'GetArrowStream') or \
+            not hasattr(outLayer, 'WriteArrowBatch'):
+        return False
+    inLayerDefn = inLayer.GetLayerDefn()
+    outLayerDefn = outLayer.GetLayerDefn()
+    if len(field_map) != inLayerDefn.GetFieldCount():
+        return False
+    for dst_idx, src_idx in field_map:
+        if outLayerDefn.GetFieldDefn(dst_idx).GetNameRef() != \
+                inLayerDefn.GetFieldDefn(src_idx).GetNameRef():
+            return False
+    nGeomFieldCount = inLayerDefn.GetGeomFieldCount()
+    return nGeomFieldCount <= 1 and \
+        outLayerDefn.GetGeomFieldCount() == nGeomFieldCount
+
+
+def write_arrow_batches(inLayer, outLayer, group_transactions=0,
+                        on_commit=None):
+    """Copy features of inLayer to outLayer as Arrow record batches of
+    group_transactions features, each batch in its own transaction.
+
+    on_commit(consumed, written) is called with the number of copied
+    features after each batch.
+    """
+    options = ['INCLUDE_FID=NO']
+    if group_transactions > 0:
+        options.append('MAX_FEATURES_IN_BATCH=%d' % group_transactions)
+    write_options = []
+    inLayerDefn = inLayer.GetLayerDefn()
+    if inLayerDefn.GetGeomFieldCount() == 1:
+        geom_name = inLayerDefn.GetGeomFieldDefn(0).GetName() or \
+            'wkb_geometry'
+        options.append('GEOMETRY_NAME=%s' % geom_name)
+        write_options.append('GEOMETRY_NAME=%s' % geom_name)
+    transactions = group_transactions > 0 and \
+        outLayer.TestCapability(ogr.OLCTransactions)
+    stream = inLayer.GetArrowStream(options)
+    schema = stream.GetSchema()
+    consumed = 0
+    while True:
+        array = stream.GetNextRecordBatch()
+        if array is None:
+            break
+        if transactions:
+            outLayer.StartTransaction()
+        if outLayer.WriteArrowBatch(schema, array, write_options) != 0:
+            if transactions:
+                outLayer.RollbackTransaction()
+            raise ValueError(
+                "Unable to write Arrow batch to layer %s" % outLayer.GetName())
+        if transactions:
+            outLayer.CommitTransaction()
+        consumed += array.GetLength()
+        if on_commit is not None:
+            on_commit(consumed, consumed)
+
+
+def field_index_map(inLayerDefn, outLayerDefn):
+    """List of (destination index, source index) for fields with equal
+    names, computed once per layer instead of per feature"""
+    field_map = []
+    for dst_idx in range(outLayerDefn.GetFieldCount()):
+        fieldName = outLayerDefn.GetFieldDefn(dst_idx).GetNameRef()
+        src_idx = inLayerDefn.GetFieldIndex(fieldName)
+        if src_idx != -1:
+            field_map.append((dst_idx, src_idx))
+    return field_map
+
+
+def feature_hash(feature, field_indices, nGeomFieldCount):
+    """Content hash of field values and geometries of feature"""
+    sha = hashlib.sha1()
+    for idx in field_indices:
+        sha.update(repr(feature.GetField(idx)).encode('utf-8'))
+        sha.update(b'\0')
+    for iGeom in range(nGeomFieldCount):
+        geom = feature.GetGeomFieldRef(iGeom)
+        if geom is not None:
+            sha.update(bytes(geom.ExportToIsoWkb()))
+        sha.update(b'\0')
+    return sha.digest()
+
+
+def write_delta(inLayer, outLayer, field_map, nGeomFieldCount,
+                group_transactions=0, hashes=None):
+    """Apply features of inLayer to the existing features of outLayer.
+
+    Features are matched by TID. New features are inserted, features with
+    a different content hash updated and features missing in inLayer
+    deleted. Changes are grouped into transactions of group_transactions
+    features.
+    hashes is a dict TID => content hash of the previous delivery, which
+    is updated with the hashes of inLayer. Features without previous
+    hash are compared with the feature read from outLayer.
+    Returns dict with number of 'inserted', 'updated', 'deleted' and
+    'unchanged' features.
+    """
+    outLayerDefn = outLayer.GetLayerDefn()
+    tid_idx = tid_field_index(outLayerDefn)
+    if tid_idx == -1:
+        raise ValueError("No TID field in layer %s" % outLayer.GetName())
+    if not outLayer.TestCapability(ogr.OLCRandomWrite) or \
+            not outLayer.TestCapability(ogr.OLCDeleteFeature):
+        raise ValueError("Layer %s doesn't support updates" %
+                         outLayer.GetName())
+    if hashes is None:
+        hashes = {}
+    hash_fields = [dst_idx for dst_idx, src_idx in field_map]
+
+    # TID => FID of existing features
+    existing = {}
+    duplicates = []
+    outLayer.ResetReading()
+    for feature in outLayer:
+        tid = feature.GetField(tid_idx)
+        if tid in existing:
+            duplicates.append(feature.GetFID())
+            continue
+        existing[tid] = feature.GetFID()
+        if str(tid) not in hashes:
+            hashes[str(tid)] = feature_hash(feature, hash_fields,
+                                            nGeomFieldCount)
+
+    counts = {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+    delivered = {}  # TID => content hash of inLayer features
+    transactions = group_transactions > 0 and \
+        outLayer.TestCapability(ogr.OLCTransactions)
+    in_transaction = [0]
+
+    def changed():
+        if transactions:
+            in_transaction[0] += 1
+            if in_transaction[0] == group_transactions:
+                outLayer.CommitTransaction()
+                outLayer.StartTransaction()
+                in_transaction[0] = 0
+
+    if transactions:
+        outLayer.StartTransaction()
+    try:
+        inLayer.ResetReading()
+        for outFeature in translate_features(inLayer, outLayerDefn,
+                                             field_map, nGeomFieldCount):
+            tid = outFeature.GetField(tid_idx)
+            digest = feature_hash(outFeature, hash_fields, nGeomFieldCount)
+            delivered[str(tid)] = digest
+            fid = existing.pop(tid, None)
+            if fid is None:
+                err = outLayer.CreateFeature(outFeature)
+                counts['inserted'] += 1
+            else:
+                if hashes.get(str(tid)) == digest:
+                    counts['unchanged'] += 1
+                    continue
+                outFeature.SetFID(fid)
+                err = outLayer.SetFeature(outFeature)
+                counts['updated'] += 1
+            if err != 0:
+                raise ValueError("Unable to write feature %s to layer %s" %
+                                 (tid, outLayer.GetName()))
+            changed()
+        for fid in duplicates + list(existing.values()):
+            if outLayer.DeleteFeature(fid) != 0:
+                raise ValueError("Unable to delete feature %s of layer %s" %
+                                 (fid, outLayer.GetName()))
+            counts['deleted'] += 1
+            changed()
+    except Exception:
+        if transactions:
+            outLayer.RollbackTransaction()
+        raise
+    if transactions:
+        outLayer.CommitTransaction()
+    hashes.clear()
+    hashes.update(delivered)
+    return counts
+
+
+def open_existing_datasource(dest):
+    """Open dest for update, None if it doesn't exist"""
+    gdal.PushErrorHandler('CPLQuietErrorHandler')
+    try:
+        return ogr.Open(dest, update=True)
+    finally:
+        gdal.PopErrorHandler()
 
-            # Add new feature to output Layer
-            outLayer.CreateFeature(outFeature)
 
-    # Close DataSources
-    inDataSource.Destroy()
-    outDataSource.Destroy()
+def delta_ogr2ogr(dst_format, ds, dest, dsco=[], lco=[], layers=[],
+                  group_transactions=0, delta_hashes=None):
+    """Apply changes of layers of ds to dest, see write_delta.
+
+    Missing layers and dest are created. Layers without TID field are
+    recreated. The content hashes of the delivered features are kept in
+    delta_hashes (DeltaHashes).
+    Returns dict with counts of write_delta per layer
+    """
+    outDriver = ogr.GetDriverByName(dst_format)
+    if outDriver is None:
+        raise ValueError("Couldn't find driver '%s'" % dst_format)
+    outDataSource = open_existing_datasource(dest)
+    if outDataSource is None:
+        outDataSource = open_output_datasource(outDriver, dest, dsco)
+    counts = {}
+    try:
+        for name in layers or [lyr.GetName() for lyr in ds]:
+            inLayer = ds.GetLayer(name)
+            inLayerDefn = inLayer.GetLayerDefn()
+            nGeomFieldCount = inLayerDefn.GetGeomFieldCount()
+            outLayer = outDataSource.GetLayerByName(name)
+            if tid_field_index(inLayerDefn) == -1:
+                deleted = outLayer.GetFeatureCount() if outLayer else 0
+                outLayer = create_layer(dst_format, inLayer, outDataSource,
+                                        name, True, lco)
+                field_map = field_index_map(inLayerDefn,
+                                            outLayer.GetLayerDefn())
+                inLayer.ResetReading()
+                inserted = write_features(
+                    outLayer,
+                    translate_features(inLayer, outLayer.GetLayerDefn(),
+                                       field_map, nGeomFieldCount),
+                    group_transactions)
+                counts[name] = {'inserted': inserted, 'updated': 0,
+                                'deleted': deleted, 'unchanged': 0}
+                continue
+            hashes = {}
+            if outLayer is None:
+                outLayer = create_layer(dst_format, inLayer, outDataSource,
+                                        name, False, lco)
+            elif delta_hashes is not None:
+                hashes = delta_hashes.hashes(name)
+            field_map = field_index_map(inLayerDefn,
+                                        outLayer.GetLayerDefn())
+            counts[name] = write_delta(inLayer, outLayer, field_map,
+                                       nGeomFieldCount, group_transactions,
+                                       hashes)
+            if delta_hashes is not None:
+                delta_hashes.replace(name, hashes)
+    finally:
+        outDataSource.Destroy()
+    return counts
 
 
 def find_ogr_layer(ds, layerName):
@@ -181,6 +923,39 @@ def find_ogr_layer(ds, layerName):
     return iLayer
 
 
+def _transform_basket(basketfn, append, config, model, dest, format,
+                      layers, skipfailures, debug, group_transactions):
+    # Transform single basket, optionally as process pool job
+    try:
+        ds = basketfn + ',' + model if model else basketfn
+        trans = OgrConfig(ds=ds)
+        trans._config = config
+        trans._transform(dest, format, layers, skipfailures, debug,
+                         group_transactions, append=append)
+        return trans.ogr_log(), trans.layer_timings()
+    finally:
+        os.remove(basketfn)
+
+
+def srs_definition(srs):
+    """SRS for VRT files, with EPSG prefix for numeric codes (e.g. 2056)"""
+    srs = str(srs)
+    if srs.isdigit():
+        return 'EPSG:' + srs
+    return srs
+
+
+def _execute_sql(ds, sql):
+    """Execute SQL statement, raising IOError on failure"""
+    gdal.ErrorReset()
+    result = ds.ExecuteSQL(sql)
+    if result is not None:
+        ds.ReleaseResultSet(result)
+    if gdal.GetLastErrorType() >= gdal.CE_Failure:
+        raise IOError("SQL statement failed: %s\n%s" % (
+            gdal.GetLastErrorMsg(), sql))
+
+
 class OgrConfig:
 
     """OGR transformation configuration"""
@@ -188,10 +963,14 @@ class OgrConfig:
     format_handlers = FormatHandlerRegistry()
 
     def __init__(self, ds=None, config=None, model=None):
-        self._ds_fn = ds
+        self._src_ds = ds
+        # Compressed transfer files are read via /vsigzip/ or /vsizip/
+        self._ds_fn = vsi_datasource(ds)
         self._ds = None
         self._config = self._load(config)
         self._model = model
+        self._layer_timings = {}
+        self._ogr_log = OgrLog()
         # if not self._model:
         #    if ds:
         #        self._model = ds.split(',')[-1]
@@ -230,7 +1009,106 @@ class OgrConfig:
         return enum_tables
 
     def generate_config(self, dst_format, outfile=None,
-                        layer_list=[], srs=None):
+                        layer_list=[], srs=None, dst_srs=None, cache=False):
+        """Generate configuration for transforming the datasource into
+        dst_format.
+
+        With cache, generated configurations are kept in the ogrtools
+        cache directory, keyed by schema_fingerprint().
+        """
+        configstr = None
+        cachefn = None
+        if cache:
+            cachefn = os.path.join(
+                default_cache_dir(), 'configs', self.schema_fingerprint(
+                    dst_format, layer_list, srs, dst_srs) + '.cfg')
+            try:
+                with open(cachefn) as f:
+                    configstr = f.read()
+                self._config = json.loads(configstr)
+            except (IOError, ValueError):
+                configstr = None
+        if configstr is None:
+            configstr = self._generate_config(
+                dst_format, layer_list, srs, dst_srs)
+            if cachefn is not None:
+                self._store_config(cachefn, configstr)
+
+        if outfile is not None:
+            f = open(outfile, "w")
+            f.write(configstr)
+            f.close()
+
+        return configstr
+
+    def _store_config(self, cachefn, configstr):
+        try:
+            dirname = os.path.dirname(cachefn)
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            tmpfn = '%s.%d.tmp' % (cachefn, os.getpid())
+            with open(tmpfn, "w") as f:
+                f.write(configstr)
+            os.replace(tmpfn, cachefn)
+        except OSError:
+            # Cache not usable (e.g. read-only home directory)
+            pass
+
+    def schema_fingerprint(self, dst_format, layer_list=[], srs=None,
+                           dst_srs=None):
+        """Hash of source schema, model and destination format.
+
+        The schema of Interlis transfer files read with a model ('data.xtf,
+        model.imd') is defined by the model, so the transfer file is not
+        opened. For other datasources, the layer and field definitions are
+        read.
+        """
+        sha = hashlib.sha1()
+
+        def add(value):
+            sha.update(json.dumps(value).encode('utf-8'))
+            sha.update(b'\0')
+
+        dst_format_handler = OgrConfig.format_handlers.handler(dst_format)
+        add([CONFIG_CACHE_VERSION, gdal.VersionInfo('VERSION_NUM'),
+             dst_format, type(dst_format_handler).__name__, list(layer_list),
+             srs, dst_srs, gdal.GetConfigOption('OGR_STROKE_CURVE')])
+        if self._model:
+            add(file_hash(self._model))
+        transfer_fn, __, model = (self._src_ds or '').partition(',')
+        transfer_ext = self._transfer_extension(transfer_fn)
+        if transfer_ext and model and os.path.exists(model):
+            add([transfer_ext, file_hash(model)])
+        else:
+            if self._ds is None:
+                self.open()
+            add(self._ds.GetDriver().GetName())
+            for layer in self._ds:
+                layerdef = layer.GetLayerDefn()
+                fields = []
+                for fld_index in range(layerdef.GetFieldCount()):
+                    fd = layerdef.GetFieldDefn(fld_index)
+                    fields.append([fd.GetName(), fd.GetType(), fd.GetWidth(),
+                                   fd.GetPrecision()])
+                geom_fields = []
+                for fld_index in range(layerdef.GetGeomFieldCount()):
+                    fd = layerdef.GetGeomFieldDefn(fld_index)
+                    geom_fields.append([fd.GetName(), fd.GetType()])
+                add([layerdef.GetName(), fields, geom_fields,
+                     layerdef.GetGeomType()])
+        return sha.hexdigest()
+
+    def _transfer_extension(self, fn):
+        # Extension of Interlis transfer file, also when compressed
+        name = fn.lower()
+        if name.endswith('.gz'):
+            name = name[:-3]
+        ext = os.path.splitext(name)[1]
+        if ext in TRANSFER_EXTENSIONS:
+            return ext
+        return None
+
+    def _generate_config(self, dst_format, layer_list, srs, dst_srs):
         if self._ds is None:
             self.open()
 
@@ -298,6 +1176,9 @@ class OgrConfig:
                         cfgfield['type'] = GEOMETRY_TYPES[src_fd.GetType()]
                         if srs:
                             cfgfield['srs'] = srs
+                        if dst_srs:
+                            # Reprojection while transforming
+                            cfgfield['dst_srs'] = dst_srs
 
             geom_type = GEOMETRY_TYPES[layerdef.GetGeomType()]
             cfglayer['geometry_type'] = geom_type
@@ -306,14 +1187,7 @@ class OgrConfig:
         if enum_tables:
             self._config['enums'] = enum_tables
 
-        configstr = json.dumps(self._config, indent=2)
-
-        if outfile is not None:
-            f = open(outfile, "w")
-            f.write(configstr)
-            f.close()
-
-        return configstr
+        return json.dumps(self._config, indent=2)
 
     def src_format(self):
         return self._config['src_format']
@@ -338,6 +1212,17 @@ class OgrConfig:
             options.append(key + "=" + value)
         return options
 
+    def transaction_size(self, dst_format, group_transactions=None):
+        """Features per transaction: group_transactions, if given, or
+        'dst_group_transactions' of the configuration or the default of
+        the destination format"""
+        if group_transactions is not None:
+            return group_transactions
+        if self._config and 'dst_group_transactions' in self._config:
+            return self._config['dst_group_transactions']
+        dst_format_handler = OgrConfig.format_handlers.handler(dst_format)
+        return dst_format_handler.default_transaction_size()
+
     def layer_names(self):
         if self._config and 'layers' in self._config:
             return self._config['layers'].keys()
@@ -381,7 +1266,7 @@ class OgrConfig:
         #dst_format_handler = OgrConfig.format_handlers.handler(dst_format)
         xml = ElementTree.Element('OGRVRTDataSource')
         for layer_name, cfglayer in self._config['layers'].items():
-            layer_node = ElementTree.SubElement(xml, "OGRVRTLayer")
+            layer_node = ElementTree.Element("OGRVRTLayer")
             layer_node.set('name', layer_name)
             node = ElementTree.SubElement(layer_node, "SrcDataSource")
             node.set('relativeToVRT', '0')
@@ -410,18 +1295,43 @@ class OgrConfig:
                     subnode.text = 'wkb' + cfgfield['type']
                     if 'srs' in cfgfield:
                         subnode = ElementTree.SubElement(node, "SRS")
-                        subnode.text = cfgfield['srs']
+                        subnode.text = srs_definition(cfgfield['srs'])
+                for geom_name, cfgfield in cfglayer['geom_fields'].items():
+                    if 'dst_srs' in cfgfield:
+                        if 'srs' not in cfgfield:
+                            raise ValueError(
+                                "Geometry field '%s' of layer '%s' with "
+                                "'dst_srs' requires 'srs'" % (
+                                    geom_name, layer_name))
+                        layer_node = self._warped_layer(
+                            layer_node, geom_name, cfgfield['srs'],
+                            cfgfield['dst_srs'])
             else:
                 node = ElementTree.SubElement(layer_node, "GeometryType")
                 node.text = 'wkb' + cfglayer['geometry_type']
+            xml.append(layer_node)
         return ElementTree.tostring(xml, 'utf-8')
 
+    def _warped_layer(self, layer_node, geom_name, src_srs, dst_srs):
+        # Reproject geometry field of layer. The VRT driver keeps one
+        # coordinate transformation per warped layer.
+        warped_node = ElementTree.Element("OGRVRTWarpedLayer")
+        warped_node.append(layer_node)
+        # Source SRS is required for sources without SRS (e.g. Interlis)
+        node = ElementTree.SubElement(warped_node, "SrcSRS")
+        node.text = srs_definition(src_srs)
+        node = ElementTree.SubElement(warped_node, "TargetSRS")
+        node.text = srs_definition(dst_srs)
+        node = ElementTree.SubElement(warped_node, "WarpedGeomFieldName")
+        node.text = geom_name
+        return warped_node
+
     def generate_reverse_vrt(self, dst_format=None):
         src_format = self.ds_format()
         src_format_handler = OgrConfig.format_handlers.handler(src_format)
         xml = ElementTree.Element('OGRVRTDataSource')
         for layer_name, cfglayer in self._config['layers'].items():
-            layer_node = ElementTree.SubElement(xml, "OGRVRTLayer")
+            layer_node = ElementTree.Element("OGRVRTLayer")
             layer_node.set('name', cfglayer['src_layer'])
             node = ElementTree.SubElement(layer_node, "SrcDataSource")
             node.set('relativeToVRT', '0')
@@ -445,9 +1355,16 @@ class OgrConfig:
                     node.set('field', geom_name)
                     node = ElementTree.SubElement(node, "GeometryType")
                     node.text = 'wkb' + cfgfield['type']
+                for geom_name, cfgfield in cfglayer['geom_fields'].items():
+                    if 'dst_srs' in cfgfield and 'srs' in cfgfield:
+                        # Project back into source SRS
+                        layer_node = self._warped_layer(
+                            layer_node, cfgfield['src'], cfgfield['dst_srs'],
+                            cfgfield['srs'])
             else:
                 node = ElementTree.SubElement(layer_node, "GeometryType")
                 node.text = 'wkb' + cfglayer['geometry_type']
+            xml.append(layer_node)
         return ElementTree.tostring(xml, 'utf-8')
 
     def generate_enum_gml(self):
@@ -480,34 +1397,92 @@ class OgrConfig:
                         node.text = str(value)
         return ElementTree.tostring(xml, 'utf-8')
 
-    def _set_ogr_debug_flag(self, debug):
-        os.environ["CPL_DEBUG"] = 'ON' if debug else 'OFF'
-
-    def _activate_ogr_log(self):
-        # Send OGR C lib output to file
-        (ogrlogfd, ogrlogfn) = tempfile.mkstemp()
-        os.close(ogrlogfd)
-        os.environ["CPL_LOG"] = ogrlogfn
-        os.environ["CPL_LOG_ERRORS"] = "ON"
-        return ogrlogfn
-
-    def _close_ogr_log(self, ogrlogfn):
-        f = open(ogrlogfn, 'r')
-        ogroutput = f.read()
-        f.close()
-        os.unlink(ogrlogfn)
-        os.environ["CPL_LOG_ERRORS"] = "OFF"
-        return ogroutput
+    def ogr_log(self):
+        """OgrLog with OGR messages of last transformation"""
+        return self._ogr_log
 
     def transform(self, dest, format=None, layers=[],
-                  skipfailures=False, debug=False):
+                  skipfailures=False, debug=False, group_transactions=None,
+                  parallel=False, max_workers=None, bulk=False,
+                  append=False, baskets=False, checkpoint=False,
+                  resume=False):
+        """Transform layers into dest.
+
+        With parallel, layers are transformed in a process pool with
+        max_workers processes.
+        With bulk, layers are loaded into unlogged PostgreSQL staging
+        tables with COPY, which replace the existing tables at the end.
+        With append, features are added to existing layers.
+        With baskets, the baskets of an XTF file are transformed one after
+        the other (in parallel for destinations with concurrent writes),
+        so memory usage is bounded by the largest basket.
+        With checkpoint, committed features are recorded in a journal next
+        to dest (see journal_path), which is removed after a successful
+        transformation. With resume, a transformation interrupted with
+        checkpoints is continued after the last committed transaction of
+        each layer. Features committed to dest after the last journal
+        update are detected by the feature count of the destination layer.
+        Features which can't be written raise a ValueError, unless
+        skipfailures is set.
+        Returns OGR log output. Structured messages are available with
+        ogr_log(), elapsed seconds per layer with layer_timings().
+        """
+        if baskets:
+            if bulk:
+                raise ValueError("Bulk mode can't be used with baskets")
+            if checkpoint or resume:
+                raise ValueError("Checkpoints can't be used with baskets")
+            return self._transform_baskets(
+                dest, format, layers, skipfailures, debug,
+                group_transactions, parallel, max_workers, append)
+        if (checkpoint or resume) and bulk:
+            raise ValueError("Checkpoints can't be used with bulk mode")
+        if not (checkpoint or resume):
+            return self._transform(
+                dest, format, layers, skipfailures, debug,
+                group_transactions, parallel, max_workers, bulk, append)
+        dst_format = format or self.dst_format()
+        journal = TransformJournal(journal_path(dest),
+                                   self._journal_key(dst_format, dest))
+        self._layer_timings = {}
+        self._ogr_log = OgrLog(debug)
+        layers = layers or list(self.layer_names())
+        try:
+            if resume:
+                layers = [name for name in layers
+                          if not journal.is_done(name)]
+            else:
+                journal.clear()
+            log = ''
+            if layers:
+                log = self._transform(
+                    dest, format, layers, skipfailures, debug,
+                    group_transactions, parallel, max_workers, bulk, append,
+                    journal)
+        except Exception:
+            journal.close()
+            raise
+        journal.remove()
+        return log
+
+    def _journal_key(self, dst_format, dest):
+        # Identifies the transformation of a journal
+        sha = hashlib.sha1()
+        for value in [json.dumps(self._config, sort_keys=True),
+                      self._src_ds or '', dst_format, dest]:
+            sha.update(value.encode('utf-8'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def _transform(self, dest, format=None, layers=[], skipfailures=False,
+                   debug=False, group_transactions=None, parallel=False,
+                   max_workers=None, bulk=False, append=False, journal=None):
         vrt = self.generate_vrt(dst_format=format)
         # if debug:
         #    print prettify(vrt)
         # f = open("/tmp/transform.vrt", "w")
         # f.write(prettify(vrt))
         # f.close()
-        ds = self._tmp_datasource(vrt)
         dst_format = format or self.dst_format()
         dsco = []
         if dst_format == self.dst_format():
@@ -515,34 +1490,236 @@ class OgrConfig:
         lco = []
         if dst_format == self.dst_format():
             lco = self.layer_creation_options()
-        self._set_ogr_debug_flag(debug)
-        ogrlogfn = self._activate_ogr_log()
-        ogr2ogr(dst_format=str(dst_format), ds=ds, dest=dest,
-                bOverwrite=True, dsco=dsco, lco=lco, layers=layers,
-                skipfailures=skipfailures)
-        self._free_tmp_datasource()
-        return self._close_ogr_log(ogrlogfn)
+        group_transactions = self.transaction_size(
+            dst_format, group_transactions)
+        dst_format_handler = OgrConfig.format_handlers.handler(dst_format)
+        layers = layers or list(self.layer_names())
+        dst_names = {}
+        if bulk:
+            if dst_format != 'PostgreSQL':
+                raise ValueError("Bulk mode requires PostgreSQL destination")
+            dst_names = dict((name, dst_format_handler.stage_name(name))
+                             for name in layers)
+            lco = lco + ['UNLOGGED=YES']
+            use_copy = gdal.GetConfigOption('PG_USE_COPY')
+            gdal.SetConfigOption('PG_USE_COPY', 'YES')
+        self._ogr_log = OgrLog(debug)
+        with self._ogr_log:
+            try:
+                if parallel:
+                    self._layer_timings = parallel_ogr2ogr(
+                        dst_format=str(dst_format), vrt=vrt, dest=dest,
+                        dsco=dsco, lco=lco, layers=layers,
+                        skipfailures=skipfailures,
+                        group_transactions=group_transactions,
+                        concurrent_writes=(
+                            dst_format_handler.supports_concurrent_writes()),
+                        max_workers=max_workers, dst_names=dst_names,
+                        bAppend=append, journal=journal, log=self._ogr_log)
+                else:
+                    ds = self._tmp_datasource(vrt)
+                    self._layer_timings = ogr2ogr(
+                        dst_format=str(dst_format), ds=ds, dest=dest,
+                        bOverwrite=True, dsco=dsco, lco=lco, layers=layers,
+                        skipfailures=skipfailures,
+                        group_transactions=group_transactions,
+                        dst_names=dst_names, bAppend=append, journal=journal)
+                    self._free_tmp_datasource()
+            finally:
+                if bulk:
+                    gdal.SetConfigOption('PG_USE_COPY', use_copy)
+            if bulk:
+                self._swap_stage_tables(dest, dst_format_handler, dst_names)
+        return self._ogr_log.text()
+
+    def _transform_baskets(self, dest, format, layers, skipfailures, debug,
+                           group_transactions, parallel, max_workers,
+                           append):
+        transfer_fn, __, model = self._src_ds.partition(',')
+        index = None
+        # Other formats (e.g. ITF) are not scanned for baskets
+        if ModelLoader(transfer_fn).detect_format() == 'Interlis 2':
+            index = BasketIndex(transfer_fn)
+        if index is None or not index.baskets:
+            # Not an XTF file
+            return self.transform(
+                dest, format, layers, skipfailures, debug,
+                group_transactions, parallel, max_workers, append=append)
+        dst_format = format or self.dst_format()
+        dst_format_handler = OgrConfig.format_handlers.handler(dst_format)
+        args = [self._config, model, dest, format, layers,
+                skipfailures, debug, group_transactions]
+        tmpdir = tempfile.mkdtemp(prefix='ogr_')
+        try:
+            # Baskets are split in a single pass over the transfer file
+            basketfns = [os.path.join(tmpdir, 'basket%d.xtf' % idx)
+                         for idx in range(len(index.baskets))]
+            index.write_baskets(basketfns)
+            # First basket creates the layers, unless appending
+            results = [_transform_basket(basketfns[0], append, *args)]
+            if parallel and dst_format_handler.supports_concurrent_writes():
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    jobs = [executor.submit(_transform_basket, basketfn,
+                                            True, *args)
+                            for basketfn in basketfns[1:]]
+                    results += [job.result() for job in jobs]
+            else:
+                for basketfn in basketfns[1:]:
+                    results.append(_transform_basket(basketfn, True, *args))
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+        self._layer_timings = {}
+        self._ogr_log = OgrLog(debug)
+        for log, timings in results:
+            self._ogr_log.extend(log)
+            for layer, elapsed in timings.items():
+                self._layer_timings[layer] = \
+                    self._layer_timings.get(layer, 0) + elapsed
+        return self._ogr_log.text()
+
+    def _swap_stage_tables(self, dest, dst_format_handler, dst_names):
+        # Replace tables with staging tables in a single transaction
+        schema = self._config['dst_lco'].get('SCHEMA', 'public')
+        ds = ogr.Open(dest, update=True)
+        if ds is None:
+            raise IOError("Couldn't open destination: %s" % dest)
+        try:
+            for stage_name in dst_names.values():
+                _execute_sql(ds, dst_format_handler.set_logged_sql(
+                    schema, stage_name))
+            if ds.StartTransaction() != ogr.OGRERR_NONE:
+                raise IOError("Couldn't start transaction: %s" %
+                              gdal.GetLastErrorMsg())
+            try:
+                for name, stage_name in dst_names.items():
+                    for sql in dst_format_handler.swap_table_sql(
+                            schema, stage_name, name):
+                        _execute_sql(ds, sql)
+            except Exception:
+                ds.RollbackTransaction()
+                raise
+            if ds.CommitTransaction() != ogr.OGRERR_NONE:
+                raise IOError("Couldn't replace tables with staging "
+                              "tables: %s" % gdal.GetLastErrorMsg())
+        finally:
+            ds.Destroy()
+
+    def layer_timings(self):
+        """Elapsed seconds per layer of last transformation"""
+        return self._layer_timings
+
+    def transform_multi(self, destinations, layers=[], skipfailures=False,
+                        debug=False, group_transactions=None,
+                        queue_size=SINK_QUEUE_SIZE, timeout=SINK_TIMEOUT):
+        """Transform layers into several destinations, reading the source
+        only once.
+
+        destinations is a list of dicts with 'dest' and optional 'format',
+        'dsco', 'lco' and 'group_transactions' (defaults as in transform).
+        Each destination is written by its own thread from a queue of
+        queue_size features. A destination not accepting features within
+        timeout seconds is detached and left incomplete.
+        Returns dict dest => None if completed, otherwise error message.
+        OGR messages of all destinations are available with ogr_log().
+        """
+        sinks = []
+        for destination in destinations:
+            dst_format = destination.get('format') or self.dst_format()
+            dsco = []
+            lco = []
+            if dst_format == self.dst_format():
+                dsco = self.ds_creation_options()
+                lco = self.layer_creation_options()
+            sinks.append(FeatureSink(
+                str(dst_format), destination['dest'],
+                destination.get('dsco', dsco), destination.get('lco', lco),
+                skipfailures, self.transaction_size(
+                    dst_format, destination.get('group_transactions',
+                                                group_transactions)),
+                queue_size, debug))
+        vrt = self.generate_vrt()
+        layers = layers or list(self.layer_names())
+        self._ogr_log = OgrLog(debug)
+        with self._ogr_log:
+            ds = self._tmp_datasource(vrt)
+            self._layer_timings = fanout_ogr2ogr(ds, sinks, layers, timeout)
+            ds.Destroy()
+            self._free_tmp_datasource()
+        results = {}
+        for sink in sinks:
+            self._ogr_log.extend(sink.log)
+            if sink.status != 'ok':
+                self._ogr_log.add(LogRecord(
+                    'Failure', 0, 'fanout', "%s: %s" % (sink.dest,
+                                                        sink.error)))
+            results[sink.dest] = sink.error
+        return results
+
+    def transform_delta(self, dest, format=None, layers=[], debug=False,
+                        group_transactions=None):
+        """Update existing layers of dest with changed features only.
+
+        Features are matched by TID and compared by content hash with the
+        previous delivery, see write_delta. The hashes are kept in a file
+        next to dest (see journal_path).
+        A new destination gets the enum tables of the configuration.
+        Returns dict with number of 'inserted', 'updated', 'deleted' and
+        'unchanged' features per layer.
+        """
+        vrt = self.generate_vrt(dst_format=format)
+        dst_format = format or self.dst_format()
+        dsco = []
+        lco = []
+        if dst_format == self.dst_format():
+            dsco = self.ds_creation_options()
+            lco = self.layer_creation_options()
+        existing_ds = open_existing_datasource(dest)
+        if existing_ds is None:
+            if self._config.get('enums'):
+                self.write_enum_tables(dest, format=dst_format)
+        else:
+            existing_ds.Destroy()
+        delta_hashes = DeltaHashes(journal_path(dest, '.delta'))
+        self._ogr_log = OgrLog(debug)
+        try:
+            with self._ogr_log:
+                ds = self._tmp_datasource(vrt)
+                try:
+                    counts = delta_ogr2ogr(
+                        str(dst_format), ds, dest, dsco, lco,
+                        layers or list(self.layer_names()),
+                        self.transaction_size(dst_format, group_transactions),
+                        delta_hashes)
+                finally:
+                    ds.Destroy()
+                    self._free_tmp_datasource()
+        finally:
+            delta_hashes.close()
+        return counts
 
     def transform_reverse(self, dest, format=None, layers=[],
-                          skipfailures=False, debug=False):
+                          skipfailures=False, debug=False,
+                          group_transactions=None):
         vrt = self.generate_reverse_vrt(dst_format=format)
         # if debug:
         #    print prettify(vrt)
         ds = self._tmp_datasource(vrt)
         dst_format = format or self.src_format()
-        self._set_ogr_debug_flag(debug)
-        ogrlogfn = self._activate_ogr_log()
-        ogr2ogr(dst_format=str(dst_format), ds=ds, dest=dest,
-                bOverwrite=True, layers=layers, skipfailures=skipfailures)
+        self._ogr_log = OgrLog(debug)
+        with self._ogr_log:
+            ogr2ogr(dst_format=str(dst_format), ds=ds, dest=dest,
+                    bOverwrite=True, layers=layers, skipfailures=skipfailures,
+                    group_transactions=self.transaction_size(
+                        dst_format, group_transactions))
         self._free_tmp_datasource()
-        return self._close_ogr_log(ogrlogfn)
+        return self._ogr_log.text()
 
     def write_enum_tables(self, dest, format=None,
                           skipfailures=False, debug=False):
-        gml = self.generate_enum_gml()
-        # if debug:
-        #    print prettify(gml)
-        ds = self._tmp_datasource(gml)
+        """Write enum tables directly into dest, in a single transaction
+        if supported by the destination.
+        Returns OGR log output, see ogr_log().
+        """
         dst_format = format or self.dst_format()
         dsco = []
         if dst_format == self.dst_format():
@@ -550,9 +1727,59 @@ class OgrConfig:
         lco = []
         if dst_format == self.dst_format():
             lco = self.layer_creation_options()
-        ogr2ogr(dst_format=str(dst_format), ds=ds, dest=dest,
-                bOverwrite=True, dsco=dsco, lco=lco, skipfailures=skipfailures)
-        self._free_tmp_datasource()
+        outDriver = ogr.GetDriverByName(str(dst_format))
+        if outDriver is None:
+            raise ValueError("Couldn't find driver '%s'" % dst_format)
+        self._ogr_log = OgrLog(debug)
+        with self._ogr_log:
+            outDataSource = outDriver.CreateDataSource(dest, options=dsco)
+            if outDataSource is None:
+                raise ValueError("Couldn't create output DataSource")
+            try:
+                transaction = outDataSource.TestCapability(
+                    ogr.ODsCTransactions)
+                if transaction:
+                    outDataSource.StartTransaction()
+                try:
+                    for name, enum_table in \
+                            self._config.get('enums', {}).items():
+                        self._write_enum_table(outDataSource, name,
+                                               enum_table['values'], lco,
+                                               skipfailures)
+                except Exception:
+                    if transaction:
+                        outDataSource.RollbackTransaction()
+                    raise
+                if transaction:
+                    outDataSource.CommitTransaction()
+            finally:
+                outDataSource.Destroy()
+        return self._ogr_log.text()
+
+    def _write_enum_table(self, outDataSource, name, values, lco,
+                          skipfailures):
+        lyridx = find_ogr_layer(outDataSource, name)
+        if lyridx is not None:
+            if outDataSource.DeleteLayer(lyridx) != 0:
+                raise ValueError(
+                    "DeleteLayer() failed when overwrite requested.")
+        outLayer = outDataSource.CreateLayer(
+            name, geom_type=ogr.wkbNone, options=lco)
+        if outLayer is None:
+            raise ValueError("Couldn't create output layer")
+        for field_name, field_type in ENUM_FIELDS:
+            outLayer.CreateField(ogr.FieldDefn(field_name, field_type))
+        outLayerDefn = outLayer.GetLayerDefn()
+        field_map = [(outLayerDefn.GetFieldIndex(field_name), field_name)
+                     for field_name, field_type in ENUM_FIELDS]
+
+        def features():
+            for enum in values:
+                outFeature = ogr.Feature(outLayerDefn)
+                for dst_idx, field_name in field_map:
+                    outFeature.SetField(dst_idx, enum[field_name])
+                yield outFeature
+        write_features(outLayer, features(), skipfailures=skipfailures)
 
     def _tmp_memfile(self, data):
         self._vsimem_tmp = tempfile.mktemp('.vrt', 'ogr_', '/vsimem')
@@ -3,6 +3,12 @@ try:
 except:
     import ogr
 from .ogrvrt import GeomType2Name, Esc
+from ..interlis.transfer_file import vsi_datasource
+
+
+def tid_field_index(layerdef):
+    """Index of Interlis TID field (case insensitive), -1 if not available"""
+    return layerdef.GetFieldIndex("TID")
 
 
 def has_multi_geom_tables(infile):
@@ -24,6 +30,8 @@ def ogr2vrt(infile,
             outfile=None,
             relative="0"):
 
+    # Read compressed transfer files through GDAL virtual file systems
+    infile = vsi_datasource(infile)
     src_ds = ogr.Open(infile, update=0)
 
     if src_ds is None:
@@ -82,7 +90,7 @@ def vrt_layer(layer,
     vrt += '    <FeatureCount>%d</FeatureCount>\n' % layer.GetFeatureCount()
     # OGR sometimes doesn't detect FID of source (Ili2 only?).
     # Workaround: We explicitly add TID as FID, when available
-    if layer.GetFIDColumn() == '' and layerdef.GetFieldIndex("TID") != -1:
+    if layer.GetFIDColumn() == '' and tid_field_index(layerdef) != -1:
         vrt += '    <FID>TID</FID>\n'
     if poGFldDefn is not None:
         vrt += '    <GeometryField name="%s"/>\n' % gFldName
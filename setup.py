@@ -8,6 +8,7 @@ setup(
     packages=['ogrtools', 'ogrtools.interlis',
               'ogrtools.ogrtransform', 'ogrtools.pyogr',
               'ogr_cli'],
+    package_data={'ogrtools.interlis': ['java/*.java']},
     url='https://github.com/sourcepole/ogrtools',
     license='LICENSE.txt',
     description='Collection of libraries and tools built with the Python API of OGR.',
@@ -0,0 +1,65 @@
+import gzip
+import os
+import shutil
+import tempfile
+from xml.etree import ElementTree
+
+from ogrtools.interlis.baskets import BasketIndex
+
+
+def test_basket_index():
+    # Small chunks to test tags crossing chunk boundaries
+    for chunk_size in [7, 64, 1024 * 1024]:
+        index = BasketIndex("./tests/data/np/NP_Example.xtf",
+                            chunk_size=chunk_size)
+        assert [bid for bid, start, end in index.baskets] == ['xxx0', 'xxx1']
+        assert index.baskets[0][2] == index.baskets[1][1]
+        assert index.baskets[1][2] == index.footer_start
+
+
+def test_no_baskets():
+    index = BasketIndex("./tests/data/ili/Beispiel.itf")
+    assert index.baskets == []
+    assert index.footer_start is None
+
+
+def test_write_basket():
+    tmpdir = tempfile.mkdtemp()
+    gz = os.path.join(tmpdir, "NP_Example.xtf.gz")
+    with open("./tests/data/np/NP_Example.xtf", "rb") as src:
+        with gzip.open(gz, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+    for fn in ["./tests/data/np/NP_Example.xtf", gz]:
+        index = BasketIndex(fn)
+        tids = 0
+        for idx, (bid, start, end) in enumerate(index.baskets):
+            basketfn = os.path.join(tmpdir, "basket%d.xtf" % idx)
+            index.write_basket(idx, basketfn, chunk_size=100)
+            tree = ElementTree.parse(basketfn)
+            baskets = tree.find(
+                "{http://www.interlis.ch/INTERLIS2.2}DATASECTION")
+            assert [basket.get('BID') for basket in baskets] == [bid]
+            assert tree.find(
+                "{http://www.interlis.ch/INTERLIS2.2}HEADERSECTION") \
+                is not None
+            tids += len(baskets[0])
+        assert tids == 41
+    shutil.rmtree(tmpdir)
+
+
+def test_write_baskets():
+    tmpdir = tempfile.mkdtemp()
+    gz = os.path.join(tmpdir, "NP_Example.xtf.gz")
+    with open("./tests/data/np/NP_Example.xtf", "rb") as src:
+        with gzip.open(gz, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+    index = BasketIndex(gz)
+    outfns = [os.path.join(tmpdir, "all%d.xtf" % idx)
+              for idx in range(len(index.baskets))]
+    index.write_baskets(outfns, chunk_size=100)
+    for idx, outfn in enumerate(outfns):
+        basketfn = os.path.join(tmpdir, "basket%d.xtf" % idx)
+        index.write_basket(idx, basketfn)
+        with open(outfn, "rb") as f1, open(basketfn, "rb") as f2:
+            assert f1.read() == f2.read()
+    shutil.rmtree(tmpdir)
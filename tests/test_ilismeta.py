@@ -1,3 +1,6 @@
+import os
+import tempfile
+import time
 from ogrtools.interlis.ilismeta import ImdParser
 
 
@@ -46,8 +49,106 @@ def test_extract_extended_enums():
         {'enumtxt': 'prohibition.other', 'enum': 'prohibition.other', 'id': 6}]
 
 
+def test_extract_classes():
+    parser = ImdParser("./tests/data/ili/RoadsExdm2ien.imd")
+    classes = parser.extract_classes()
+    roadsign = classes['RoadsExdm2ien.RoadsExtended.RoadSign']
+    assert roadsign['super'] == 'RoadsExdm2ben.Roads.RoadSign'
+    assert roadsign['package'] == 'RoadsExdm2ien.RoadsExtended'
+    assert [attr['name'] for attr in
+            classes['RoadsExdm2ben.Roads.RoadSign']['attributes']] == [
+        'Type', 'Position']
+    assoc = classes['RoadsExdm2ben.Roads.StreetAxisAssoc']
+    assert assoc['kind'] == 'Association'
+    assert [role['target'] for role in assoc['roles']] == [
+        'RoadsExdm2ben.Roads.Street', 'RoadsExdm2ben.Roads.StreetAxis']
+
+
+def test_stream_enums():
+    for fn in ["./tests/data/ili/RoadsExdm2ien.imd",
+               "./tests/data/np/NP_73_CH_de_ili2.imd"]:
+        parser = ImdParser(fn, kinds=['enums'])
+        assert parser.extract_enums() == ImdParser(fn).extract_enums()
+        assert list(parser.models()) == []
+
+
+def test_stream_models():
+    parser = ImdParser("./tests/data/ili/RoadsExdm2ien.imd", kinds=['models'])
+    assert list(parser.models()) == [
+        'INTERLIS', 'RoadsExdm2ben', 'RoadsExdm2ien']
+    assert parser.extract_enums() == {}
+
+
+def test_stream_unknown_kind():
+    try:
+        ImdParser("./tests/data/ili/Beispiel.imd", kinds=['views'])
+        assert False
+    except ValueError:
+        pass
+
+
 def test_gen_empty_transfer():
     parser = ImdParser("./tests/data/ili/Beispiel.imd")
     transfer = parser.gen_empty_transfer()
     print(transfer)
     assert """<MODEL NAME="Beispiel">""" in transfer
+
+
+def _synthetic_enum_imd(enum_types, leafs_per_group, groups_per_type=10):
+    """Write IlisMeta file with enum_types * groups * leafs EnumNodes"""
+    fh, imdfn = tempfile.mkstemp(suffix='.imd')
+    with os.fdopen(fh, "w") as f:
+        f.write("""<?xml version="1.0" encoding="UTF-8"?>
+<TRANSFER xmlns="http://www.interlis.ch/INTERLIS2.3">
+<DATASECTION>
+<IlisMeta07.ModelData BID="Synth">
+""")
+        for t in range(enum_types):
+            typ = "Synth.Topic.Class%d.Attr.TYPE" % t
+            f.write("""<IlisMeta07.ModelData.EnumType TID="%s">
+<Name>TYPE</Name></IlisMeta07.ModelData.EnumType>
+""" % typ)
+            top = typ + ".TOP"
+            f.write("""<IlisMeta07.ModelData.EnumNode TID="%s">
+<Name>TOP</Name><EnumType REF="%s" /></IlisMeta07.ModelData.EnumNode>
+""" % (top, typ))
+            for g in range(groups_per_type):
+                group = "%s.g%d" % (top, g)
+                f.write("""<IlisMeta07.ModelData.EnumNode TID="%s">
+<Name>g%d</Name><ParentNode REF="%s" /></IlisMeta07.ModelData.EnumNode>
+""" % (group, g, top))
+                for l in range(leafs_per_group):
+                    f.write("""<IlisMeta07.ModelData.EnumNode TID="%s.l%d">
+<Name>l%d</Name><ParentNode REF="%s" /></IlisMeta07.ModelData.EnumNode>
+""" % (group, l, l, group))
+        f.write("</IlisMeta07.ModelData>\n</DATASECTION>\n</TRANSFER>\n")
+    return imdfn
+
+
+def test_extract_synthetic_enums():
+    imdfn = _synthetic_enum_imd(3, 4)
+    parser = ImdParser(imdfn)
+    enum_tables = parser.extract_enums()
+    os.remove(imdfn)
+    assert len(enum_tables) == 3
+    assert len(enum_tables['Synth.Topic.Class2.Attr']) == 40
+    assert enum_tables['Synth.Topic.Class2.Attr'][5] == {
+        'enumtxt': 'g1.l1', 'enum': 'g1.l1', 'id': 5}
+
+
+# Run with nosetests tests/test_ilismeta.py:manualtest_extract_enums_performance --nocapture
+def manualtest_extract_enums_performance():
+    timings = []
+    for enum_types in [50, 500]:
+        # 50 enum types ~ 5k nodes, 500 enum types ~ 50k nodes
+        imdfn = _synthetic_enum_imd(enum_types, 9)
+        parser = ImdParser(imdfn)
+        start = time.time()
+        enum_tables = parser.extract_enums()
+        elapsed = time.time() - start
+        os.remove(imdfn)
+        print("%d enum nodes: %.3fs" % (enum_types * 101, elapsed))
+        assert len(enum_tables) == enum_types
+        timings.append(elapsed)
+    # Linear scaling: 10x nodes should take about 10x the time
+    assert timings[1] < timings[0] * 30
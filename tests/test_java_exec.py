@@ -0,0 +1,76 @@
+import os
+import stat
+import tempfile
+from ogrtools.interlis.java_exec import (JavaWorker, JavaWorkerError,
+                                         JavaWorkerTimeout, JavaJobError,
+                                         run_java_job, use_java_worker)
+
+
+def _fake_java(script):
+    # Shell script answering the worker protocol
+    fn = os.path.join(tempfile.mkdtemp(), 'java')
+    with open(fn, 'w') as f:
+        f.write("#!/bin/sh\necho READY\nread job\n" + script)
+    os.chmod(fn, os.stat(fn).st_mode | stat.S_IEXEC)
+    return fn
+
+
+def test_java_worker_unavailable():
+    worker = JavaWorker("./nonexistent-java")
+    try:
+        worker.run(["-jar", "ili2c.jar", "--version"])
+        assert False
+    except JavaWorkerError:
+        pass
+    assert not worker.is_running()
+    # Failed start isn't retried
+    worker._java = "java"
+    try:
+        worker.run(["-version"])
+        assert False
+    except JavaWorkerError:
+        pass
+    assert not worker.is_running()
+
+
+def test_java_worker_fallback():
+    use_java_worker(True)
+    output = run_java_job("./nonexistent-java", ["-version"])
+    use_java_worker(False)
+    # Fallback to shell execution
+    assert "nonexistent-java" in output
+
+
+def test_java_worker_timeout():
+    worker = JavaWorker(_fake_java("exec sleep 30\n"), timeout=1)
+    try:
+        worker.run(["-version"])
+        assert False
+    except JavaWorkerTimeout:
+        pass
+    assert not worker.is_running()
+
+
+def test_java_job_failed():
+    java = _fake_java("printf 'EXIT 2 6\\nfailed'\nread job\n")
+    use_java_worker(True)
+    try:
+        run_java_job(java, ["-version"])
+        assert False
+    except JavaJobError as e:
+        assert e.status == 2
+        assert e.output == "failed"
+    finally:
+        use_java_worker(False)
+
+
+def manualtest_java_worker():
+    worker = JavaWorker()
+    args = ["-cp", '"jars/libs/*"', "ch.interlis.ili2c.Main", "--version"]
+    status, output = worker.run(args)
+    assert "ili2c" in output
+    # Second call reuses loaded classes
+    status, output = worker.run(args)
+    assert "ili2c" in output
+    assert worker.is_running()
+    worker.close()
@@ -0,0 +1,72 @@
+import os
+import pickle
+import shutil
+import tempfile
+
+from ogrtools.ogrtransform.journal import (TransformJournal, DeltaHashes,
+                                          journal_path)
+
+
+def test_journal_path():
+    tmpdir = tempfile.mkdtemp()
+    dest = os.path.join(tmpdir, "out.sqlite")
+    assert journal_path(dest) == dest + ".journal"
+    os.environ["OGRTOOLS_CACHE_DIR"] = tmpdir
+    try:
+        fn = journal_path("PG:dbname=ogrtools")
+    finally:
+        del os.environ["OGRTOOLS_CACHE_DIR"]
+    assert fn.startswith(os.path.join(tmpdir, "journals"))
+    assert fn != journal_path("PG:dbname=other")
+    shutil.rmtree(tmpdir)
+
+
+def test_journal():
+    tmpdir = tempfile.mkdtemp()
+    fn = os.path.join(tmpdir, "journals", "out.journal")
+    journal = TransformJournal(fn, "key1")
+    journal.clear()
+    assert not journal.started()
+    journal.commit("layer1", 100)
+    journal.commit("layer2", 20, done=True)
+    journal.close()
+
+    # Interrupted transformation
+    journal = TransformJournal(fn, "key1")
+    assert journal.started()
+    assert journal.features("layer1") == 100
+    assert not journal.is_done("layer1")
+    assert journal.is_done("layer2")
+    assert journal.features("layer3") == 0
+    assert journal.progress("layer2") == (20, 0, 0)
+    assert journal.progress("layer3") is None
+
+    # Jobs of parallel transformations open their own connection
+    copy = pickle.loads(pickle.dumps(journal))
+    copy.commit("layer1", 200)
+    copy.close()
+    assert journal.features("layer1") == 200
+    journal.close()
+
+    # Journal of another transformation
+    journal = TransformJournal(fn, "key2")
+    assert not journal.started()
+    journal.remove()
+    assert not os.path.exists(fn)
+    shutil.rmtree(tmpdir)
+
+
+def test_delta_hashes():
+    tmpdir = tempfile.mkdtemp()
+    fn = journal_path(os.path.join(tmpdir, "out.sqlite"), ".delta")
+    hashes = DeltaHashes(fn)
+    assert hashes.hashes("layer1") == {}
+    hashes.replace("layer1", {"1": b"a", "2": b"b"})
+    hashes.replace("layer2", {"1": b"c"})
+    hashes.replace("layer1", {"2": b"d"})
+    hashes.close()
+    hashes = DeltaHashes(fn)
+    assert hashes.hashes("layer1") == {"2": b"d"}
+    assert hashes.hashes("layer2") == {"1": b"c"}
+    hashes.close()
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,40 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from ogrtools.interlis.ilismeta import ImdParser
+from ogrtools.interlis.model_cache import ModelCache, FACTS_VERSION
+
+
+def test_cached_facts():
+    cache_dir = tempfile.mkdtemp()
+    cache = ModelCache(cache_dir)
+    imd = "./tests/data/ili/RoadsExdm2ien.imd"
+    facts = cache.facts(imd)
+    parser = ImdParser(imd)
+    assert facts['models'] == ['INTERLIS', 'RoadsExdm2ben', 'RoadsExdm2ien']
+    assert facts['enums'] == parser.extract_enums()
+    assert facts['classes'] == parser.extract_classes()
+    # Second lookup is served from cache
+    assert cache.enums(imd) == facts['enums']
+    cache.close()
+    db = sqlite3.connect(os.path.join(cache_dir, "ilismeta.sqlite"))
+    assert db.execute("SELECT count(*) FROM imd").fetchone()[0] == 1
+    # Keys include the facts version
+    key = db.execute("SELECT hash FROM imd").fetchone()[0]
+    assert key.startswith("%d:" % FACTS_VERSION)
+    db.close()
+    shutil.rmtree(cache_dir)
+
+
+def test_cache_keyed_by_content():
+    cache_dir = tempfile.mkdtemp()
+    cache = ModelCache(cache_dir)
+    imd = os.path.join(cache_dir, "model.imd")
+    shutil.copy("./tests/data/ili/Beispiel.imd", imd)
+    assert 'Beispiel.Bodenbedeckung.BoFlaechen.Art' in cache.enums(imd)
+    shutil.copy("./tests/data/ili/RoadsExdm2ben.imd", imd)
+    assert 'RoadsExdm2ben.Roads.RoadSign.Type' in cache.enums(imd)
+    cache.close()
+    shutil.rmtree(cache_dir)
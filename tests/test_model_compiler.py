@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+import threading
+
+from ogrtools.interlis.model_compiler import (parse_ili_models,
+                                              model_dependencies,
+                                              compile_models)
+
+
+def test_parse_ili_models():
+    assert parse_ili_models("./tests/data/ili/RoadsExdm2ien.ili") == [
+        ('RoadsExdm2ien', ['RoadsExdm2ben'])]
+    assert parse_ili_models("./tests/data/ili/RoadsExdm2ben.ili") == [
+        ('RoadsExdm2ben', [])]
+
+
+def _model_dir():
+    modeldir = tempfile.mkdtemp()
+    for fn in ["Beispiel.ili", "RoadsExdm2ben.ili", "RoadsExdm2ien.ili"]:
+        shutil.copy(os.path.join("./tests/data/ili", fn), modeldir)
+    return modeldir
+
+
+def test_model_dependencies():
+    modeldir = _model_dir()
+    ben = os.path.join(modeldir, "RoadsExdm2ben.ili")
+    ien = os.path.join(modeldir, "RoadsExdm2ien.ili")
+    deps = model_dependencies([ben, ien])
+    assert deps == {ben: set(), ien: {ben}}
+    shutil.rmtree(modeldir)
+
+
+def test_compile_models():
+    modeldir = _model_dir()
+    outdir = os.path.join(modeldir, "imd")
+    compiled = []
+    lock = threading.Lock()
+
+    def compiler(ilifile, imdfile):
+        with lock:
+            compiled.append(os.path.basename(ilifile))
+        with open(imdfile, "w") as f:
+            f.write("IMD")
+
+    results = compile_models(modeldir, outdir, compiler=compiler)
+    assert set(results.values()) == {'compiled'}
+    assert compiled.index("RoadsExdm2ben.ili") < \
+        compiled.index("RoadsExdm2ien.ili")
+    assert os.path.exists(os.path.join(outdir, "RoadsExdm2ien.imd"))
+
+    # Unchanged models are skipped
+    del compiled[:]
+    results = compile_models(modeldir, outdir, compiler=compiler)
+    assert set(results.values()) == {'skipped'}
+    assert compiled == []
+
+    # Changed dependency triggers recompilation of importing model
+    with open(os.path.join(modeldir, "RoadsExdm2ben.ili"), "a") as f:
+        f.write("\n!! changed\n")
+    results = compile_models(modeldir, outdir, compiler=compiler)
+    assert sorted(compiled) == ["RoadsExdm2ben.ili", "RoadsExdm2ien.ili"]
+    assert results[os.path.join(modeldir, "Beispiel.ili")] == 'skipped'
+    shutil.rmtree(modeldir)
+
+
+def test_compile_failure():
+    modeldir = _model_dir()
+    outdir = os.path.join(modeldir, "imd")
+
+    def compiler(ilifile, imdfile):
+        if "ben" not in ilifile:
+            with open(imdfile, "w") as f:
+                f.write("IMD")
+
+    results = compile_models(modeldir, outdir, compiler=compiler)
+    assert results[os.path.join(modeldir, "RoadsExdm2ben.ili")] == 'failed'
+    assert results[os.path.join(modeldir, "RoadsExdm2ien.ili")] == 'failed'
+    assert results[os.path.join(modeldir, "Beispiel.ili")] == 'compiled'
+
+    # Partial output of a failing compiler isn't kept
+    def partial_compiler(ilifile, imdfile):
+        with open(imdfile, "w") as f:
+            f.write("IMD")
+        if "ben" in ilifile:
+            raise IOError("ili2c failed")
+
+    results = compile_models(modeldir, outdir, compiler=partial_compiler)
+    assert results[os.path.join(modeldir, "RoadsExdm2ben.ili")] == 'failed'
+    assert not os.path.exists(os.path.join(outdir, "RoadsExdm2ben.imd"))
+    assert not os.path.exists(os.path.join(outdir, "RoadsExdm2ben.imd.tmp"))
+    shutil.rmtree(modeldir)
@@ -0,0 +1,42 @@
+from ogrtools.interlis.model_graph import (ModelGraph, Model, Topic, Class,
+                                           Association, EnumType)
+
+
+def test_model_graph():
+    graph = ModelGraph("./tests/data/ili/RoadsExdm2ien.imd")
+    assert [model.name for model in graph.models()] == [
+        'INTERLIS', 'RoadsExdm2ben', 'RoadsExdm2ien']
+    model = graph['RoadsExdm2ben']
+    assert isinstance(model, Model)
+    assert [topic.name for topic in model.topics] == ['Roads']
+    topic = model.topics[0]
+    assert isinstance(topic, Topic)
+    assert topic.model is model
+    assert 'LandCover' in [cls.name for cls in topic.classes]
+
+
+def test_class_attributes():
+    graph = ModelGraph("./tests/data/ili/RoadsExdm2ien.imd")
+    roadsign = graph['RoadsExdm2ien.RoadsExtended.RoadSign']
+    assert isinstance(roadsign, Class)
+    assert roadsign.super is graph['RoadsExdm2ben.Roads.RoadSign']
+    assert roadsign.package.name == 'RoadsExtended'
+    assert [attr.name for attr in roadsign.attributes] == ['Type']
+    assert [attr.name for attr in roadsign.all_attributes()] == [
+        'Type', 'Position', 'Type']
+    enum_type = roadsign.attributes[0].type
+    assert isinstance(enum_type, EnumType)
+    assert [value['enum'] for value in enum_type.values][-1] == \
+        'prohibition.other'
+    assert roadsign.attributes[0].owner is roadsign
+    assert graph.get('RoadsExdm2ben.Unknown') is None
+
+
+def test_associations():
+    graph = ModelGraph("./tests/data/ili/RoadsExdm2ien.imd")
+    assoc = graph['RoadsExdm2ben.Roads.StreetAxisAssoc']
+    assert isinstance(assoc, Association)
+    assert assoc in graph['RoadsExdm2ben.Roads'].associations
+    assert [(role.name, role.target.name) for role in assoc.roles] == [
+        ('Street', 'Street'), ('StreetAxis', 'StreetAxis')]
+    assert assoc.roles[0].association is assoc
@@ -1,7 +1,8 @@
 import os
+import shutil
 import tempfile
 
-from ogrtools.interlis.model_loader import ModelLoader
+from ogrtools.interlis.model_loader import ModelLoader, detect_models_in_dir
 
 TEMPDIR = tempfile.gettempdir()
 
@@ -42,6 +43,39 @@ def test_detect_models_none():
     assert loader.detect_models() is None
 
 
+def test_detect_models_bounded():
+    __, xtf = tempfile.mkstemp(suffix='.xtf')
+    with open(xtf, "w") as f:
+        f.write("""<?xml version="1.0" encoding="UTF-8"?>
+<TRANSFER xmlns="http://www.interlis.ch/INTERLIS2.3">
+<HEADERSECTION SENDER="test" VERSION="2.3">
+""")
+        # No <MODELS> within first kB
+        f.write("<!-- padding -->\n" * 1000)
+        f.write("""<MODELS><MODEL NAME="Late"/></MODELS>""")
+    loader = ModelLoader(xtf, max_header_bytes=1024)
+    assert loader.detect_models() == []
+    loader = ModelLoader(xtf)
+    assert [model.name for model in loader.detect_models()] == ['Late']
+    os.remove(xtf)
+
+
+def test_detect_models_in_dir():
+    tmpdir = tempfile.mkdtemp()
+    shutil.copy("./tests/data/ili/Beispiel.itf", tmpdir)
+    shutil.copy("./tests/data/ili/roads23.xtf", tmpdir)
+    shutil.copy("./tests/data/ili/Beispiel.ili", tmpdir)
+    models = detect_models_in_dir(tmpdir)
+    assert sorted(models.keys()) == [os.path.join(tmpdir, "Beispiel.itf"),
+                                     os.path.join(tmpdir, "roads23.xtf")]
+    assert models[os.path.join(tmpdir, "Beispiel.itf")][0].name == \
+        'Beispiel'
+    assert [model.name for model in
+            models[os.path.join(tmpdir, "roads23.xtf")]] == [
+        'RoadsExdm2ben', 'RoadsExdm2ien']
+    shutil.rmtree(tmpdir)
+
+
 def manualtest_model_conversion():
     loader = ModelLoader("")
     outfile = os.path.join(TEMPDIR, "tmpogrtools")
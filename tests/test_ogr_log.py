@@ -0,0 +1,34 @@
+from osgeo import gdal
+
+from ogrtools.ogrtransform.ogr_log import OgrLog
+
+
+def test_ogr_log():
+    with OgrLog(debug=True) as log:
+        gdal.Debug("OGR_TEST", "debug message")
+        gdal.Error(gdal.CE_Warning, gdal.CPLE_AppDefined, "warning message")
+        gdal.Error(gdal.CE_Failure, gdal.CPLE_OpenFailed, "error message")
+    assert log.summary() == {'Debug': 1, 'Warning': 1, 'Failure': 1}
+    assert log.counts[('Debug', 'OGR_TEST')] == 1
+    assert [r.message for r in log.warnings()] == ["warning message"]
+    assert log.errors()[0].errno == gdal.CPLE_OpenFailed
+    assert log.text() == ("OGR_TEST: debug message\n"
+                          "Warning 1: warning message\n"
+                          "ERROR 4: error message\n")
+    # Handler and CPL_DEBUG are restored
+    assert gdal.GetThreadLocalConfigOption('CPL_DEBUG', None) is None
+
+
+def test_ogr_log_ring_buffer():
+    with OgrLog(max_records=10) as log:
+        for i in range(25):
+            gdal.Error(gdal.CE_Warning, gdal.CPLE_AppDefined, "w%d" % i)
+        gdal.Debug("OGR_TEST", "not logged without debug")
+    assert len(log.records) == 10
+    assert log.records[0].message == "w15"
+    assert log.summary() == {'Warning': 25}
+    assert log.dropped() == 15
+
+    merged = OgrLog()
+    merged.extend(log)
+    assert merged.summary() == {'Warning': 25}
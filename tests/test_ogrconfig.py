@@ -1,6 +1,12 @@
-from ogrtools.ogrtransform.ogrconfig import OgrConfig
+from ogrtools.ogrtransform.ogrconfig import (OgrConfig, write_features,
+                                             layer_groups, create_layer)
+from ogrtools.ogrtransform.format_handler import PgFormatHandler
 from ogrtools.interlis.ilismeta import prettify
+from osgeo import ogr
 import json
+import os
+import shutil
+import tempfile
 
 
 def test_shape_config():
@@ -78,6 +84,41 @@ def test_ili_config():
     assert json.loads(cfgjson)["layers"]["roadsexdm2ien_roadsextended_streetaxis"] == expected
 
 
+def test_config_cache():
+    cache_dir = tempfile.mkdtemp()
+    os.environ["OGRTOOLS_CACHE_DIR"] = cache_dir
+    try:
+        ds = "./tests/data/ili/roads23.xtf,./tests/data/ili/RoadsExdm2ien.imd"
+        cfg = OgrConfig(ds=ds)
+        # Cache is opt-in
+        cfg.generate_config(dst_format='PostgreSQL', srs=21781)
+        assert not os.path.exists(os.path.join(cache_dir, 'configs'))
+        cfgjson = cfg.generate_config(dst_format='PostgreSQL', srs=21781,
+                                      cache=True)
+        fingerprint = cfg.schema_fingerprint('PostgreSQL', srs=21781)
+        cachefn = os.path.join(cache_dir, 'configs', fingerprint + '.cfg')
+        assert os.path.exists(cachefn)
+        # Schema is defined by the model, transfer file is not opened
+        cfg = OgrConfig(ds=ds)
+        assert cfg.generate_config(dst_format='PostgreSQL', srs=21781,
+                                   cache=True) == cfgjson
+        assert cfg._ds is None
+        assert cfg.layer_names() == json.loads(cfgjson)['layers'].keys()
+
+        assert cfg.schema_fingerprint('PostgreSQL', srs=2056) != fingerprint
+        assert cfg.schema_fingerprint('SQLite', srs=21781) != fingerprint
+
+        # Shapefile schema is read from the datasource
+        cfg = OgrConfig(ds="tests/data/osm/railway.shp")
+        cfgjson = cfg.generate_config(dst_format='PostgreSQL', cache=True)
+        cfg = OgrConfig(ds="tests/data/osm/railway.shp")
+        assert cfg.generate_config(dst_format='PostgreSQL') == cfgjson
+        assert len(os.listdir(os.path.join(cache_dir, 'configs'))) == 2
+    finally:
+        del os.environ["OGRTOOLS_CACHE_DIR"]
+        shutil.rmtree(cache_dir)
+
+
 def test_np():
     cfg = OgrConfig(ds="tests/data/np/NP_Example.xtf,tests/data/np/NP_73_CH_de_ili2.imd",
                     model="tests/data/np/NP_73_CH_de_ili2.imd")
@@ -104,7 +145,22 @@ def test_np():
 
     print(cfgjson)
 
-    assert json.loads(cfgjson)["layers"]["n0_grundnutzung_zonenflaeche'"] == expected
+    assert json.loads(cfgjson)["layers"]["ne2bf414c_grundnutzung_zonenflaeche"] == expected
+
+
+def test_shorten_name():
+    handler = PgFormatHandler()
+    name = 'Nutzungsplanung.Nutzungsplanung.Grundnutzung_Zonenflaeche'
+    # Independent of call order and earlier calls
+    assert handler.launder_name(name) == \
+        'ne2bf414c_grundnutzung_zonenflaeche'
+    assert handler.launder_name(name) == \
+        PgFormatHandler().launder_name(name)
+    assert handler.shorten_name('A.B.Herkunft', 'enum') == \
+        'enum2c5ba768_Herkunft'
+    assert handler.shorten_name('A.C.Herkunft', 'enum') != \
+        handler.shorten_name('A.B.Herkunft', 'enum')
+    assert len(handler.launder_name('x' * 80)) == handler.max_len - 7
 
 
 def test_layer_info():
@@ -212,3 +268,119 @@ def test_multigeom_vrt():
         assert field in vrt
     for field in expected_geom_fields:
         assert field in vrt
+
+
+def test_reprojection_vrt():
+    cfg = OgrConfig(ds="./tests/data/ili/roads23.xtf,./tests/data/ili/RoadsExdm2ien.imd",
+                    config="./tests/data/ili/RoadsExdm2ien.cfg")
+    cfg._config['layers']['streetaxis']['geom_fields']['geometry'][
+        'dst_srs'] = 'EPSG:2056'
+    vrt = prettify(cfg.generate_vrt())
+    print(vrt)
+    assert '''<OGRVRTWarpedLayer>
+    <OGRVRTLayer name="streetaxis">''' in vrt
+    assert '''<SrcSRS>EPSG:21781</SrcSRS>''' in vrt
+    assert '''<TargetSRS>EPSG:2056</TargetSRS>''' in vrt
+    assert '''<WarpedGeomFieldName>geometry</WarpedGeomFieldName>''' in vrt
+    # Layers without target SRS are not warped
+    assert vrt.count('<OGRVRTWarpedLayer>') == 1
+    # Numeric EPSG codes
+    geom_field = cfg._config['layers']['streetaxis']['geom_fields'][
+        'geometry']
+    geom_field['srs'] = 21781
+    geom_field['dst_srs'] = 2056
+    vrt = cfg.generate_vrt()
+    assert '<TargetSRS>EPSG:2056</TargetSRS>' in vrt.decode('utf-8')
+    ds = cfg._tmp_datasource(vrt)
+    feature = ds.GetLayerByName('streetaxis').GetNextFeature()
+    # LV03 -> LV95
+    x, y = feature.GetGeometryRef().GetPoint_2D(0)
+    assert abs(x - 2000055.6) < 10
+    assert abs(y - 1000037.649) < 10
+    feature = None
+    ds = None
+    cfg._free_tmp_datasource()
+    # Source SRS required
+    del cfg._config['layers']['streetaxis']['geom_fields']['geometry']['srs']
+    try:
+        cfg.generate_vrt()
+        assert False
+    except ValueError:
+        pass
+
+
+def _features(layer, names):
+    for name in names:
+        feature = ogr.Feature(layer.GetLayerDefn())
+        if name is not None:
+            feature.SetField('name', name)
+        yield feature
+
+
+def test_write_features_transactions():
+    __, dstfile = tempfile.mkstemp(suffix='.gpkg')
+    os.remove(dstfile)
+    ds = ogr.GetDriverByName('GPKG').CreateDataSource(dstfile)
+    layer = ds.CreateLayer('names', geom_type=ogr.wkbNone)
+    field = ogr.FieldDefn('name', ogr.OFTString)
+    field.SetNullable(False)
+    layer.CreateField(field)
+    names = ['a', 'b', 'c', None, 'e', 'f', 'g']
+
+    # The failed feature rolls back its group, the others are written again
+    written = write_features(layer, _features(layer, names),
+                             group_transactions=3, skipfailures=True)
+    assert written == 6
+    assert layer.GetFeatureCount() == 6
+
+    try:
+        write_features(layer, _features(layer, names), group_transactions=3)
+        assert False
+    except ValueError:
+        pass
+    # Committed group is kept, failed group rolled back
+    assert layer.GetFeatureCount() == 9
+    ds = None
+    os.remove(dstfile)
+
+
+def test_transaction_size():
+    cfg = OgrConfig(ds="tests/data/osm/railway.shp")
+    cfg.generate_config(dst_format='PostgreSQL')
+    assert cfg.transaction_size('PostgreSQL') == 20000
+    assert cfg.transaction_size('GPKG') == 100000
+    assert cfg.transaction_size('GPKG', 500) == 500
+    cfg._config['dst_group_transactions'] = 1000
+    assert cfg.transaction_size('PostgreSQL') == 1000
+
+
+def test_pg_stage_tables():
+    handler = PgFormatHandler()
+    assert handler.stage_name('roads') == 'roads_stage'
+    assert len(handler.stage_name('x' * 63)) == 62
+    sql = handler.swap_table_sql('public', 'roads_stage', 'roads')
+    assert sql[0] == 'DROP TABLE IF EXISTS "public"."roads"'
+    assert sql[1] == 'ALTER TABLE "public"."roads_stage" RENAME TO "roads"'
+    assert "'roads' ||" in sql[2]
+    assert len(sql) == 3
+    assert handler.set_logged_sql('public', 'roads_stage') == \
+        'ALTER TABLE "public"."roads_stage" SET LOGGED'
+
+
+def test_layer_groups():
+    assert layer_groups(['a', 'b', 'c', 'd', 'e'], 2) == [
+        ['a', 'c', 'e'], ['b', 'd']]
+    assert layer_groups(['a'], 4) == [['a']]
+
+
+def test_create_layer_overwrite():
+    src = ogr.GetDriverByName('Memory').CreateDataSource('src')
+    inLayer = src.CreateLayer('roads', geom_type=ogr.wkbNone)
+    inLayer.CreateField(ogr.FieldDefn('name', ogr.OFTString))
+    ds = ogr.GetDriverByName('Memory').CreateDataSource('dst')
+    layer = create_layer('Memory', inLayer, ds, 'roads', True, [])
+    layer.CreateFeature(ogr.Feature(layer.GetLayerDefn()))
+    # First layer of the datasource is replaced as well
+    layer = create_layer('Memory', inLayer, ds, 'roads', True, [])
+    assert ds.GetLayerCount() == 1
+    assert layer.GetFeatureCount() == 0
@@ -0,0 +1,92 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from ogrtools.interlis.tid_index import TidIndex, tidx_path
+
+ROADS = "./tests/data/ili/roads23.xtf"
+NS = "{http://www.interlis.ch/INTERLIS2.3}"
+
+
+def _copy_roads(tmpdir):
+    fn = os.path.join(tmpdir, "roads23.xtf")
+    shutil.copy(ROADS, fn)
+    return fn
+
+
+def test_lookup():
+    tmpdir = tempfile.mkdtemp()
+    fn = _copy_roads(tmpdir)
+    index = TidIndex(fn)
+    assert os.path.exists(tidx_path(fn))
+    assert len(index) == 31
+    bid, offset, cls = index.lookup("1")
+    assert bid == "REFHANDB00000001"
+    assert cls == "RoadsExdm2ben.Roads.Street"
+    with open(fn, "rb") as f:
+        f.seek(offset)
+        assert f.read(30) == b'<RoadsExdm2ben.Roads.Street TI'
+    assert index.lookup("unknown") is None
+    assert "unknown" not in index
+    index.close()
+    shutil.rmtree(tmpdir)
+
+
+def test_extract():
+    tmpdir = tempfile.mkdtemp()
+    fn = _copy_roads(tmpdir)
+    index = TidIndex(fn)
+    elem = index.extract("1")
+    assert elem.tag == NS + "RoadsExdm2ben.Roads.Street"
+    assert elem.get("TID") == "1"
+    assert elem.find(NS + "Name").text == "Austrasse"
+    elem = index.extract("8")
+    assert elem.find(NS + "Street").get("REF") == "1"
+    assert index.extract("unknown") is None
+    index.close()
+    shutil.rmtree(tmpdir)
+
+
+def test_references():
+    tmpdir = tempfile.mkdtemp()
+    fn = _copy_roads(tmpdir)
+    index = TidIndex(fn)
+    assert ("Street", "1") in index.references("8")
+    assert ("8", "Street") in index.referencing("1")
+    assert ("Street", "1", "RoadsExdm2ben.Roads.Street") in \
+        index.resolve("8")
+    index.close()
+    shutil.rmtree(tmpdir)
+
+
+def test_invalidation():
+    tmpdir = tempfile.mkdtemp()
+    fn = os.path.join(tmpdir, "roads23.xtf.gz")
+    with open(ROADS, "rb") as f:
+        xtf = f.read()
+    with gzip.open(fn, "wb") as f:
+        f.write(xtf)
+    index = TidIndex(fn)
+    assert index.lookup("1") is not None
+    index.close()
+    # Index is reused
+    mtime = os.path.getmtime(tidx_path(fn))
+    index = TidIndex(fn)
+    assert os.path.getmtime(tidx_path(fn)) == mtime
+    index.close()
+    # Changed transfer file
+    with gzip.open(fn, "wb") as f:
+        f.write(xtf.replace(b'TID="1"', b'TID="new1"'))
+    os.utime(fn, (mtime + 10, mtime + 10))
+    index = TidIndex(fn)
+    assert index.lookup("1") is None
+    assert index.lookup("new1") is not None
+    # No extraction from compressed files
+    try:
+        index.extract("new1")
+        assert False
+    except ValueError:
+        pass
+    index.close()
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,72 @@
+import gzip
+import os
+import shutil
+import tempfile
+import zipfile
+
+from ogrtools.interlis.transfer_file import (open_transfer, vsi_path,
+                                             vsi_datasource, transfer_members)
+from ogrtools.interlis.model_loader import ModelLoader
+
+
+def _compressed_transfers(tmpdir):
+    gz = os.path.join(tmpdir, "roads23.xtf.gz")
+    with open("./tests/data/ili/roads23.xtf", "rb") as src:
+        with gzip.open(gz, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+    zip = os.path.join(tmpdir, "delivery.zip")
+    with zipfile.ZipFile(zip, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.write("./tests/data/ili/Beispiel.ili", "Beispiel.ili")
+        zf.write("./tests/data/ili/Beispiel.itf", "Beispiel.itf")
+        zf.write("./tests/data/ili/roads23.xtf", "sub/roads23.xtf")
+    return gz, zip
+
+
+def test_open_transfer():
+    tmpdir = tempfile.mkdtemp()
+    gz, zip = _compressed_transfers(tmpdir)
+    with open_transfer(gz) as f:
+        assert b"<TRANSFER" in f.read(1000)
+    assert transfer_members(zip) == ["Beispiel.itf", "sub/roads23.xtf"]
+    with open_transfer(zip) as f:
+        assert f.read(4) == b"SCNT"
+    with open_transfer(zip + "/sub/roads23.xtf") as f:
+        assert b"<TRANSFER" in f.read(1000)
+    shutil.rmtree(tmpdir)
+
+
+def test_detect_compressed_models():
+    tmpdir = tempfile.mkdtemp()
+    gz, zip = _compressed_transfers(tmpdir)
+    loader = ModelLoader(gz)
+    assert loader.detect_format() == 'Interlis 2'
+    assert [model.name for model in loader.detect_models()] == [
+        'RoadsExdm2ben', 'RoadsExdm2ien']
+    loader = ModelLoader(zip)
+    assert loader.detect_models()[0].name == 'Beispiel'
+    loader = ModelLoader(zip + "/sub/roads23.xtf")
+    assert loader.detect_format() == 'Interlis 2'
+    shutil.rmtree(tmpdir)
+
+
+def test_vsi_path():
+    tmpdir = tempfile.mkdtemp()
+    gz, zip = _compressed_transfers(tmpdir)
+    assert vsi_path(gz) == "/vsigzip/" + gz
+    assert vsi_path(zip) == "/vsizip/" + zip + "/Beispiel.itf"
+    assert vsi_path(zip + "/sub/roads23.xtf") == \
+        "/vsizip/" + zip + "/sub/roads23.xtf"
+    assert vsi_datasource(gz + ",model.imd") == \
+        "/vsigzip/" + gz + ",model.imd"
+    assert vsi_datasource("tests/data/ili/roads23.xtf,model.imd") == \
+        "tests/data/ili/roads23.xtf,model.imd"
+    assert vsi_datasource("PG:dbname='test'") == "PG:dbname='test'"
+    # Other compressed datasources are left to GDAL
+    assert vsi_path(os.path.join(tmpdir, "data.gpkg.gz")) == \
+        os.path.join(tmpdir, "data.gpkg.gz")
+    shp = os.path.join(tmpdir, "shapes.zip")
+    with zipfile.ZipFile(shp, "w") as zf:
+        zf.writestr("shapes.shp", b"")
+    assert vsi_path(shp) == shp
+    assert vsi_path(shp + "/shapes.shp") == shp + "/shapes.shp"
+    shutil.rmtree(tmpdir)
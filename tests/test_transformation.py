@@ -5,8 +5,10 @@ import tempfile
 import re
 import codecs
 import json
-from osgeo import gdal
-from ogrtools.ogrtransform.ogrconfig import OgrConfig
+import time
+from osgeo import gdal, ogr
+from ogrtools.ogrtransform.ogrconfig import OgrConfig, field_index_map
+from ogrtools.ogrtransform.journal import TransformJournal, journal_path
 from ogrtools.interlis.ilismeta import ImdParser
 
 
@@ -90,6 +92,41 @@ def test_ili_to_geojson():
 #     os.remove(dstfile)
 
 
+def test_ili_reprojection():
+    trans = OgrConfig(
+        config="tests/data/ili/RoadsExdm2ien.cfg",
+        ds="tests/data/ili/roads23.xtf,tests/data/ili/RoadsExdm2ien.imd")
+    trans._config['layers']['streetaxis']['geom_fields']['geometry'][
+        'dst_srs'] = 'EPSG:2056'
+    __, dstfile = tempfile.mkstemp(suffix='.json')
+    os.remove(dstfile)
+    trans.transform(dstfile, "GeoJSON", layers=["streetaxis"])
+    result = json.loads(codecs.open(dstfile, encoding='utf-8').read())
+    assert '2056' in result['crs']['properties']['name']
+    # LV03 -> LV95
+    x, y = result['features'][0]['geometry']['coordinates'][0][0]
+    assert abs(x - 2000055.6) < 10
+    assert abs(y - 1000037.649) < 10
+    os.remove(dstfile)
+
+
+def test_write_enum_tables():
+    trans = OgrConfig(config="tests/data/ili/RoadsExdm2ien.cfg")
+    __, dstfile = tempfile.mkstemp(suffix='.sqlite')
+    os.remove(dstfile)
+    trans.write_enum_tables(dstfile, "SQLite")
+    ds = ogr.Open(dstfile)
+    assert ds.GetLayerCount() == len(trans.enum_names())
+    layer = ds.GetLayerByName('enum3_lart')
+    defn = layer.GetLayerDefn()
+    assert defn.GetFieldDefn(defn.GetFieldIndex('id')).GetType() == \
+        ogr.OFTInteger
+    assert [(feature.GetField('id'), feature.GetField('enum'))
+            for feature in layer] == [(0, 'welldefined'), (1, 'fuzzy')]
+    ds = None
+    os.remove(dstfile)
+
+
 def manualtest_ili_to_spatialite():
     # ogr genconfig --format SQLite tests/data/ch.bazl/ch.bazl.sicherheitszonenplan.oereb_20131118.xtf,tests/data/ch.bazl/ch.bazl.sicherheitszonenplan.oereb_20131118.imd --model tests/data/ch.bazl/ch.bazl.sicherheitszonenplan.oereb_20131118.imd --srs=EPSG:21781 >tests/data/ch.bazl/ch.bazl.sicherheitszonenplan.oereb_20131118.cfg
     trans = OgrConfig(
@@ -178,6 +215,203 @@ def test_encoding():
     os.remove(dstfile)
 
 
+def _feature_counts(fn):
+    ds = ogr.Open(fn)
+    counts = dict((layer.GetName(), layer.GetFeatureCount()) for layer in ds)
+    ds = None
+    return counts
+
+
+def test_parallel_transform():
+    trans = OgrConfig(
+        config="tests/data/np/NP_73_CH_de_ili2.cfg",
+        ds="tests/data/np/NP_Example.xtf,tests/data/np/NP_73_CH_de_ili2.imd")
+    __, dstfile = tempfile.mkstemp(suffix='.sqlite')
+    os.remove(dstfile)
+    trans.transform(dstfile, "SQLite")
+    expected = _feature_counts(dstfile)
+    os.remove(dstfile)
+
+    # SQLite is a single writer format -> merge of layer outputs
+    trans.transform(dstfile, "SQLite", parallel=True, max_workers=2)
+    assert _feature_counts(dstfile) == expected
+    assert sorted(trans.layer_timings()) == sorted(trans.layer_names())
+    os.remove(dstfile)
+
+
+def _features(fn):
+    ds = ogr.Open(fn)
+    features = [(feature.items(), feature.GetGeometryRef().ExportToWkt())
+                for feature in ds.GetLayer(0)]
+    ds = None
+    return features
+
+
+def test_arrow_transform():
+    trans = OgrConfig(
+        config="tests/data/osm/railway.cfg",
+        ds="tests/data/osm/railway.shp")
+    __, dstfile = tempfile.mkstemp(suffix='.gpkg')
+    os.remove(dstfile)
+    # skipfailures uses the row by row copy
+    trans.transform(dstfile, "GPKG", skipfailures=True)
+    expected = _features(dstfile)
+    os.remove(dstfile)
+
+    # Arrow batches with GDAL >= 3.8
+    trans.transform(dstfile, "GPKG")
+    assert _features(dstfile) == expected
+    os.remove(dstfile)
+
+
+def test_basket_transform():
+    trans = OgrConfig(
+        config="tests/data/np/NP_73_CH_de_ili2.cfg",
+        ds="tests/data/np/NP_Example.xtf,tests/data/np/NP_73_CH_de_ili2.imd")
+    __, dstfile = tempfile.mkstemp(suffix='.sqlite')
+    os.remove(dstfile)
+    trans.transform(dstfile, "SQLite")
+    expected = _feature_counts(dstfile)
+    os.remove(dstfile)
+
+    trans.transform(dstfile, "SQLite", baskets=True)
+    assert _feature_counts(dstfile) == expected
+    os.remove(dstfile)
+
+
+def _scaled_xtf(fn, copies):
+    """Copy of transfer file with its baskets repeated with unique TIDs"""
+    xtf = codecs.open(fn, encoding='utf-8').read()
+    start = xtf.index('<DATASECTION>') + len('<DATASECTION>')
+    end = xtf.index('</DATASECTION>')
+    baskets = []
+    for i in range(copies):
+        baskets.append(re.sub(r'(TID|BID|REF)="([^"]+)"',
+                              r'\1="\2_%d"' % i, xtf[start:end]))
+    fd, scaledfn = tempfile.mkstemp(suffix='.xtf')
+    with os.fdopen(fd, "wb") as f:
+        f.write((xtf[:start] + ''.join(baskets) + xtf[end:]).encode('utf-8'))
+    return scaledfn
+
+
+def _copy_features(layer, dst_layer, lookup_fields):
+    dst_defn = dst_layer.GetLayerDefn()
+    field_map = field_index_map(layer.GetLayerDefn(), dst_defn)
+    layer.ResetReading()
+    count = 0
+    start = time.time()
+    for feature in layer:
+        dst_feature = ogr.Feature(dst_defn)
+        if lookup_fields:
+            # Per-feature name lookup as done before field_index_map
+            for i in range(dst_defn.GetFieldCount()):
+                name = dst_defn.GetFieldDefn(i).GetNameRef()
+                src_idx = layer.GetLayerDefn().GetFieldIndex(name)
+                if feature.IsFieldSet(src_idx):
+                    dst_feature.SetField(i, feature.GetField(src_idx))
+        else:
+            for dst_idx, src_idx in field_map:
+                if feature.IsFieldSet(src_idx):
+                    dst_feature.SetField(dst_idx, feature.GetField(src_idx))
+        dst_layer.CreateFeature(dst_feature)
+        count += 1
+    return count / max(time.time() - start, 1e-6)
+
+
+# Run with nosetests tests/test_transformation.py:manualtest_field_copy_performance --nocapture
+def manualtest_field_copy_performance():
+    xtffile = _scaled_xtf("tests/data/np/NP_Example.xtf", 500)
+    ds = ogr.Open(xtffile + ",tests/data/np/NP_73_CH_de_ili2.imd")
+    mem = ogr.GetDriverByName("Memory").CreateDataSource("bench")
+    for i in range(ds.GetLayerCount()):
+        layer = ds.GetLayer(i)
+        if layer.GetLayerDefn().GetFieldCount() < 3:
+            continue
+        rates = []
+        for lookup_fields in [True, False]:
+            dst_layer = mem.CreateLayer(
+                "%s_%s" % (layer.GetName(), lookup_fields),
+                geom_type=ogr.wkbNone)
+            defn = layer.GetLayerDefn()
+            for fld in range(defn.GetFieldCount()):
+                dst_layer.CreateField(defn.GetFieldDefn(fld))
+            rates.append(_copy_features(layer, dst_layer, lookup_fields))
+        print("%s: %d features/s with name lookup, %d features/s "
+              "with field map" % (layer.GetName(), rates[0], rates[1]))
+    ds = None
+    os.remove(xtffile)
+
+    trans = OgrConfig(
+        config="tests/data/np/NP_73_CH_de_ili2.cfg",
+        ds=_scaled_xtf("tests/data/np/NP_Example.xtf", 500) +
+        ",tests/data/np/NP_73_CH_de_ili2.imd")
+    __, dstfile = tempfile.mkstemp(suffix='.gml')
+    os.remove(dstfile)
+    start = time.time()
+    trans.transform(dstfile, "GML")
+    print("transform: %.3fs" % (time.time() - start))
+    os.remove(trans._ds_fn.split(',')[0])
+    os.remove(dstfile)
+
+
+def manualtest_parallel_performance():
+    # Each job reads the whole XTF file when opening the VRT
+    trans = OgrConfig(
+        config="tests/data/np/NP_73_CH_de_ili2.cfg",
+        ds=_scaled_xtf("tests/data/np/NP_Example.xtf", 500) +
+        ",tests/data/np/NP_73_CH_de_ili2.imd")
+    for parallel in [False, True]:
+        __, dstfile = tempfile.mkstemp(suffix='.sqlite')
+        os.remove(dstfile)
+        start = time.time()
+        trans.transform(dstfile, "SQLite", parallel=parallel, max_workers=4)
+        print("parallel=%s: %.3fs" % (parallel, time.time() - start))
+        os.remove(dstfile)
+    os.remove(trans._ds_fn.split(',')[0])
+
+
+def _copy_geometries(layer, dst_layer, clone):
+    dst_defn = dst_layer.GetLayerDefn()
+    layer.ResetReading()
+    count = 0
+    start = time.time()
+    for feature in layer:
+        dst_feature = ogr.Feature(dst_defn)
+        geom = feature.GetGeomFieldRef(0)
+        if geom is not None:
+            if clone:
+                # Copy loop before geometry handoff
+                dst_feature.SetGeomField(0, geom.Clone())
+            else:
+                dst_feature.SetGeomField(0, geom)
+        dst_layer.CreateFeature(dst_feature)
+        count += 1
+    return count / max(time.time() - start, 1e-6)
+
+
+# Run with nosetests tests/test_transformation.py:manualtest_geometry_copy_performance --nocapture
+def manualtest_geometry_copy_performance():
+    xtffile = _scaled_xtf("tests/data/np/NP_Example.xtf", 500)
+    ds = ogr.Open(xtffile + ",tests/data/np/NP_73_CH_de_ili2.imd")
+    mem = ogr.GetDriverByName("Memory").CreateDataSource("bench")
+    for i in range(ds.GetLayerCount()):
+        layer = ds.GetLayer(i)
+        if layer.GetLayerDefn().GetGeomFieldCount() == 0:
+            continue
+        rates = []
+        for clone in [True, False]:
+            dst_layer = mem.CreateLayer(
+                "%s_%s" % (layer.GetName(), clone),
+                geom_type=layer.GetLayerDefn().GetGeomFieldDefn(0).GetType())
+            rates.append(_copy_geometries(layer, dst_layer, clone))
+            # Release copied geometries before next run
+            mem.DeleteLayer(mem.GetLayerCount() - 1)
+        print("%s: %d features/s with Clone(), %d features/s without" %
+              (layer.GetName(), rates[0], rates[1]))
+    ds = None
+    os.remove(xtffile)
+
+
 # def test_ili_to_gml():
 #     trans = OgrConfig(
 #         config="tests/data/np/NP_73_CH_de_ili2.cfg",
@@ -229,3 +463,125 @@ def test_encoding():
 #     os.remove(xtffile)
 #     os.remove(gmlfile2)
 #     gdal.SetConfigOption('OGR_STROKE_CURVE', option)
+
+
+def test_resume_transform():
+    trans = OgrConfig(
+        config="tests/data/np/NP_73_CH_de_ili2.cfg",
+        ds="tests/data/np/NP_Example.xtf,tests/data/np/NP_73_CH_de_ili2.imd")
+    __, dstfile = tempfile.mkstemp(suffix='.sqlite')
+    os.remove(dstfile)
+    trans.transform(dstfile, "SQLite")
+    expected = _feature_counts(dstfile)
+    # No journal without checkpoints
+    assert not os.path.exists(journal_path(dstfile))
+    os.remove(dstfile)
+    trans.transform(dstfile, "SQLite", checkpoint=True)
+    assert _feature_counts(dstfile) == expected
+    # Journal is removed after successful transformation
+    assert not os.path.exists(journal_path(dstfile))
+
+    # Simulate transformation interrupted after the second feature of a
+    # layer was committed, but before the journal was updated
+    layers = list(trans.layer_names())
+    layer = [name for name in layers if expected[name] > 2][0]
+    ds = ogr.Open(dstfile, update=True)
+    ds.ExecuteSQL("DELETE FROM %s WHERE ogc_fid > 2" % layer)
+    ds = None
+    journal = TransformJournal(journal_path(dstfile),
+                               trans._journal_key("SQLite", dstfile))
+    journal.clear()
+    for name in layers:
+        if name == layer:
+            journal.commit(name, 1, written=1)
+        else:
+            journal.commit(name, expected[name], done=True,
+                           written=expected[name])
+    journal.close()
+
+    trans.transform(dstfile, "SQLite", resume=True)
+    assert _feature_counts(dstfile) == expected
+    assert list(trans.layer_timings()) == [layer]
+    assert not os.path.exists(journal_path(dstfile))
+    os.remove(dstfile)
+
+
+def test_transform_multi():
+    trans = OgrConfig(
+        config="tests/data/np/NP_73_CH_de_ili2.cfg",
+        ds="tests/data/np/NP_Example.xtf,tests/data/np/NP_73_CH_de_ili2.imd")
+    __, dstfile = tempfile.mkstemp(suffix='.sqlite')
+    os.remove(dstfile)
+    trans.transform(dstfile, "SQLite")
+    expected = _feature_counts(dstfile)
+    os.remove(dstfile)
+
+    __, gpkgfile = tempfile.mkstemp(suffix='.gpkg')
+    os.remove(gpkgfile)
+    # Small queues to test blocking of the reader
+    results = trans.transform_multi(
+        [{'dest': dstfile, 'format': 'SQLite'},
+         {'dest': gpkgfile, 'format': 'GPKG'}], queue_size=2)
+    assert results == {dstfile: None, gpkgfile: None}
+    assert _feature_counts(dstfile) == expected
+    assert _feature_counts(gpkgfile) == expected
+    os.remove(dstfile)
+    os.remove(gpkgfile)
+
+    # Failing destination doesn't stop the others
+    results = trans.transform_multi(
+        [{'dest': dstfile, 'format': 'SQLite'},
+         {'dest': 'invalid', 'format': 'NoSuchDriver'}])
+    assert results[dstfile] is None
+    assert 'NoSuchDriver' in results['invalid']
+    assert _feature_counts(dstfile) == expected
+    os.remove(dstfile)
+
+
+def test_delta_transform():
+    trans = OgrConfig(
+        config="tests/data/ili/RoadsExdm2ien.cfg",
+        ds="tests/data/ili/roads23.xtf,tests/data/ili/RoadsExdm2ien.imd")
+    __, dstfile = tempfile.mkstemp(suffix='.sqlite')
+    os.remove(dstfile)
+    trans.transform(dstfile, "SQLite")
+    expected = _feature_counts(dstfile)
+
+    # Unchanged delivery
+    counts = trans.transform_delta(dstfile, "SQLite")
+    for name, layer_counts in counts.items():
+        assert layer_counts == {'inserted': 0, 'updated': 0, 'deleted': 0,
+                                'unchanged': expected[name]}
+    assert os.path.exists(journal_path(dstfile, '.delta'))
+
+    # Delivery with changed geometry of StreetAxis 8
+    with open("tests/data/ili/roads23.xtf") as f:
+        xtf = f.read()
+    start = xtf.index('StreetAxis TID="8"')
+    end = xtf.index('</C1>', start)
+    __, xtffile = tempfile.mkstemp(suffix='.xtf')
+    with open(xtffile, "w") as f:
+        f.write(xtf[:end] + '1' + xtf[end:])
+    trans = OgrConfig(
+        config="tests/data/ili/RoadsExdm2ien.cfg",
+        ds=xtffile + ",tests/data/ili/RoadsExdm2ien.imd")
+
+    # Delete another feature, add unknown TID
+    ds = ogr.Open(dstfile, update=True)
+    layer = ds.GetLayerByName('streetaxis')
+    fids = [feature.GetFID() for feature in layer
+            if feature.GetField('tid') != '8']
+    layer.DeleteFeature(fids[0])
+    feature = ogr.Feature(layer.GetLayerDefn())
+    feature.SetField('tid', 'unknown')
+    layer.CreateFeature(feature)
+    ds = None
+
+    counts = trans.transform_delta(dstfile, "SQLite", layers=['streetaxis'])
+    assert counts['streetaxis'] == {
+        'inserted': 1, 'updated': 1, 'deleted': 1,
+        'unchanged': expected['streetaxis'] - 2}
+    assert _feature_counts(dstfile) == expected
+    os.remove(xtffile)
+    os.remove(journal_path(dstfile, '.delta'))
+    os.remove(dstfile)
@@ -0,0 +1,135 @@
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+from xml.etree import ElementTree
+
+from ogrtools.interlis.xtf_diff import TransferDiff, TransferObjects
+
+ROADS = "./tests/data/ili/roads23.xtf"
+NS = "{http://www.interlis.ch/INTERLIS2.3}"
+
+
+def _roads_changes(tmpdir):
+    with open(ROADS) as f:
+        xtf = f.read()
+    tids = re.findall(r'TID="([^"]+)"', xtf)
+    # Replace TID of first object, change coordinate of second object
+    xtf = xtf.replace('TID="%s"' % tids[0], 'TID="new1"', 1)
+    start = xtf.index('TID="%s"' % tids[1])
+    end = xtf.index('</C1>', start)
+    xtf = xtf[:end] + '1' + xtf[end:]
+    fn = os.path.join(tmpdir, "roads_new.xtf")
+    with open(fn, "w") as f:
+        f.write(xtf)
+    return fn, tids
+
+
+def test_transfer_objects():
+    objects = [elem.get('TID') for basket, elem in TransferObjects(ROADS)
+               if elem is not None]
+    assert len(objects) == 31
+    # Basket end
+    assert [basket.get('BID') for basket, elem in TransferObjects(ROADS)
+            if elem is None] == ['REFHANDB00000001']
+
+
+def test_diff_json():
+    tmpdir = tempfile.mkdtemp()
+    newfn, tids = _roads_changes(tmpdir)
+    changes = TransferDiff(ROADS, newfn)
+    out = io.StringIO()
+    changes.write_json(out)
+    result = json.loads(out.getvalue())
+    assert result == {
+        'RoadsExdm2ben.Roads.LandCover': {'delete': [tids[0]],
+                                          'insert': ['new1'],
+                                          'update': [tids[1]]}}
+    assert changes.counts() == {
+        'RoadsExdm2ben.Roads.LandCover': {'insert': 1, 'update': 1,
+                                          'delete': 1}}
+    changes.close()
+
+    # No changes
+    changes = TransferDiff(ROADS, ROADS)
+    out = io.StringIO()
+    changes.write_json(out)
+    assert json.loads(out.getvalue()) == {}
+    changes.close()
+    shutil.rmtree(tmpdir)
+
+
+def test_diff_changeset():
+    tmpdir = tempfile.mkdtemp()
+    newfn, tids = _roads_changes(tmpdir)
+    changes = TransferDiff(ROADS, newfn)
+    outfn = os.path.join(tmpdir, "changes.xtf")
+    changes.write_changeset(outfn)
+    changes.close()
+
+    datasection = ElementTree.parse(outfn).getroot().find(NS + 'DATASECTION')
+    baskets = list(datasection)
+    assert len(baskets) == 1
+    assert baskets[0].get('KIND') == 'UPDATE'
+    assert [(obj.get('TID'), obj.get('OPERATION'))
+            for obj in baskets[0]] == [
+        (tids[0], 'DELETE'), ('new1', 'INSERT'), (tids[1], 'UPDATE')]
+    shutil.rmtree(tmpdir)
+
+
+def test_diff_changeset_class_change():
+    tmpdir = tempfile.mkdtemp()
+    with open(ROADS) as f:
+        xtf = f.read()
+    # Object 8 changes its class from StreetAxis to a base class
+    start = xtf.index('<RoadsExdm2ien.RoadsExtended.StreetAxis TID="8"')
+    end = xtf.index('</RoadsExdm2ien.RoadsExtended.StreetAxis>', start)
+    obj = xtf[start:end].replace('RoadsExdm2ien.RoadsExtended.StreetAxis',
+                                 'RoadsExdm2ben.Roads.StreetAxis')
+    xtf = xtf[:start] + obj + '</RoadsExdm2ben.Roads.StreetAxis>' + \
+        xtf[end + len('</RoadsExdm2ien.RoadsExtended.StreetAxis>'):]
+    newfn = os.path.join(tmpdir, "roads_new.xtf")
+    with open(newfn, "w") as f:
+        f.write(xtf)
+
+    changes = TransferDiff(ROADS, newfn)
+    outfn = os.path.join(tmpdir, "changes.xtf")
+    changes.write_changeset(outfn)
+    changes.close()
+
+    datasection = ElementTree.parse(outfn).getroot().find(NS + 'DATASECTION')
+    operations = [(obj.tag, obj.get('TID'), obj.get('OPERATION'))
+                  for basket in datasection for obj in basket]
+    # Delete applied before the insert of the same TID
+    assert operations == [
+        (NS + 'RoadsExdm2ien.RoadsExtended.StreetAxis', '8', 'DELETE'),
+        (NS + 'RoadsExdm2ben.Roads.StreetAxis', '8', 'INSERT')]
+    shutil.rmtree(tmpdir)
+
+
+def test_diff_removed_basket():
+    tmpdir = tempfile.mkdtemp()
+    with open("./tests/data/np/NP_Example.xtf", "rb") as f:
+        xtf = f.read()
+    # Remove first basket
+    start = xtf.rindex(b'<', 0, xtf.index(b'BID="xxx0"'))
+    end = xtf.rindex(b'<', 0, xtf.index(b'BID="xxx1"'))
+    newfn = os.path.join(tmpdir, "np_new.xtf")
+    with open(newfn, "wb") as f:
+        f.write(xtf[:start] + xtf[end:])
+
+    changes = TransferDiff("./tests/data/np/NP_Example.xtf", newfn)
+    outfn = os.path.join(tmpdir, "changes.xtf")
+    changes.write_changeset(outfn)
+    deleted = sum(counts['delete'] for counts in changes.counts().values())
+    assert deleted == 41
+    changes.close()
+
+    datasection = ElementTree.parse(outfn).getroot()[1]
+    baskets = list(datasection)
+    assert [basket.get('BID') for basket in baskets] == ['xxx0']
+    assert len(baskets[0]) == deleted
+    assert set(obj.get('OPERATION') for obj in baskets[0]) == set(['DELETE'])
+    shutil.rmtree(tmpdir)
@@ -96,8 +96,11 @@ class Ui_Interlis(object):
         self.cbStrokeCurve.setChecked(True)
         self.cbStrokeCurve.setObjectName("cbStrokeCurve")
         self.gridLayout_8.addWidget(self.cbStrokeCurve, 5, 1, 1, 1)
+        self.cbResume = QtWidgets.QCheckBox(self.frame_2)
+        self.cbResume.setObjectName("cbResume")
+        self.gridLayout_8.addWidget(self.cbResume, 6, 1, 1, 1)
         spacerItem2 = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
-        self.gridLayout_8.addItem(spacerItem2, 6, 1, 1, 1)
+        self.gridLayout_8.addItem(spacerItem2, 7, 1, 1, 1)
         self.mIlisMetaUrlLineEdit = QtWidgets.QLineEdit(self.frame_2)
         self.mIlisMetaUrlLineEdit.setObjectName("mIlisMetaUrlLineEdit")
         self.gridLayout_8.addWidget(self.mIlisMetaUrlLineEdit, 1, 1, 1, 1)
@@ -156,6 +159,7 @@ class Ui_Interlis(object):
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.transfertab), _translate("Interlis", "Import"))
         self.cbResetData.setText(_translate("Interlis", "Daten ersetzen"))
         self.cbStrokeCurve.setText(_translate("Interlis", "Kurven segmentieren"))
+        self.cbResume.setText(_translate("Interlis", "Abgebrochenen Import fortsetzen"))
         self.mIlisMetaUrlLineEdit.setText(_translate("Interlis", "http://interlis.sourcepole.ch/wps"))
         self.label_4.setText(_translate("Interlis", "IlisMeta Lookup:"))
         self.cbSkipFailures.setText(_translate("Interlis", "Import-Fehler überspringen"))